@@ -0,0 +1,164 @@
+import heapq
+import math
+import random
+from array import array
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+DEFAULT_CONFIDENCE: float = 0.99
+DEFAULT_MAX_HEAVY_HITTERS: int = 1000000
+# large prime for the pairwise independent hash functions of the sketch
+HASH_PRIME: int = (1 << 61) - 1
+HASH_SEED: int = 4711
+# packed keys are split into limbs below the prime before they are hashed, so distinct keys stay distinct
+HASH_LIMB_BITS: int = 60
+
+
+class ApproximateCountStore:
+    """
+    Memory bounded replacement of the count trie for very large corpora.
+    All subsequences are counted in a count-min sketch first. In a second pass, the subsequences with the
+    highest estimates are counted exactly, at most max_heavy_hitters of them. Only estimates that reach the
+    heavy hitter threshold plus the error bound qualify, so the sketch error alone never makes a subsequence
+    exact. All other subsequences are overestimated by at most error * total count with the given confidence.
+    Subsequences are keyed by their token ids packed into a single int
+    """
+
+    def __init__(self, error: float, confidence: float = DEFAULT_CONFIDENCE,
+                 max_heavy_hitters: int = DEFAULT_MAX_HEAVY_HITTERS) -> None:
+        self.error: float = error
+        self.confidence: float = confidence
+        self.max_heavy_hitters: int = max_heavy_hitters
+        self.width: int = math.ceil(math.e / error)
+        self.depth: int = math.ceil(math.log(1 / (1 - confidence)))
+        self.total_count: int = 0
+        self.heavy_hitter_threshold: int = None
+
+        self._rows: List[array] = [array("q", bytes(8 * self.width)) for _ in range(0, self.depth)]
+        generator: random.Random = random.Random(HASH_SEED)
+        self._hash_parameters: List[Tuple[int, int]] = [
+            (generator.randrange(1, HASH_PRIME), generator.randrange(0, HASH_PRIME)) for _ in range(0, self.depth)
+        ]
+        # radix of the packed keys, token ids are shifted by one so that keys of different lengths differ
+        self._radix: int = 2
+        self._heavy_hitters: Dict[int, int] = {}
+
+    def build(self, sequences: List, max_order: int = None) -> None:
+        """
+        Counts all subsequences of the given token id sequences up to max_order
+        """
+        self._radix = max((max(sequence) for sequence in sequences if len(sequence) > 0), default=0) + 2
+        for sequence in sequences:
+            for key in self._get_sub_sequence_keys(sequence, max_order):
+                self._add_to_sketch(key)
+                self.total_count += 1
+
+        self.heavy_hitter_threshold = max(2, math.ceil(self.total_count / self.max_heavy_hitters))
+        minimum_estimate: int = self.heavy_hitter_threshold + self.get_error_bound()
+        heavy_hitters: Dict[int, int] = self._heavy_hitters
+        # min-heap of (estimate, key) of the exactly counted subsequences. Estimates are fixed after the first pass,
+        # so a subsequence is admitted at its first occurrence or never, and an evicted one is not admitted again
+        admitted: List[Tuple[int, int]] = []
+        for sequence in sequences:
+            for key in self._get_sub_sequence_keys(sequence, max_order):
+                if key in heavy_hitters:
+                    heavy_hitters[key] += 1
+                    continue
+
+                estimate: int = self._estimate(key)
+                if estimate < minimum_estimate:
+                    continue
+                if len(admitted) < self.max_heavy_hitters:
+                    heapq.heappush(admitted, (estimate, key))
+                    heavy_hitters[key] = 1
+                elif estimate > admitted[0][0]:
+                    _, evicted_key = heapq.heappushpop(admitted, (estimate, key))
+                    del heavy_hitters[evicted_key]
+                    heavy_hitters[key] = 1
+
+    def get_error_bound(self) -> int:
+        """
+        Returns the maximum overestimation of a count, which holds with the configured confidence
+        """
+        return math.ceil(self.error * self.total_count)
+
+    def get_number_of_heavy_hitters(self) -> int:
+        return len(self._heavy_hitters)
+
+    def count(self, prefix_ids, next_id: int = None) -> int:
+        node: Tuple[int, ...] = self.get_node(prefix_ids)
+        if node is None:
+            return 0
+        if next_id is not None:
+            return self.child_count(node, next_id)
+        return self.get_count_of_node(node)
+
+    def get_node(self, token_ids, node: Tuple[int, ...] = ()) -> Tuple[int, ...]:
+        """
+        Nodes of the approximate store are the token id paths themselves
+        """
+        node = node + tuple(token_ids)
+        if len(node) == 0 or self.get_count_of_node(node) > 0:
+            return node
+        return None
+
+    def child_count(self, node: Tuple[int, ...], token_id: int) -> int:
+        # a sequence can not occur more often than its prefix
+        return min(self.get_count_of_node(node + (token_id,)), self.get_count_of_node(node))
+
+    def get_count_of_node(self, node: Tuple[int, ...]) -> int:
+        if len(node) == 0:
+            return self.total_count
+        key: int = self._get_key(node)
+        if key is None:
+            # contains a token that was not counted
+            return 0
+        count: int = self._heavy_hitters.get(key, None)
+        if count is not None:
+            return count
+        return self._estimate(key)
+
+    def _get_key(self, token_ids: Tuple[int, ...]) -> int:
+        key: int = 0
+        for token_id in token_ids:
+            if token_id < 0 or token_id + 1 >= self._radix:
+                return None
+            key = key * self._radix + token_id + 1
+        return key
+
+    def _add_to_sketch(self, key: int) -> None:
+        for row, column in zip(self._rows, self._get_columns(key)):
+            row[column] += 1
+
+    def _estimate(self, key: int) -> int:
+        return min(row[column] for row, column in zip(self._rows, self._get_columns(key)))
+
+    def _get_columns(self, key: int):
+        if key >> HASH_LIMB_BITS == 0:
+            return (((a * key + b) % HASH_PRIME) % self.width for a, b in self._hash_parameters)
+
+        # longer keys are folded limb by limb with the factor of the row, a polynomial hash over the limbs
+        limbs: List[int] = []
+        while key > 0:
+            limbs.append(key & ((1 << HASH_LIMB_BITS) - 1))
+            key >>= HASH_LIMB_BITS
+        return (((a * ApproximateCountStore._fold_limbs(limbs, a) + b) % HASH_PRIME) % self.width
+                for a, b in self._hash_parameters)
+
+    @staticmethod
+    def _fold_limbs(limbs: List[int], factor: int) -> int:
+        value: int = 0
+        for limb in reversed(limbs):
+            value = (value * factor + limb) % HASH_PRIME
+        return value
+
+    def _get_sub_sequence_keys(self, sequence, max_order: int = None):
+        sequence_length: int = len(sequence)
+        radix: int = self._radix
+        for index in range(0, sequence_length):
+            end: int = sequence_length if max_order is None else min(sequence_length, index + max_order)
+            key: int = 0
+            for token_index in range(index, end):
+                key = key * radix + sequence[token_index] + 1
+                yield key
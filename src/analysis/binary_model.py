@@ -0,0 +1,334 @@
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+from .vocabulary import Vocabulary
+
+BINARY_MODEL_MAGIC: bytes = b"PYGRAMTC"
+BINARY_MODEL_VERSION: int = 1
+# written in native byte order, so files from machines with a different byte order are detected
+BYTE_ORDER_MARKER: int = 0x01020304
+
+FLAG_LINE_NUMBERS: int = 1
+FLAG_MAX_ORDER: int = 2
+
+# magic, version, byte order marker, flags, max order, shortest and longest sequence length
+HEADER: struct.Struct = struct.Struct("=8sIIIiii")
+SECTION_ENTRY: struct.Struct = struct.Struct("=QQ")
+
+SECTION_NAME: int = 0
+SECTION_VOCABULARY_OFFSETS: int = 1
+SECTION_VOCABULARY: int = 2
+SECTION_SINGLE_TOKENS: int = 3
+SECTION_TRIE_KEYS: int = 4
+SECTION_TRIE_COUNTS: int = 5
+SECTION_MODULE_OFFSETS: int = 6
+SECTION_MODULES: int = 7
+SECTION_MODULE_SEQUENCES: int = 8
+SECTION_SEQUENCE_OFFSETS: int = 9
+SECTION_TOKEN_IDS: int = 10
+SECTION_LINE_NUMBERS: int = 11
+NUMBER_OF_SECTIONS: int = 12
+
+
+class MappedCountTrie:
+    """
+    Read only count trie on top of a mapped model file. The nodes are numbered in breadth first order,
+    so the sorted (parent node, token id) keys at index i belong to node i + 1 and lookups are binary searches
+    """
+
+    def __init__(self, keys: memoryview, counts: memoryview) -> None:
+        self._keys: memoryview = keys
+        self._counts: memoryview = counts
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def count(self, prefix_ids, next_id: int = None) -> int:
+        node: int = self.get_node(prefix_ids)
+        if node is None:
+            return 0
+        if next_id is not None:
+            return self.child_count(node, next_id)
+        return self.get_count_of_node(node)
+
+    def get_node(self, token_ids, node: int = 0) -> int:
+        for token_id in token_ids:
+            node = self._find_child(node, token_id)
+            if node is None:
+                return None
+        return node
+
+    def child_count(self, node: int, token_id: int) -> int:
+        child: int = self._find_child(node, token_id)
+        if child is None:
+            return 0
+        return self._counts[child - 1]
+
+    def get_count_of_node(self, node: int) -> int:
+        if node == 0:
+            return 0
+        return self._counts[node - 1]
+
+    def nodes(self):
+        """
+        Yields tuples of (node, parent node, token id, count), parents are yielded before their children
+        """
+        for index in range(0, len(self._keys)):
+            key: int = self._keys[index]
+            yield index + 1, key >> 32, key & 0xFFFFFFFF, self._counts[index]
+
+    def items(self):
+        paths: List[Tuple[int, ...]] = [()]
+        for index in range(0, len(self._keys)):
+            key: int = self._keys[index]
+            path: Tuple[int, ...] = paths[key >> 32] + (key & 0xFFFFFFFF,)
+            paths.append(path)
+            yield path, self._counts[index]
+
+    def to_json(self) -> Dict[str, List[int]]:
+        return {
+            "parents": [-1] + [key >> 32 for key in self._keys],
+            "tokens": [-1] + [key & 0xFFFFFFFF for key in self._keys],
+            "counts": [0] + self._counts.tolist()
+        }
+
+    def _find_child(self, node: int, token_id: int) -> int:
+        key: int = (node << 32) | token_id
+        index: int = bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            return index + 1
+        return None
+
+
+class MappedVocabulary:
+    """
+    Read only vocabulary on top of a mapped model file. Token strings are decoded on access
+    """
+
+    def __init__(self, offsets: memoryview, data: memoryview) -> None:
+        self._offsets: memoryview = offsets
+        self._data: memoryview = data
+        self._ids: Dict[str, int] = None
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def get_id(self, token: str) -> int:
+        if self._ids is None:
+            self._ids = {self.get_token(token_id): token_id for token_id in range(0, len(self))}
+        return self._ids.get(token, None)
+
+    def get_token(self, token_id: int) -> str:
+        return str(self._data[self._offsets[token_id]:self._offsets[token_id + 1]], "utf-8")
+
+    def get_tokens(self) -> List[str]:
+        return [self.get_token(token_id) for token_id in range(0, len(self))]
+
+    def get_token_ranks(self) -> List[int]:
+        return Vocabulary.get_ranks_of_tokens(self.get_tokens())
+
+    def get_sequence_string(self, token_ids) -> str:
+        return "".join(self.get_token(token_id) for token_id in token_ids)
+
+
+class MappedSequences(Mapping):
+    """
+    Read only mapping of module names to their sequences on top of a mapped model file.
+    Every sequence is returned as a tuple of (token ids, line numbers) views
+    """
+
+    def __init__(self, modules: List[str], module_sequences: memoryview, sequence_offsets: memoryview,
+                 token_ids: memoryview, line_numbers: memoryview) -> None:
+        self._modules: Dict[str, int] = {module: index for index, module in enumerate(modules)}
+        self._module_sequences: memoryview = module_sequences
+        self._sequence_offsets: memoryview = sequence_offsets
+        self._token_ids: memoryview = token_ids
+        self._line_numbers: memoryview = line_numbers
+
+    def __getitem__(self, module: str) -> List[Tuple[memoryview, memoryview]]:
+        index: int = self._modules[module]
+        output: List[Tuple[memoryview, memoryview]] = []
+        for sequence in range(self._module_sequences[index], self._module_sequences[index + 1]):
+            start: int = self._sequence_offsets[sequence]
+            end: int = self._sequence_offsets[sequence + 1]
+            output.append((self._token_ids[start:end], self._line_numbers[start:end]))
+        return output
+
+    def __iter__(self):
+        return iter(self._modules)
+
+    def __len__(self) -> int:
+        return len(self._modules)
+
+
+class BinaryModelFormat:
+    """
+    Versioned binary file format for token count models. The file consists of a header, a section table,
+    a string table for the vocabulary, the count trie as sorted key and count arrays and the sequences as
+    flat token id and line number arrays. Loaded models are memory mapped and queried without building dicts
+    """
+
+    @staticmethod
+    def is_binary_model(path: str) -> bool:
+        with open(path, "rb") as model_file:
+            return model_file.read(len(BINARY_MODEL_MAGIC)) == BINARY_MODEL_MAGIC
+
+    @staticmethod
+    def write(path: str, model) -> None:
+        sections: List[bytes] = [b""] * NUMBER_OF_SECTIONS
+        sections[SECTION_NAME] = model.name.encode("utf-8")
+
+        tokens: List[str] = model.vocabulary.get_tokens()
+        sections[SECTION_VOCABULARY_OFFSETS], sections[SECTION_VOCABULARY] = \
+            BinaryModelFormat._create_string_table(tokens)
+
+        single_tokens: array = array("q", [0] * len(tokens))
+        for token_id, count in model.single_tokens.items():
+            single_tokens[token_id] = count
+        sections[SECTION_SINGLE_TOKENS] = single_tokens.tobytes()
+
+        keys, counts = BinaryModelFormat._create_sorted_trie_arrays(model.count_model)
+        sections[SECTION_TRIE_KEYS] = keys.tobytes()
+        sections[SECTION_TRIE_COUNTS] = counts.tobytes()
+
+        modules: List[str] = list(model.token_sequences.keys())
+        sections[SECTION_MODULE_OFFSETS], sections[SECTION_MODULES] = \
+            BinaryModelFormat._create_string_table(modules)
+
+        module_sequences: array = array("Q", [0])
+        sequence_offsets: array = array("Q", [0])
+        token_ids: array = array("i")
+        line_numbers: array = array("i")
+        for module in modules:
+            for sequence_token_ids, sequence_line_numbers in model.token_sequences[module]:
+                token_ids.extend(sequence_token_ids)
+                if model.save_line_numbers:
+                    line_numbers.extend(sequence_line_numbers)
+                sequence_offsets.append(len(token_ids))
+            module_sequences.append(len(sequence_offsets) - 1)
+        sections[SECTION_MODULE_SEQUENCES] = module_sequences.tobytes()
+        sections[SECTION_SEQUENCE_OFFSETS] = sequence_offsets.tobytes()
+        sections[SECTION_TOKEN_IDS] = token_ids.tobytes()
+        sections[SECTION_LINE_NUMBERS] = line_numbers.tobytes()
+
+        flags: int = 0
+        if model.save_line_numbers:
+            flags |= FLAG_LINE_NUMBERS
+        if model.max_order is not None:
+            flags |= FLAG_MAX_ORDER
+
+        header: bytes = HEADER.pack(
+            BINARY_MODEL_MAGIC,
+            BINARY_MODEL_VERSION,
+            BYTE_ORDER_MARKER,
+            flags,
+            model.max_order if model.max_order is not None else 0,
+            model.shortest_sequence_length,
+            model.longest_sequence_length
+        )
+
+        with open(path, "wb") as outfile:
+            offset: int = BinaryModelFormat._align(HEADER.size + SECTION_ENTRY.size * NUMBER_OF_SECTIONS)
+            section_table: bytes = b""
+            for section in sections:
+                section_table += SECTION_ENTRY.pack(offset, len(section))
+                offset = BinaryModelFormat._align(offset + len(section))
+
+            outfile.write(header)
+            outfile.write(section_table)
+            for section in sections:
+                # sections are aligned to 8 bytes, so the arrays can be cast in place after mapping the file
+                outfile.write(b"\0" * (BinaryModelFormat._align(outfile.tell()) - outfile.tell()))
+                outfile.write(section)
+
+    @staticmethod
+    def read(path: str) -> Dict:
+        """
+        Maps the given model file into memory and returns the arguments to create a TokenCountModel from it
+        """
+        with open(path, "rb") as model_file:
+            mapped_file: mmap.mmap = mmap.mmap(model_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, byte_order, flags, max_order, shortest, longest = HEADER.unpack_from(mapped_file, 0)
+        if magic != BINARY_MODEL_MAGIC:
+            raise RuntimeError("{} is not a binary token count model".format(path))
+        if version != BINARY_MODEL_VERSION:
+            raise RuntimeError("Unsupported binary token count model version {}".format(version))
+        if byte_order != BYTE_ORDER_MARKER:
+            raise RuntimeError("The binary token count model was written on a machine with a different byte order")
+
+        view: memoryview = memoryview(mapped_file)
+        sections: List[memoryview] = []
+        for index in range(0, NUMBER_OF_SECTIONS):
+            offset, length = SECTION_ENTRY.unpack_from(mapped_file, HEADER.size + index * SECTION_ENTRY.size)
+            sections.append(view[offset:offset + length])
+
+        module_names: MappedVocabulary = MappedVocabulary(sections[SECTION_MODULE_OFFSETS].cast("Q"),
+                                                          sections[SECTION_MODULES])
+        single_token_counts: memoryview = sections[SECTION_SINGLE_TOKENS].cast("q")
+        save_line_numbers: bool = flags & FLAG_LINE_NUMBERS != 0
+
+        return {
+            "name": str(sections[SECTION_NAME], "utf-8"),
+            "vocabulary": MappedVocabulary(sections[SECTION_VOCABULARY_OFFSETS].cast("Q"),
+                                           sections[SECTION_VOCABULARY]),
+            "single_tokens": {token_id: count for token_id, count in enumerate(single_token_counts) if count > 0},
+            "count_model": MappedCountTrie(sections[SECTION_TRIE_KEYS].cast("Q"),
+                                           sections[SECTION_TRIE_COUNTS].cast("q")),
+            "token_sequences": MappedSequences(
+                module_names.get_tokens(),
+                sections[SECTION_MODULE_SEQUENCES].cast("Q"),
+                sections[SECTION_SEQUENCE_OFFSETS].cast("Q"),
+                sections[SECTION_TOKEN_IDS].cast("i"),
+                sections[SECTION_LINE_NUMBERS].cast("i")
+            ),
+            "shortest_sequence_length": shortest,
+            "longest_sequence_length": longest,
+            "save_line_numbers": save_line_numbers,
+            "max_order": max_order if flags & FLAG_MAX_ORDER else None
+        }
+
+    @staticmethod
+    def _create_string_table(strings: List[str]) -> Tuple[bytes, bytes]:
+        offsets: array = array("Q", [0])
+        data: bytearray = bytearray()
+        for string in strings:
+            data += string.encode("utf-8")
+            offsets.append(len(data))
+        return offsets.tobytes(), bytes(data)
+
+    @staticmethod
+    def _create_sorted_trie_arrays(count_model) -> Tuple[array, array]:
+        """
+        Renumbers the trie nodes in breadth first order with children sorted by token id.
+        Thereby the (parent node, token id) keys are sorted and the key at index i belongs to node i + 1
+        """
+        children: List[List[Tuple[int, int, int]]] = [[]]
+        for node, parent, token_id, count in count_model.nodes():
+            children[parent].append((token_id, node, count))
+            children.append([])
+
+        keys: array = array("Q")
+        counts: array = array("q")
+        # old node ids in breadth first order, the new id of a node is its position in the queue
+        queue: List[int] = [0]
+        index: int = 0
+        while index < len(queue):
+            old_node: int = queue[index]
+            for token_id, child, count in sorted(children[old_node]):
+                keys.append((index << 32) | token_id)
+                counts.append(count)
+                queue.append(child)
+            children[old_node] = None
+            index += 1
+        return keys, counts
+
+    @staticmethod
+    def _align(offset: int) -> int:
+        return (offset + 7) & ~7
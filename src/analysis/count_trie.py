@@ -0,0 +1,192 @@
+from array import array
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+ROOT_NODE: int = 0
+
+
+class CountTrie:
+    """
+    Prefix trie that counts token id sequences. Nodes are identified by integers and the children of a node
+    are found by hashing the node id together with the token id, so the count of a prefix extended
+    by a single token is a single dict lookup once the node of the prefix is known
+    """
+
+    def __init__(self) -> None:
+        self._parents: array = array("i", [-1])
+        self._tokens: array = array("i", [-1])
+        self._counts: array = array("q", [0])
+        self._children: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        """
+        Returns the number of counted distinct sequences
+        """
+        return len(self._counts) - 1
+
+    def count(self, prefix_ids, next_id: int = None) -> int:
+        """
+        Returns how often the given sequence of token ids, optionally extended by next_id, occurs
+        """
+        node: int = self.get_node(prefix_ids)
+        if node is None:
+            return 0
+        if next_id is not None:
+            return self.child_count(node, next_id)
+        return self._counts[node]
+
+    def get_node(self, token_ids, node: int = ROOT_NODE) -> int:
+        """
+        Returns the node for the given token id path or None if the path was never counted
+        """
+        children: Dict[int, int] = self._children
+        for token_id in token_ids:
+            node = children.get(CountTrie._get_key(node, token_id), None)
+            if node is None:
+                return None
+        return node
+
+    def child_count(self, node: int, token_id: int) -> int:
+        child: int = self._children.get(CountTrie._get_key(node, token_id), None)
+        if child is None:
+            return 0
+        return self._counts[child]
+
+    def get_count_of_node(self, node: int) -> int:
+        return self._counts[node]
+
+    def add_subsequences(self, token_ids, max_order: int = None) -> None:
+        """
+        Counts every subsequence of the given token ids. If max_order is given,
+        only subsequences up to that length are counted
+        """
+        for index in range(0, len(token_ids)):
+            if max_order is None:
+                self.add_sequence(token_ids, index)
+            else:
+                self.add_sequence(token_ids, index, index + max_order)
+
+    def add_sequence(self, token_ids, start: int = 0, end: int = None) -> None:
+        """
+        Counts the sequence token_ids[start:end] and all of its prefixes once
+        """
+        if end is None or end > len(token_ids):
+            end = len(token_ids)
+
+        children: Dict[int, int] = self._children
+        counts: array = self._counts
+        node: int = ROOT_NODE
+        for index in range(start, end):
+            token_id: int = token_ids[index]
+            key: int = CountTrie._get_key(node, token_id)
+            child: int = children.get(key, None)
+            if child is None:
+                child = self._add_node(key, node, token_id)
+            counts[child] += 1
+            node = child
+
+    def add_trie(self, other, token_map: List[int] = None, factor: int = 1) -> None:
+        """
+        Adds the counts of another trie multiplied by factor, so a factor of -1 subtracts them.
+        The token map converts the token ids of the other trie into the token ids of this trie
+        """
+        # maps the nodes of the other trie to the nodes of this trie
+        node_map: Dict[int, int] = {ROOT_NODE: ROOT_NODE}
+        for node, parent, token_id, count in other.nodes():
+            if token_map is not None:
+                token_id = token_map[token_id]
+            parent = node_map[parent]
+            key: int = CountTrie._get_key(parent, token_id)
+            child: int = self._children.get(key, None)
+            if child is None:
+                child = self._add_node(key, parent, token_id)
+            self._counts[child] += count * factor
+            if self._counts[child] < 0:
+                raise RuntimeError("Can not subtract a count that is not contained in the trie")
+            node_map[node] = child
+
+    def contains_trie(self, other, token_map: List[int] = None) -> bool:
+        """
+        Checks if every sequence of another trie is contained in this trie at least as often,
+        so its counts can be subtracted
+        """
+        node_map: Dict[int, int] = {ROOT_NODE: ROOT_NODE}
+        for node, parent, token_id, count in other.nodes():
+            if token_map is not None:
+                token_id = token_map[token_id]
+            child: int = self._children.get(CountTrie._get_key(node_map[parent], token_id), None)
+            if child is None or self._counts[child] < count:
+                return False
+            node_map[node] = child
+        return True
+
+    def remove_empty_nodes(self) -> None:
+        """
+        Rebuilds the trie without nodes whose count dropped to zero.
+        As a sequence is never counted more often than its prefix, their children are empty as well
+        """
+        trie: CountTrie = CountTrie()
+        node_map: Dict[int, int] = {ROOT_NODE: ROOT_NODE}
+        for node, parent, token_id, count in self.nodes():
+            if count > 0 and parent in node_map:
+                new_parent: int = node_map[parent]
+                child: int = trie._add_node(CountTrie._get_key(new_parent, token_id), new_parent, token_id)
+                trie._counts[child] = count
+                node_map[node] = child
+        self._parents = trie._parents
+        self._tokens = trie._tokens
+        self._counts = trie._counts
+        self._children = trie._children
+
+    def nodes(self):
+        """
+        Yields tuples of (node, parent node, token id, count), parents are yielded before their children
+        """
+        for node in range(1, len(self._counts)):
+            yield node, self._parents[node], self._tokens[node], self._counts[node]
+
+    def items(self):
+        """
+        Yields tuples of (token ids, count) for every counted sequence
+        """
+        paths: List[Tuple[int, ...]] = [()]
+        for node in range(1, len(self._counts)):
+            # parents are always created before their children
+            path: Tuple[int, ...] = paths[self._parents[node]] + (self._tokens[node],)
+            paths.append(path)
+            yield path, self._counts[node]
+
+    def to_json(self) -> Dict[str, List[int]]:
+        return {
+            "parents": self._parents.tolist(),
+            "tokens": self._tokens.tolist(),
+            "counts": self._counts.tolist()
+        }
+
+    @staticmethod
+    def from_json(json_trie: Dict[str, List[int]]) -> "CountTrie":
+        trie: CountTrie = CountTrie()
+        trie._parents = array("i", json_trie["parents"])
+        trie._tokens = array("i", json_trie["tokens"])
+        trie._counts = array("q", json_trie["counts"])
+        for node in range(1, len(trie._counts)):
+            trie._children[CountTrie._get_key(trie._parents[node], trie._tokens[node])] = node
+        return trie
+
+    @staticmethod
+    def is_json_trie(json_trie) -> bool:
+        return isinstance(json_trie, dict) and "parents" in json_trie and "tokens" in json_trie \
+            and "counts" in json_trie
+
+    def _add_node(self, key: int, parent: int, token_id: int) -> int:
+        node: int = len(self._counts)
+        self._parents.append(parent)
+        self._tokens.append(token_id)
+        self._counts.append(0)
+        self._children[key] = node
+        return node
+
+    @staticmethod
+    def _get_key(node: int, token_id: int) -> int:
+        return (node << 32) | token_id
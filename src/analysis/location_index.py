@@ -0,0 +1,115 @@
+from array import array
+from heapq import merge
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+# token id that follows the last token of a sequence in the keys of the index
+END_OF_SEQUENCE: int = -1
+# number of positions of a key from which longer windows are looked up in a sub-index by the full window
+WINDOW_INDEX_THRESHOLD: int = 64
+
+
+class LocationIndex:
+    """
+    Index of the locations of token id windows. Every position of every sequence is stored under the key of
+    its token id and the following one, so the occurrences of a window are found with a single lookup
+    and a comparison of the candidates with the rest of the window.
+    Windows of any length are queried, so the positions are not keyed by full windows of every length up front.
+    Instead, if a key has more than WINDOW_INDEX_THRESHOLD positions, e.g. a common bigram of control flow tokens,
+    the first query of a longer window sorts them into a sub-index by the full window of that length.
+    This scan costs O(positions of the key) once per key and window length, later queries are hash lookups
+    """
+
+    def __init__(self, token_sequences: Dict[str, List[Tuple[array, array]]] = None) -> None:
+        self._modules: List[str] = []
+        self._sequences: List[Tuple[array, array]] = []
+        # maps the key of two token ids to the positions, packed as sequence index and offset
+        self._positions: Dict[int, array] = {}
+        # maps a token id to the keys of all positions that start with it
+        self._keys_by_token: Dict[int, List[int]] = {}
+        # sub-indexes of the positions of frequent keys by (key, window length) and the full window
+        self._window_positions: Dict[Tuple[int, int], Dict[Tuple[int, ...], array]] = {}
+
+        if token_sequences is not None:
+            for module, sequences in token_sequences.items():
+                for token_ids, line_numbers in sequences:
+                    self.add_sequence(module, token_ids, line_numbers)
+
+    def add_sequence(self, module: str, token_ids, line_numbers) -> None:
+        sequence_index: int = len(self._sequences)
+        if len(self._window_positions) > 0:
+            self._window_positions = {}
+        self._modules.append(module)
+        self._sequences.append((token_ids, line_numbers))
+
+        positions_by_key: Dict[int, array] = self._positions
+        sequence_length: int = len(token_ids)
+        for offset in range(0, sequence_length):
+            token_id: int = token_ids[offset]
+            next_id: int = token_ids[offset + 1] if offset + 1 < sequence_length else END_OF_SEQUENCE
+            key: int = LocationIndex._get_key(token_id, next_id)
+            positions: array = positions_by_key.get(key, None)
+            if positions is None:
+                positions = array("q")
+                positions_by_key[key] = positions
+                self._keys_by_token.setdefault(token_id, []).append(key)
+            positions.append((sequence_index << 32) | offset)
+
+    def get_locations(self, window: Tuple[int, ...]) -> Dict[str, List[int]]:
+        """
+        Returns the line numbers of all occurrences of the window, in the form of module: [line number]
+        """
+        if len(window) == 0:
+            return {}
+
+        # windows of up to two tokens are matched by their key, longer ones are compared with the candidates
+        compare_window: bool = len(window) > 2
+        if len(window) == 1:
+            # positions of the keys are sorted, so merging them keeps the order of the sequences
+            positions = merge(*[self._positions[key] for key in self._keys_by_token.get(window[0], [])])
+        else:
+            key: int = LocationIndex._get_key(window[0], window[1])
+            positions = self._positions.get(key, [])
+            if compare_window and len(positions) > WINDOW_INDEX_THRESHOLD:
+                positions = self._get_window_positions(key, len(window)).get(window, [])
+                compare_window = False
+
+        output: Dict[str, List[int]] = {}
+        window_length: int = len(window)
+        for position in positions:
+            sequence_index: int = position >> 32
+            offset: int = position & 0xFFFFFFFF
+            token_ids, line_numbers = self._sequences[sequence_index]
+            if compare_window and tuple(token_ids[offset:offset + window_length]) != window:
+                continue
+
+            module: str = self._modules[sequence_index]
+            if output.get(module, None) is None:
+                output[module] = [line_numbers[offset]]
+            else:
+                output[module].append(line_numbers[offset])
+        return output
+
+    def _get_window_positions(self, key: int, window_length: int) -> Dict[Tuple[int, ...], array]:
+        """
+        Returns the positions of the given key by the window of the given length that starts at them
+        """
+        window_positions: Dict[Tuple[int, ...], array] = self._window_positions.get((key, window_length), None)
+        if window_positions is None:
+            window_positions = {}
+            for position in self._positions[key]:
+                token_ids, _ = self._sequences[position >> 32]
+                offset: int = position & 0xFFFFFFFF
+                window: Tuple[int, ...] = tuple(token_ids[offset:offset + window_length])
+                positions: array = window_positions.get(window, None)
+                if positions is None:
+                    positions = array("q")
+                    window_positions[window] = positions
+                positions.append(position)
+            self._window_positions[(key, window_length)] = window_positions
+        return window_positions
+
+    @staticmethod
+    def _get_key(token_id: int, next_id: int) -> int:
+        return (token_id << 32) | (next_id - END_OF_SEQUENCE)
@@ -1,9 +1,18 @@
+import math
 from decimal import Decimal
 from typing import Dict
 from typing import List
+from typing import Tuple
+from typing import Union
 
 from .token_count_model import TokenCountModel
 
+# log probabilities of a sequence are summed up as float64
+PRECISION_DOUBLE: str = "double"
+# log probabilities of a sequence are summed up with math.fsum, which avoids rounding errors of long sums
+PRECISION_EXACT: str = "exact"
+PRECISION_MODES: List[str] = [PRECISION_DOUBLE, PRECISION_EXACT]
+
 
 class NGramModel():
 
@@ -13,34 +22,109 @@ class NGramModel():
         gram_size: int,
         max_sequence_length: int,
         minimum_token_occurrence: int,
+        precision: str = PRECISION_DOUBLE,
+        use_decimal: bool = False
     ) -> None:
         self.token_count_model: TokenCountModel = token_count_model
         self.gram_size: int = gram_size
         self.max_sequence_length: int = max_sequence_length
         self.minimum_token_occurrence: int = minimum_token_occurrence
-        self.model: Dict[str, Decimal] = {}
+        if precision not in PRECISION_MODES:
+            raise RuntimeError("Unknown precision mode {}".format(precision))
+        self.precision: str = precision
+        # reproduces the probabilities of earlier versions, which are rounded to 4 digits in every step
+        self.use_decimal: bool = use_decimal
+        # maps sequences of token ids to their log probability, or their probability if use_decimal is set
+        self.model: Dict[Tuple[int, ...], Union[float, Decimal]] = {}
+        # maximum overestimation of the used subsequence counts, None if the counts are exact
+        self.count_error_bound: int = token_count_model.get_count_error_bound()
     
 
     def build(self):
         """
         Builds the n gram language model and calculates the probabilities for all sequences
         """
+        self.check_token_count_model()
         split_sequences: List = self._split_sequences()
         for sequence in split_sequences:
             if self._sequence_contains_invalid_token(sequence):
                 continue
 
-            sequence_string: str = self._get_sequence_string(sequence)
-            if sequence_string not in self.model:
-                probability: Decimal = self._calculate_sequence_probability(sequence)
-                self.model[sequence_string] = probability
+            sequence_key: Tuple[int, ...] = tuple(sequence)
+            if sequence_key not in self.model:
+                if self.use_decimal:
+                    self.model[sequence_key] = self._calculate_sequence_probability(sequence_key)
+                else:
+                    self.model[sequence_key] = self._calculate_sequence_log_probability(sequence_key)
+
+    def check_token_count_model(self) -> None:
+        """
+        Checks if the token count model can be used for the gram size of this model
+        """
+        if not self.token_count_model.supports_gram_size(self.gram_size):
+            raise RuntimeError("The token count model only contains subsequences up to a length of {} "
+                               "and can not be used with gram size {}"
+                               .format(self.token_count_model.max_order, self.gram_size))
+
+        if self.count_error_bound is not None:
+            print("Using approximate token counts, which are overestimated by at most {}"
+                  .format(self.count_error_bound))
+
+    def get_prefix(self, sequence: Tuple[int, ...], index: int) -> Tuple[int, ...]:
+        """
+        Returns the prefix of the token at index, which consists of up to n - 1 tokens in front of it, but at least one
+        """
+        return sequence[max(0, index - max(1, self.gram_size - 1)):index]
+
+    def get_single_probability(self, token: int) -> Union[float, Decimal]:
+        """
+        Returns the (log) probability of a token at the start of a sequence
+        """
+        if self.use_decimal:
+            return self._calculate_single_probability(token)
+
+        all_token_count: int = self.token_count_model.get_number_of_single_tokens(self.minimum_token_occurrence)
+        token_count: int = self.token_count_model.get_token_count((token,))
+        if token_count == 0:
+            return -math.inf
+        return math.log(token_count / all_token_count)
+
+    def get_conditional_probability(self, token: int, prefix: Tuple[int, ...]) -> Union[float, Decimal]:
+        """
+        Returns the (log) probability of a token following the given prefix
+        """
+        if self.use_decimal:
+            return self._calculate_relative_frequency(token, prefix)
+
+        combined_count, prefix_count = self._get_counts(token, prefix)
+        if combined_count == 0:
+            return -math.inf
+        return math.log(combined_count / prefix_count)
+
+    def format_probability(self, probability: Union[float, Decimal]) -> str:
+        """
+        Returns the string representation of a probability of the model.
+        Log probabilities are printed in scientific notation, which does not underflow for very small probabilities
+        """
+        if self.use_decimal:
+            return str(probability)
+        if probability == -math.inf:
+            return "0"
+
+        log10_probability: float = probability / math.log(10)
+        exponent: int = math.floor(log10_probability)
+        mantissa: float = 10 ** (log10_probability - exponent)
+        if round(mantissa, 4) >= 10:
+            mantissa /= 10
+            exponent += 1
+        return "{:.4f}e{}".format(mantissa, exponent)
     
-    def _sequence_contains_invalid_token(self, sequence: List[str]) -> bool:
+    def _sequence_contains_invalid_token(self, sequence: List[int]) -> bool:
         """
         Checks if sequence contains a token that does not fulfill the minimum token occurrence
         """
         for token in sequence:
-            token_count: int = self.token_count_model.get_token_count(token)
+            token_count: int = self.token_count_model.get_token_count((token,))
             if token_count < self.minimum_token_occurrence:
                 return True
         return False
@@ -50,9 +134,9 @@ class NGramModel():
         Splits sequences which are longer than the max. sequence length into smaller sequences
         by using a sliding window procedure
         """
-        sequences: List[List[str]] = self.token_count_model.get_sequence_list_without_meta_data()
+        sequences: List[List[int]] = self.token_count_model.get_sequence_list_without_meta_data()
         max: int = self.max_sequence_length
-        split_sequences: List[List[str]] = []
+        split_sequences: List[List[int]] = []
 
         for sequence in iter(sequences):
             if len(sequence) > max:
@@ -62,31 +146,49 @@ class NGramModel():
 
         return split_sequences
 
-    def _hard_split_sequence(self, sequence: List[str], sequence_list: List[List[str]]) -> None:
+    def _hard_split_sequence(self, sequence: List[int], sequence_list: List[List[int]]) -> None:
         for i in range(0, len(sequence), max):
             sequence_list.append(sequence[i:i + max])
     
-    def _split_sequence_with_sliding_window(self, sequence: List[str], sequence_list: List[List[str]]) -> None:
+    def _split_sequence_with_sliding_window(self, sequence: List[int], sequence_list: List[List[int]]) -> None:
         for i in range(0, len(sequence) - self.max_sequence_length):
             sequence_list.append(sequence[i:i + self.max_sequence_length])
 
-    def _calculate_relative_frequency(self, token: str, prefix: str) -> Decimal:
-        combined: str = prefix + token
-        combined_count = self.token_count_model.get_token_count(combined)
-        prefix_count = self.token_count_model.get_token_count(prefix)
+    def _get_counts(self, token: int, prefix: Tuple[int, ...]) -> Tuple[int, int]:
+        """
+        Returns the count of the prefix extended by the token and the count of the prefix
+        """
+        prefix_node: int = self.token_count_model.count_model.get_node(prefix)
+        combined_count: int = self.token_count_model.count_model.child_count(prefix_node, token)
+        prefix_count: int = self.token_count_model.count_model.get_count_of_node(prefix_node)
+        return combined_count, prefix_count
+
+    def _calculate_sequence_log_probability(self, sequence: Tuple[int, ...]) -> float:
+        """
+        Calculates the log probability of a sequence as the sum of the log probabilities of its tokens
+        """
+        log_probabilities: List[float] = [self.get_single_probability(sequence[0])]
+        for i in range(1, len(sequence)):
+            log_probabilities.append(self.get_conditional_probability(sequence[i], self.get_prefix(sequence, i)))
+
+        if self.precision == PRECISION_EXACT:
+            return math.fsum(log_probabilities)
+        return sum(log_probabilities)
+
+    def _calculate_relative_frequency(self, token: int, prefix: Tuple[int, ...]) -> Decimal:
+        combined_count, prefix_count = self._get_counts(token, prefix)
         relative_frequency: Decimal = Decimal(str(combined_count /  prefix_count)).quantize(Decimal('1e-4'))
         return relative_frequency
     
-    def _calculate_single_probability(self, token: str) -> Decimal:
+    def _calculate_single_probability(self, token: int) -> Decimal:
         all_token_count: int = self.token_count_model.get_number_of_single_tokens(self.minimum_token_occurrence)
-        token_count: int = self.token_count_model.get_token_count(token)
+        token_count: int = self.token_count_model.get_token_count((token,))
         probability: Decimal = Decimal(str(token_count/all_token_count)).quantize(Decimal('1e-4'))
         return probability
     
-    def _calculate_sequence_probability(self, sequence: List[str]) -> Decimal:
-        current_token: str = sequence[0]
-        current_prefix: str = sequence[0]
-        index_of_prefix_to_remove: str = 0
+    def _calculate_sequence_probability(self, sequence: Tuple[int, ...]) -> Decimal:
+        current_token: int = sequence[0]
+        current_prefix: Tuple[int, ...] = (sequence[0],)
         number_of_prefixes: int = 1
 
         if __debug__:
@@ -107,24 +209,10 @@ class NGramModel():
 
             # if the prefix does not have the length of n - 1 of the n-gram, just append the next token to it
             if number_of_prefixes < self.gram_size - 1:
-                current_prefix += current_token
+                current_prefix += (current_token,)
                 number_of_prefixes += 1
             else:
-                # cut the first token of the prefix
-                current_prefix = current_prefix[len(sequence[index_of_prefix_to_remove]):len(current_prefix)]
-                # set the new prefix to remove to the token which comes next in the sequence
-                index_of_prefix_to_remove += 1
-                # append the current token to the prefix
-                current_prefix += current_token
+                # cut the first token of the prefix and append the current token to it
+                current_prefix = current_prefix[1:] + (current_token,)
         
         return probability
-    
-    def _get_sequence_string(self, sequence: List[str]) -> str:
-        output: str = ""
-        for token in sequence:
-            output += token
-        return output
-                
-        
-
-    
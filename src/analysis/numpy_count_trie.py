@@ -0,0 +1,167 @@
+import logging
+from bisect import bisect_right
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger("main")
+
+
+class NumpyCountTrie:
+    """
+    Vectorized alternative to the CountTrie which offers the same queries.
+    All windows of one order are counted at once with np.unique. A window of order k is packed into a single
+    64 bit key from the rank of its prefix window among the sorted keys of order k - 1 and its last token id,
+    so the keys are exact and the sorted keys of every order form one level of a trie.
+    A node is identified by the offset of its order plus its rank and children are found by binary search
+    """
+
+    def __init__(self, keys: List, counts: List, vocabulary_size: int) -> None:
+        self._keys: List = keys
+        self._counts: List = counts
+        self._vocabulary_size: int = vocabulary_size
+        # node id of the first node of every order, the root is node 0
+        self._order_offsets: List[int] = [1]
+        for order_keys in keys:
+            self._order_offsets.append(self._order_offsets[-1] + len(order_keys))
+
+    @staticmethod
+    def is_available() -> bool:
+        return np is not None
+
+    @staticmethod
+    def build(sequences: List, vocabulary_size: int, max_order: int = None) -> "NumpyCountTrie":
+        """
+        Counts all subsequences of the given token id sequences up to max_order
+        """
+        if np is None:
+            raise RuntimeError("NumPy is required for vectorized counting")
+
+        lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int64)
+        total_length: int = int(lengths.sum()) if len(lengths) else 0
+        if total_length == 0:
+            return NumpyCountTrie([], [], vocabulary_size)
+
+        tokens = np.concatenate([np.frombuffer(sequence, dtype=np.intc) for sequence in sequences if len(sequence)])
+        tokens = tokens.astype(np.int64)
+        # number of tokens from every position to the end of its sequence
+        sequence_ends = np.repeat(np.cumsum(lengths), lengths)
+        remaining = sequence_ends - np.arange(total_length, dtype=np.int64)
+
+        if max_order is None:
+            max_order = int(lengths.max())
+
+        keys: List = []
+        counts: List = []
+        ranks = None
+        for order in range(1, max_order + 1):
+            starts = np.nonzero(remaining >= order)[0]
+            if len(starts) == 0:
+                break
+
+            if order == 1:
+                order_keys = tokens
+            else:
+                order_keys = ranks[starts] * vocabulary_size + tokens[starts + order - 1]
+            unique_keys, inverse, order_counts = np.unique(order_keys, return_inverse=True, return_counts=True)
+
+            ranks = np.full(total_length, -1, dtype=np.int64)
+            ranks[starts] = inverse.reshape(-1)
+            keys.append(unique_keys)
+            counts.append(order_counts.astype(np.int64))
+
+        return NumpyCountTrie(keys, counts, vocabulary_size)
+
+    def __len__(self) -> int:
+        return self._order_offsets[-1] - 1
+
+    def get_single_token_counts(self) -> Dict[int, int]:
+        if len(self._keys) == 0:
+            return {}
+        return {int(token_id): int(count) for token_id, count in zip(self._keys[0], self._counts[0])}
+
+    def count(self, prefix_ids, next_id: int = None) -> int:
+        node: int = self.get_node(prefix_ids)
+        if node is None:
+            return 0
+        if next_id is not None:
+            return self.child_count(node, next_id)
+        return self.get_count_of_node(node)
+
+    def get_node(self, token_ids, node: int = 0) -> int:
+        for token_id in token_ids:
+            node = self._find_child(node, token_id)
+            if node is None:
+                return None
+        return node
+
+    def child_count(self, node: int, token_id: int) -> int:
+        child: int = self._find_child(node, token_id)
+        if child is None:
+            return 0
+        return self.get_count_of_node(child)
+
+    def get_count_of_node(self, node: int) -> int:
+        if node == 0:
+            return 0
+        order, rank = self._get_order_and_rank(node)
+        return int(self._counts[order][rank])
+
+    def nodes(self):
+        """
+        Yields tuples of (node, parent node, token id, count), parents are yielded before their children
+        """
+        for order in range(0, len(self._keys)):
+            parent_offset: int = self._order_offsets[order - 1] if order > 0 else 0
+            for rank, (key, count) in enumerate(zip(self._keys[order].tolist(), self._counts[order].tolist())):
+                if order == 0:
+                    parent: int = 0
+                    token_id: int = key
+                else:
+                    parent = parent_offset + key // self._vocabulary_size
+                    token_id = key % self._vocabulary_size
+                yield self._order_offsets[order] + rank, parent, token_id, count
+
+    def items(self):
+        paths: List[Tuple[int, ...]] = [()]
+        for node, parent, token_id, count in self.nodes():
+            path: Tuple[int, ...] = paths[parent] + (token_id,)
+            paths.append(path)
+            yield path, count
+
+    def to_json(self) -> Dict[str, List[int]]:
+        parents: List[int] = [-1]
+        tokens: List[int] = [-1]
+        counts: List[int] = [0]
+        for _, parent, token_id, count in self.nodes():
+            parents.append(parent)
+            tokens.append(token_id)
+            counts.append(count)
+        return {"parents": parents, "tokens": tokens, "counts": counts}
+
+    def _get_order_and_rank(self, node: int) -> Tuple[int, int]:
+        order: int = bisect_right(self._order_offsets, node) - 1
+        return order, node - self._order_offsets[order]
+
+    def _find_child(self, node: int, token_id: int) -> int:
+        if node == 0:
+            order: int = 0
+            key: int = token_id
+        else:
+            parent_order, rank = self._get_order_and_rank(node)
+            order = parent_order + 1
+            key = rank * self._vocabulary_size + token_id
+
+        if order >= len(self._keys) or token_id >= self._vocabulary_size:
+            return None
+
+        order_keys = self._keys[order]
+        index: int = int(np.searchsorted(order_keys, key))
+        if index < len(order_keys) and order_keys[index] == key:
+            return self._order_offsets[order] + index
+        return None
@@ -0,0 +1,145 @@
+import math
+from decimal import Decimal
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Union
+
+from .token_count_model import TokenCountModel
+from .n_gram_model import NGramModel
+from .n_gram_model import PRECISION_DOUBLE
+from .n_gram_model import PRECISION_EXACT
+
+
+class ParameterSweep:
+    """
+    Builds the n-gram models of one gram size for all combinations of sequence length and minimum token occurrence
+    in a single pass over the sequences. The probability of a token given its prefix only depends on the gram size,
+    so it is calculated once and the probabilities of the windows of all sequence lengths that start at the same
+    position are extended incrementally from the shorter ones. The models equal the ones built separately
+    """
+
+    def __init__(
+        self,
+        token_count_model: TokenCountModel,
+        gram_size: int,
+        sequence_lengths: List[int],
+        minimum_token_occurrences: List[int],
+        precision: str = PRECISION_DOUBLE,
+        use_decimal: bool = False
+    ) -> None:
+        self.token_count_model: TokenCountModel = token_count_model
+        self.gram_size: int = gram_size
+        self.sequence_lengths: List[int] = [length for length in sequence_lengths if length >= gram_size]
+        self.minimum_token_occurrences: List[int] = minimum_token_occurrences
+        self.precision: str = precision
+        self.use_decimal: bool = use_decimal
+        # maps (minimum token occurrence, sequence length) to the model of that combination
+        self.models: Dict[Tuple[int, int], NGramModel] = {}
+        # memoized probabilities of a token given its prefix
+        self._conditional_probabilities: Dict[Tuple[Tuple[int, ...], int], Union[float, Decimal]] = {}
+
+    def build(self) -> List[NGramModel]:
+        """
+        Builds and returns the models of all combinations, ordered by minimum token occurrence and sequence length
+        """
+        for minimum_token_occurrence in self.minimum_token_occurrences:
+            for sequence_length in self.sequence_lengths:
+                self.models[(minimum_token_occurrence, sequence_length)] = NGramModel(
+                    self.token_count_model,
+                    self.gram_size,
+                    sequence_length,
+                    minimum_token_occurrence,
+                    self.precision,
+                    self.use_decimal
+                )
+        if len(self.models) == 0:
+            return []
+
+        next(iter(self.models.values())).check_token_count_model()
+        # models that calculate the probabilities of the first token of a window for every minimum token occurrence
+        single_token_models: List[Tuple[int, NGramModel]] = [
+            (minimum_token_occurrence, self.models[(minimum_token_occurrence, self.sequence_lengths[0])])
+            for minimum_token_occurrence in self.minimum_token_occurrences
+        ]
+
+        for sequence in self.token_count_model.get_sequence_list_without_meta_data():
+            if len(sequence) == 0:
+                continue
+            for start, window_lengths in ParameterSweep._get_windows(len(sequence), self.sequence_lengths).items():
+                self._add_windows(sequence, start, window_lengths, single_token_models)
+
+        return list(self.models.values())
+
+    def _add_windows(self, sequence, start: int, window_lengths: List[Tuple[int, int]],
+                     single_token_models: List[Tuple[int, NGramModel]]) -> None:
+        """
+        Adds the windows of the given lengths that start at the same position to the models of their sequence length
+        """
+        window: Tuple[int, ...] = tuple(sequence[start:start + max(length for _, length in window_lengths)])
+        # the least count of a token within the first tokens of the window
+        minimum_counts: List[int] = []
+        for token in window:
+            token_count: int = self.token_count_model.get_token_count((token,))
+            minimum_counts.append(token_count if len(minimum_counts) == 0 else min(minimum_counts[-1], token_count))
+
+        conditional_probabilities: List[Union[float, Decimal]] = []
+        for minimum_token_occurrence, single_token_model in single_token_models:
+            valid_window_lengths: List[Tuple[int, int]] = [
+                (sequence_length, length) for sequence_length, length in window_lengths
+                if minimum_counts[length - 1] >= minimum_token_occurrence
+            ]
+            if len(valid_window_lengths) == 0:
+                continue
+
+            probabilities: List[Union[float, Decimal]] = [single_token_model.get_single_probability(window[0])]
+            for length in range(len(conditional_probabilities) + 1, valid_window_lengths[-1][1]):
+                conditional_probabilities.append(self._get_conditional_probability(single_token_model, window, length))
+            for index in range(1, valid_window_lengths[-1][1]):
+                probabilities.append(self._combine(probabilities[-1], conditional_probabilities[index - 1]))
+
+            for sequence_length, length in valid_window_lengths:
+                model: NGramModel = self.models[(minimum_token_occurrence, sequence_length)]
+                sequence_key: Tuple[int, ...] = window[:length]
+                if sequence_key not in model.model:
+                    if self.precision == PRECISION_EXACT and not self.use_decimal:
+                        model.model[sequence_key] = math.fsum(
+                            [probabilities[0]] + conditional_probabilities[:length - 1])
+                    else:
+                        model.model[sequence_key] = probabilities[length - 1]
+
+    def _get_conditional_probability(self, model: NGramModel, window: Tuple[int, ...],
+                                     index: int) -> Union[float, Decimal]:
+        token: int = window[index]
+        prefix: Tuple[int, ...] = model.get_prefix(window, index)
+        key: Tuple[Tuple[int, ...], int] = (prefix, token)
+        probability: Union[float, Decimal] = self._conditional_probabilities.get(key, None)
+        if probability is None:
+            probability = model.get_conditional_probability(token, prefix)
+            self._conditional_probabilities[key] = probability
+        return probability
+
+    def _combine(self, probability: Union[float, Decimal],
+                 conditional_probability: Union[float, Decimal]) -> Union[float, Decimal]:
+        if self.use_decimal:
+            return probability * conditional_probability
+        return probability + conditional_probability
+
+    @staticmethod
+    def _get_windows(sequence_length: int, max_sequence_lengths: List[int]) -> Dict[int, List[Tuple[int, int]]]:
+        """
+        Returns the windows of every maximum sequence length, which are created by the sliding window procedure
+        of the n-gram model, grouped by their start as a list of (maximum sequence length, window length),
+        sorted by window length
+        """
+        windows: Dict[int, List[Tuple[int, int]]] = {}
+        for max_sequence_length in max_sequence_lengths:
+            if sequence_length > max_sequence_length:
+                for start in range(0, sequence_length - max_sequence_length):
+                    windows.setdefault(start, []).append((max_sequence_length, max_sequence_length))
+            else:
+                windows.setdefault(0, []).append((max_sequence_length, sequence_length))
+
+        for window_lengths in windows.values():
+            window_lengths.sort(key=lambda item: item[1])
+        return dict(sorted(windows.items()))
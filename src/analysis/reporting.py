@@ -1,12 +1,15 @@
+import heapq
 import logging
 from decimal import Decimal
 import os
 from typing import Tuple
 from typing import Dict
 from typing import List
-from itertools import islice
+from typing import Union
 from ..utils import Utils
 from .n_gram_model import NGramModel
+from .vocabulary import Vocabulary
+from .location_index import LocationIndex
 
 logger = logging.getLogger("main")
 
@@ -15,13 +18,14 @@ class ReportingService():
     def __init__(
         self,
         language_model: NGramModel,
-        token_sequences: Dict,
+        location_index: LocationIndex,
         reporting_size: int
     ) -> None:
         self.language_model: NGramModel = language_model
+        self.vocabulary: Vocabulary = language_model.token_count_model.vocabulary
         self.reporting_size: int = reporting_size
-        self.token_sequences: Dict[str, List[Tuple[str, int]]] = self._convert_token_sequences(token_sequences)
-        self.report: List[Tuple[str, Decimal, List[str]]] = []
+        self.location_index: LocationIndex = location_index
+        self.report: List[Tuple[str, Union[float, Decimal], List[str]]] = []
     
     def __str__(self) -> str:
         if len(self.report) == 0:
@@ -33,28 +37,31 @@ class ReportingService():
             self.language_model.max_sequence_length,
             self.language_model.minimum_token_occurrence
             )
+        if self.language_model.count_error_bound is not None:
+            output += "Approximate Counts: overestimated by at most {}\n".format(self.language_model.count_error_bound)
         output += "-------------------------------------------------------\n\n"
         for entry in self.report:
             output += entry[0]
             output += "\n"
-            output += "\tProbability: {}\n".format(entry[1])
+            output += "\tProbability: {}\n".format(self.language_model.format_probability(entry[1]))
             output += "\tModules:\n"
             for key, starting_lines in entry[2].items():
                 output += "\t\t{} in line(s): {}\n".format(key, Utils.get_list_string(starting_lines))
             output += "\n-------------------------------------------------------\n\n"
         return output
 
-    def generate_report(self) -> List[Tuple[str, Decimal, List[str]]]:
+    def generate_report(self) -> List[Tuple[str, Union[float, Decimal], List[str]]]:
         """
         Retruns a list that contains report entries in the form of a tuple in the form of 
         (sequence string, probability, corresponding modules).
         """
-        report: List[Tuple[str, Decimal, List[str]]] = []
-        extracted_sequences: List[Tuple[str, Decimal]] = self._extract_sequences_with_lowest_probability()
+        report: List[Tuple[str, Union[float, Decimal], List[str]]] = []
+        extracted_sequences: List[Tuple[Tuple[int, ...], Union[float, Decimal]]] = \
+            self._extract_sequences_with_lowest_probability()
 
         for value in extracted_sequences:
             corresponding_modules = self._get_corresponding_modules(value[0])
-            report_entry = (value[0], value[1], corresponding_modules)
+            report_entry = (self.vocabulary.get_sequence_string(value[0]), value[1], corresponding_modules)
             report.append(report_entry)
         
         self.report = report
@@ -72,55 +79,23 @@ class ReportingService():
             raise RuntimeError("Could not save report!")
 
     
-    def _get_corresponding_modules(self, sub_sequence: str) -> List[Tuple[str, int, int]]:
+    def _get_corresponding_modules(self, sub_sequence: Tuple[int, ...]) -> Dict[str, List[int]]:
         """
-        Returns the modules in which a sequence occurs including occurrences and string line number.
+        Returns the modules in which a sequence occurs including the line numbers of its occurrences.
         The format is module: [line number]
         """
-        output: Dict[str, List[str]] = {}
-        for key in self.token_sequences:
-            for sequence in self.token_sequences[key]:
-                if sub_sequence in sequence[0]:
-                    if output.get(key, None) is None:
-                        output[key] = [sequence[1]]
-                    else:
-                        output[key].append(sequence[1])
-        return output
-
-    def _extract_sequences_with_lowest_probability(self) -> List[Tuple[str, Decimal]]:
-        """
-        Sorts the dict of sequences by probability and returns the sequences with the lowest probability
-        """
-        sorted_by_probability: Dict = self._sort_by_probability(self.language_model.model)
-        
-        if (len(sorted_by_probability) <= self.reporting_size):
-            return list(sorted_by_probability.items())
-        else:
-            return list(islice(sorted_by_probability.items(), self.reporting_size))
+        return self.location_index.get_locations(sub_sequence)
 
-    
-    def _sort_by_probability(self, probability_dict: Dict) -> Dict:
-        return {k: v for k, v in sorted(probability_dict.items(), key=lambda item: item[1])}
-
-    def _convert_token_sequences(self, token_sequences: Dict) -> Dict[str, List[Tuple[str, int]]]:
+    def _extract_sequences_with_lowest_probability(self) -> List[Tuple[Tuple[int, ...], Union[float, Decimal]]]:
         """
-        Converts a Dict which contains the sequences as List of tokens to a Dict
-        which contains tuples with the sequences as strings and the starting line number
+        Returns the sequences with the lowest probability without sorting the whole model.
+        Sequences with the same probability are ordered by the sorted ranks of their tokens, so the report
+        does not depend on the order in which the files were tokenized
         """
-        output: Dict[str, List[Tuple[str, int]]] = {}
-
-        for key in token_sequences:
-            output[key] = []
+        model: Dict[Tuple[int, ...], Union[float, Decimal]] = self.language_model.model
+        if len(model) == 0 or self.reporting_size <= 0:
+            return []
 
-            for sequence in token_sequences[key]:
-                sequence_string = self._get_sequence_string(sequence)
-                starting_line_number = sequence[0][1]
-                output[key].append((sequence_string, starting_line_number))
-
-        return output
-    
-    def _get_sequence_string(self, sequence: List[Tuple[str, int]]) -> str:
-        output: str = ""
-        for token in sequence:
-            output += token[0]
-        return output
\ No newline at end of file
+        ranks: List[int] = self.vocabulary.get_token_ranks()
+        return heapq.nsmallest(self.reporting_size, model.items(),
+                               key=lambda item: (item[1], tuple(ranks[token_id] for token_id in item[0])))
@@ -1,22 +1,51 @@
 import os
+import gc
 import logging
+import multiprocessing
 from typing import List
 from typing import Dict
+from typing import Iterable
+from typing import Iterator
 from typing import Tuple
 from datetime import datetime
 
 from .reporting import ReportingService
 from .n_gram_model import NGramModel
+from .n_gram_model import PRECISION_DOUBLE
+from .parameter_sweep import ParameterSweep
 from .token_count_model import TokenCountModel
+from .approximate_count_store import DEFAULT_MAX_HEAVY_HITTERS
+from .binary_model import BinaryModelFormat
 from ..config import RunnerConfig
 from ..utils import Utils
+from ..syntax_tree_cache import SyntaxTreeCache
 from ..type_retrieval.preprocessed_type_caches import TypeCache
 from ..type_retrieval.project_preprocessor import TypePreprocessor
+from ..type_retrieval.type_cache_store import TypeCacheStore
 from ..tokenization.tokenizer import Tokenizer
 from ..tokenization.type_tokenizer import TypeTokenizer
+from ..tokenization.dual_tokenizer import DualTokenizer
+from ..tokenization.token_cache import TokenCache
 
 logger = logging.getLogger("main")
 
+# number of leading counters that describe the type inference of a file and are kept in the token cache,
+# the type query hits and misses only describe the work of the run that tokenized the file
+NUMBER_OF_INFERENCE_COUNTERS: int = 4
+
+# caches of a tokenization worker process, set by the pool initializer
+_worker_type_cache: TypeCache = None
+_worker_syntax_tree_cache: SyntaxTreeCache = None
+_worker_token_cache: TokenCache = None
+
+# settings of an analysis worker process, set by the pool initializer
+_worker_runner_config: RunnerConfig = None
+_worker_reporting_size: int = None
+_worker_probability_precision: str = None
+_worker_decimal_probabilities: bool = None
+# memory mapped token count models of an analysis worker process by their file
+_worker_count_models: Dict[str, TokenCountModel] = {}
+
 
 class AnalysisRunner:
 
@@ -25,19 +54,42 @@ class AnalysisRunner:
         token_count_model: TokenCountModel,
         config: RunnerConfig,
         reporting_size: int,
-        project_path: str
+        project_path: str,
+        jobs: int = 1,
+        token_cache: TokenCache = None,
+        use_numpy: bool = False,
+        approximate_error: float = None,
+        max_heavy_hitters: int = DEFAULT_MAX_HEAVY_HITTERS,
+        probability_precision: str = PRECISION_DOUBLE,
+        decimal_probabilities: bool = False,
+        stream: bool = False,
+        token_count_model_path: str = None
     ) -> None:
         self.token_count_model: TokenCountModel = token_count_model
+        # file from which the given token count model was loaded
+        self.token_count_model_path: str = token_count_model_path
         self.reporting_size: int = reporting_size
         self.config: RunnerConfig = config
         self.project_path: str = project_path
+        self.jobs: int = jobs
+        self.token_cache: TokenCache = token_cache
+        self.use_numpy: bool = use_numpy
+        self.approximate_error: float = approximate_error
+        self.max_heavy_hitters: int = max_heavy_hitters
+        self.probability_precision: str = probability_precision
+        self.decimal_probabilities: bool = decimal_probabilities
+        # count the sequences while the project is tokenized
+        self.stream: bool = stream
 
         if not os.path.isdir(config.analysis_result_folder):
             config.analysis_result_folder = os.path.join(os.getcwd(), "..", "..")
 
         self._typed_count_model: TokenCountModel = None
         self._untyped_count_model: TokenCountModel = None
+        self._typed_count_model_path: str = None
+        self._untyped_count_model_path: str = None
         self._current_saving_folder: str = None
+        self._syntax_tree_cache: SyntaxTreeCache = None
     
     def start(self):
         """
@@ -46,50 +98,166 @@ class AnalysisRunner:
         result_folder: str = self._generate_result_folder_path()
         self._current_saving_folder = result_folder
         os.mkdir(self._current_saving_folder)
+        self._syntax_tree_cache = SyntaxTreeCache()
 
+        # every run consists of the token count model, the folder for its reports and the file of the model
+        runs: List[Tuple[str, TokenCountModel, str, str]] = []
         if self._maybe_create_count_models():
             if self.config.untyped:
-                print("Starting untyped analysis run...")
-                self._current_saving_folder = os.path.join(result_folder, "untyped")
-                os.mkdir(self._current_saving_folder)
-                self.do_analysis_run(self._untyped_count_model)
+                saving_folder: str = os.path.join(result_folder, "untyped")
+                os.mkdir(saving_folder)
+                runs.append(("untyped", self._untyped_count_model, saving_folder, self._untyped_count_model_path))
 
             if self.config.typed:
-                print("Starting typed analysis run...")
-                self._current_saving_folder = os.path.join(result_folder, "typed")
-                os.mkdir(self._current_saving_folder)
-                self.do_analysis_run(self._typed_count_model)
+                saving_folder: str = os.path.join(result_folder, "typed")
+                os.mkdir(saving_folder)
+                runs.append(("typed", self._typed_count_model, saving_folder, self._typed_count_model_path))
+        else:
+            max_gram_size: int = max(self.config.gram_sizes)
+            if not self.token_count_model.supports_gram_size(max_gram_size):
+                logger.error("The loaded token count model was built for gram sizes up to {}, but the run needs {}"
+                             .format(self.token_count_model.max_order, max_gram_size))
+                raise RuntimeError("Token count model does not support the configured gram sizes")
+            runs.append(("typed", self.token_count_model, result_folder, self._get_loaded_binary_model_path()))
+        self._syntax_tree_cache = None
+
+        if self.jobs > 1:
+            self._do_parallel_analysis_runs(runs)
         else:
-            print("Starting typed analysis run...")
-            self.do_analysis_run(self.token_count_model)
+            for run_name, token_count_model, saving_folder, _ in runs:
+                print("Starting {} analysis run...".format(run_name))
+                self._current_saving_folder = saving_folder
+                self.do_analysis_run(token_count_model)
+
+    def _get_loaded_binary_model_path(self) -> str:
+        """
+        Returns the file of the loaded token count model if the analysis workers can map it directly.
+        Models loaded from a JSON export are saved as binary file before the parallel runs
+        """
+        if self.token_count_model_path is not None and BinaryModelFormat.is_binary_model(self.token_count_model_path):
+            return self.token_count_model_path
+        return None
+
+    def _do_parallel_analysis_runs(self, runs: List[Tuple[str, TokenCountModel, str, str]]) -> None:
+        """
+        Runs the sweeps of all gram sizes of all runs on a process pool. The workers memory map the token count
+        models from their binary files, so the pages of a model are shared instead of every worker holding a copy.
+        The most expensive sweeps are started first, so they do not end up last
+        """
+        jobs: List[Tuple[int, Tuple[str, int, str]]] = []
+        for run_name, token_count_model, saving_folder, model_path in runs:
+            if token_count_model.is_approximate():
+                print("Approximate token count models can not be shared with other processes. "
+                      "Starting {} analysis run...".format(run_name))
+                self._current_saving_folder = saving_folder
+                self.do_analysis_run(token_count_model)
+                continue
+
+            if model_path is None:
+                model_path = os.path.join(saving_folder, "{}_count_model.pgm".format(token_count_model.name))
+                token_count_model.save_to_file(model_path)
+
+            sequence_lengths: List[int] = [len(sequence)
+                                           for sequence in token_count_model.get_sequence_list_without_meta_data()]
+            for gram_size in self.config.gram_sizes:
+                cost: int = AnalysisRunner._estimate_sweep_cost(sequence_lengths, gram_size,
+                                                                self.config.sequence_lengths,
+                                                                self.config.minimum_token_occurrences)
+                jobs.append((cost, (model_path, gram_size, saving_folder)))
+
+        if len(jobs) == 0:
+            return
+
+        jobs.sort(key=lambda job: job[0], reverse=True)
+        print("Starting {} analysis sweeps with {} processes...".format(len(jobs), self.jobs))
+        pool = multiprocessing.Pool(min(self.jobs, len(jobs)), initializer=AnalysisRunner._init_analysis_worker,
+                                    initargs=(self.config, self.reporting_size, self.probability_precision,
+                                              self.decimal_probabilities))
+        with pool:
+            for file_names in pool.imap_unordered(AnalysisRunner._run_sweep_in_worker, [job for _, job in jobs]):
+                for file_name in file_names:
+                    print("Saved report as {}.txt".format(file_name))
+
+    @staticmethod
+    def _estimate_sweep_cost(sequence_lengths: List[int], gram_size: int, max_sequence_lengths: List[int],
+                             minimum_token_occurrences: List[int]) -> int:
+        """
+        Estimates the cost of a sweep by the number of tokens in the windows of all its n-gram models
+        """
+        cost: int = 0
+        for max_sequence_length in max_sequence_lengths:
+            if max_sequence_length < gram_size:
+                continue
+            for sequence_length in sequence_lengths:
+                if sequence_length > max_sequence_length:
+                    cost += (sequence_length - max_sequence_length) * max_sequence_length
+                else:
+                    cost += sequence_length
+        return cost * len(minimum_token_occurrences)
+
+    @staticmethod
+    def _init_analysis_worker(config: RunnerConfig, reporting_size: int, probability_precision: str,
+                              decimal_probabilities: bool) -> None:
+        global _worker_runner_config, _worker_reporting_size, _worker_probability_precision
+        global _worker_decimal_probabilities
+        _worker_runner_config = config
+        _worker_reporting_size = reporting_size
+        _worker_probability_precision = probability_precision
+        _worker_decimal_probabilities = decimal_probabilities
+
+    @staticmethod
+    def _run_sweep_in_worker(job: Tuple[str, int, str]) -> List[str]:
+        """
+        Builds the n-gram models of one gram size and saves their reports. Returns the names of the reports
+        """
+        model_path, gram_size, saving_folder = job
+        token_count_model: TokenCountModel = _worker_count_models.get(model_path, None)
+        if token_count_model is None:
+            token_count_model = TokenCountModel.load_from_file(model_path)
+            _worker_count_models[model_path] = token_count_model
+
+        gram_models: List[NGramModel] = AnalysisRunner.build_n_gram_models(
+            token_count_model,
+            gram_size,
+            _worker_runner_config.sequence_lengths,
+            _worker_runner_config.minimum_token_occurrences,
+            _worker_probability_precision,
+            _worker_decimal_probabilities
+        )
+        file_names: List[str] = []
+        for gram_model in gram_models:
+            report: ReportingService = AnalysisRunner.create_report(token_count_model, gram_model,
+                                                                    _worker_reporting_size)
+            file_names.append(AnalysisRunner._save_report(report, saving_folder,
+                                                          _worker_runner_config.report_name_prefix))
+        return file_names
 
     def do_analysis_run(self, token_count_model: TokenCountModel) -> None:
         """
         Runs the analysis for a specified token count model by creating n-gram models
-        for every combination of the specified parameters
-        """
-        gram_sizes: List[int] = self.config.gram_sizes
-        sequence_lengths: List[int] = self.config.sequence_lengths
-        min_token_counts: List[int] = self.config.minimum_token_occurrences
-
-        for min_token_count in min_token_counts:
-            for gram_size in gram_sizes:
-                for sequence_length in sequence_lengths:
-                    
-                    if sequence_length >= gram_size:
-                        gram_model: NGramModel = AnalysisRunner.build_n_gram_model(
-                            token_count_model,
-                            gram_size, 
-                            sequence_length,
-                            min_token_count
-                        )
-                        report: ReportingService = AnalysisRunner.create_report(token_count_model, gram_model,
-                                                                                self.reporting_size)
-                        self.save_report(report)
+        for every combination of the specified parameters. The models of one gram size are built in a single sweep
+        """
+        for gram_size in self.config.gram_sizes:
+            gram_models: List[NGramModel] = AnalysisRunner.build_n_gram_models(
+                token_count_model,
+                gram_size,
+                self.config.sequence_lengths,
+                self.config.minimum_token_occurrences,
+                self.probability_precision,
+                self.decimal_probabilities
+            )
+            for gram_model in gram_models:
+                report: ReportingService = AnalysisRunner.create_report(token_count_model, gram_model,
+                                                                        self.reporting_size)
+                self.save_report(report)
 
     def save_report(self, report: ReportingService):
-        prefix = self.config.report_name_prefix
+        file_name: str = AnalysisRunner._save_report(report, self._current_saving_folder,
+                                                     self.config.report_name_prefix)
+        print("Saved report as {}.txt".format(file_name))
 
+    @staticmethod
+    def _save_report(report: ReportingService, saving_folder: str, prefix: str) -> str:
         if prefix is None or prefix == "":
             prefix = "pygram_report"
 
@@ -99,8 +267,8 @@ class AnalysisRunner:
             report.language_model.max_sequence_length,
             report.language_model.minimum_token_occurrence
         )
-        report.save_to_file(self._current_saving_folder, file_name)
-        print("Saved report as {}.txt".format(file_name))
+        report.save_to_file(saving_folder, file_name)
+        return file_name
 
     def _generate_result_folder_path(self, index=0) -> str:
         result_folder_name: str = "Pygram Analysis - {}".format(datetime.now().strftime("%d.%m %H:%M"))
@@ -120,67 +288,177 @@ class AnalysisRunner:
         """
         if self.token_count_model is not None:
             return False
-        
+
+        if self.config.untyped and self.config.typed:
+            (self._untyped_count_model, self._untyped_count_model_path), \
+                (self._typed_count_model, self._typed_count_model_path) = self._create_count_models_in_one_pass()
+            return True
+
         if self.config.untyped:
-            project_name, sequences = AnalysisRunner.tokenize_project(self.project_path, False)
-            file_name: str = "{}_count_model_untyped.json".format(project_name)
-            save_path: str = os.path.join(self._current_saving_folder, file_name)
-            self._untyped_count_model = AnalysisRunner.create_and_save_count_model(project_name, sequences, save_path)
-        
+            self._untyped_count_model, self._untyped_count_model_path = self._create_count_model(False)
+
         if self.config.typed:
-            project_name, sequences = AnalysisRunner.tokenize_project(self.project_path, True)
-            file_name: str = "{}_count_model_typed.json".format(project_name)
-            save_path: str = os.path.join(self._current_saving_folder, file_name)
-            self._typed_count_model = AnalysisRunner.create_and_save_count_model(project_name, sequences, save_path)
-        
+            self._typed_count_model, self._typed_count_model_path = self._create_count_model(True)
+
         return True
             
+    def _create_count_model(self, typed: bool) -> Tuple[TokenCountModel, str]:
+        """
+        Creates and saves the un-/typed token count model. Returns the model and its file,
+        which is None if the model could not be saved
+        """
+        max_order: int = max(self.config.gram_sizes)
+        project_name: str = os.path.basename(self.project_path)
+        save_path: str = self._get_count_model_path(typed)
+
+        if self.stream:
+            count_model: TokenCountModel = AnalysisRunner.stream_and_save_count_model(
+                self.project_path, typed, self.jobs, self._syntax_tree_cache, self.token_cache, save_path, max_order,
+                self.use_numpy, self.approximate_error, self.max_heavy_hitters)
+        else:
+            _, sequences = AnalysisRunner.tokenize_project(self.project_path, typed, self.jobs,
+                                                           self._syntax_tree_cache, self.token_cache)
+            count_model: TokenCountModel = AnalysisRunner.create_and_save_count_model(
+                project_name, sequences, save_path, max_order, self.use_numpy, self.approximate_error,
+                self.max_heavy_hitters)
+
+        return AnalysisRunner._with_saved_path(count_model, save_path)
+
+    def _create_count_models_in_one_pass(self) -> Tuple[Tuple[TokenCountModel, str], Tuple[TokenCountModel, str]]:
+        """
+        Creates and saves the untyped and the typed token count model out of a single tokenization of the project.
+        Returns both in the form of ((untyped model, file), (typed model, file))
+        """
+        max_order: int = max(self.config.gram_sizes)
+        project_name: str = os.path.basename(self.project_path)
+        untyped_save_path: str = self._get_count_model_path(False)
+        typed_save_path: str = self._get_count_model_path(True)
+
+        if self.stream:
+            untyped_count_model, typed_count_model = AnalysisRunner.stream_and_save_count_models(
+                self.project_path, self.jobs, self._syntax_tree_cache, self.token_cache, untyped_save_path,
+                typed_save_path, max_order, self.use_numpy, self.approximate_error, self.max_heavy_hitters)
+        else:
+            _, untyped_sequences, typed_sequences = AnalysisRunner.tokenize_project_in_one_pass(
+                self.project_path, self.jobs, self._syntax_tree_cache, self.token_cache)
+            untyped_count_model: TokenCountModel = AnalysisRunner.create_and_save_count_model(
+                project_name, untyped_sequences, untyped_save_path, max_order, self.use_numpy,
+                self.approximate_error, self.max_heavy_hitters)
+            typed_count_model: TokenCountModel = AnalysisRunner.create_and_save_count_model(
+                project_name, typed_sequences, typed_save_path, max_order, self.use_numpy, self.approximate_error,
+                self.max_heavy_hitters)
+
+        return (AnalysisRunner._with_saved_path(untyped_count_model, untyped_save_path),
+                AnalysisRunner._with_saved_path(typed_count_model, typed_save_path))
+
+    def _get_count_model_path(self, typed: bool) -> str:
+        project_name: str = os.path.basename(self.project_path)
+        file_name: str = "{}_count_model_{}.pgm".format(project_name, "typed" if typed else "untyped")
+        return os.path.join(self._current_saving_folder, file_name)
+
+    @staticmethod
+    def _with_saved_path(count_model: TokenCountModel, save_path: str) -> Tuple[TokenCountModel, str]:
+        """
+        Returns the model along with its file, which is None for approximate models as they are not saved
+        """
+        if count_model.is_approximate():
+            return count_model, None
+        return count_model, save_path
+
     @staticmethod
-    def tokenize_project(directory: str, typed: bool) -> Tuple[str, Dict]:
+    def tokenize_project(directory: str, typed: bool, jobs: int = 1, syntax_tree_cache: SyntaxTreeCache = None,
+                         token_cache: TokenCache = None) -> Tuple[str, Dict]:
         """
-        Tokenises a specified project 
+        Tokenises a specified project. If more than one job is given, the files are distributed
+        over a process pool and the results are merged in file order.
+        If a token cache is given, only files that changed since the last run are tokenized
         """
         sequence_list: Dict[str, List[List[Tuple[str, int]]]] = {}
+        for path_within_project, file_tokens in AnalysisRunner.iterate_project(directory, typed, jobs,
+                                                                               syntax_tree_cache, token_cache):
+            sequence_list[path_within_project] = file_tokens
+        return os.path.basename(directory), sequence_list
+
+    @staticmethod
+    def tokenize_project_in_one_pass(directory: str, jobs: int = 1, syntax_tree_cache: SyntaxTreeCache = None,
+                                     token_cache: TokenCache = None) -> Tuple[str, Dict, Dict]:
+        """
+        Tokenises a specified project with the untyped and the typed tokenizer in a single traversal
+        of every syntax tree. Returns (project name, untyped sequences, typed sequences)
+        """
+        untyped_sequence_list: Dict[str, List[List[Tuple[str, int]]]] = {}
+        typed_sequence_list: Dict[str, List[List[Tuple[str, int]]]] = {}
+        for path_within_project, (untyped_tokens, typed_tokens) in AnalysisRunner.iterate_project(
+                directory, True, jobs, syntax_tree_cache, token_cache, dual=True):
+            untyped_sequence_list[path_within_project] = untyped_tokens
+            typed_sequence_list[path_within_project] = typed_tokens
+        return os.path.basename(directory), untyped_sequence_list, typed_sequence_list
+
+    @staticmethod
+    def iterate_project(directory: str, typed: bool, jobs: int = 1, syntax_tree_cache: SyntaxTreeCache = None,
+                        token_cache: TokenCache = None, stream_sequences: bool = False,
+                        dual: bool = False) -> Iterator[Tuple[str, Iterable[List[Tuple[str, int]]]]]:
+        """
+        Tokenises a specified project and yields the token sequences of every file in the form of
+        (path within project, sequences) as soon as the file is processed.
+        If stream_sequences is set, files that are tokenized in this process yield their sequences as generator,
+        which has to be consumed before the next file is processed.
+        If dual is set together with typed, every file is tokenized once for both modes
+        and the sequences are yielded as (untyped sequences, typed sequences)
+        """
         python_files = Utils.get_all_python_files_in_directory(directory)
         counter: int = len(python_files)
-        directory_name = os.path.basename(directory)
         type_cache: TypeCache = None
-
-        total_number_of_call_tokens: int = 0
-        number_of_type_inferred_call_tokens: int = 0
-
-        total_number_of_assigns: int = 0
-        number_of_annotated_assigns: int = 0
+        # type inferred call tokens, call tokens, annotated assigns, assigns, type query hits, type query misses
+        counters: List[int] = [0, 0, 0, 0, 0, 0]
         print("Starting to tokenize project...\nDetected {} Python files".format(counter))
 
         if typed:
             print("Preprocessing the project for types...")
-            preprocessor: TypePreprocessor = TypePreprocessor(directory)
+            type_cache_store: TypeCacheStore = None
+            if token_cache is not None:
+                # the preprocessed types are cached along with the tokens
+                type_cache_store = TypeCacheStore(token_cache.cache_directory, directory)
+            preprocessor: TypePreprocessor = TypePreprocessor(directory, syntax_tree_cache, type_cache_store, jobs)
             type_cache: TypeCache = preprocessor.process_project()
 
-        for (index, file) in enumerate(python_files):
-            print("[{}/{}] Processing \"{}\"".format(index + 1, counter, file))
-            path: os.path = os.path.abspath(file)
-
-            if os.path.isfile(path):
-                path_within_project: str = Utils.get_only_project_path(directory, path)
-                module_path: str = Utils.generate_dotted_module_path(path_within_project)
-
-                if typed:
-                    tokenizer: TypeTokenizer = TypeTokenizer(path, module_path, type_cache)
+        if jobs is not None and jobs > 1:
+            print("Tokenizing with {} processes".format(jobs))
+            tasks: List[Tuple[str, str, bool, bool]] = [(directory, file, typed, dual) for file in python_files]
+            # the frozen type cache is inherited by forked workers. Objects that exist before the fork are hidden
+            # from the garbage collector of the workers, so its pages are shared instead of copied
+            gc.freeze()
+            pool = multiprocessing.Pool(jobs, initializer=AnalysisRunner._init_tokenize_worker,
+                                        initargs=(type_cache, syntax_tree_cache, token_cache))
+            gc.unfreeze()
+            with pool:
+                chunk_size: int = max(1, counter // (jobs * 4))
+                results = pool.imap(AnalysisRunner._tokenize_file_in_worker, tasks, chunksize=chunk_size)
+                for (index, result) in enumerate(results):
+                    print("[{}/{}] Processed \"{}\"".format(index + 1, counter, python_files[index]))
+                    if result is not None:
+                        path_within_project, file_tokens, file_counters = result
+                        AnalysisRunner._add_counters(counters, file_counters)
+                        yield path_within_project, file_tokens
+        else:
+            for (index, file) in enumerate(python_files):
+                print("[{}/{}] Processing \"{}\"".format(index + 1, counter, file))
+                if stream_sequences and token_cache is None and not dual:
+                    result = AnalysisRunner._stream_file(directory, file, typed, type_cache, syntax_tree_cache,
+                                                         counters)
+                    if result is not None:
+                        yield result
                 else:
-                    tokenizer: Tokenizer = Tokenizer(path, module_path)
-                file_tokens: List[List[Tuple[str, int]]] = tokenizer.process_file()
-
-                if typed:
-                    number_of_type_inferred_call_tokens += tokenizer.number_of_type_inferred_call_tokens
-                    total_number_of_call_tokens += tokenizer.number_of_call_tokens
-                    number_of_annotated_assigns += tokenizer.number_of_ann_assigns
-                    total_number_of_assigns += tokenizer.number_of_assigns
-
-                sequence_list[path_within_project] = file_tokens
+                    result = AnalysisRunner._tokenize_file(directory, file, typed, type_cache, syntax_tree_cache,
+                                                           token_cache, dual)
+                    if result is not None:
+                        path_within_project, file_tokens, file_counters = result
+                        AnalysisRunner._add_counters(counters, file_counters)
+                        yield path_within_project, file_tokens
 
         if typed:
+            number_of_type_inferred_call_tokens, total_number_of_call_tokens, number_of_annotated_assigns, \
+                total_number_of_assigns, type_query_hits, type_query_misses = counters
             print("Total number of call tokens: {}".format(total_number_of_call_tokens))
             print("Number of type inferred call tokens: {}".format(number_of_type_inferred_call_tokens))
             print("Type inference success: {}\n".format(
@@ -190,23 +468,207 @@ class AnalysisRunner:
             print("Number of annotated assigns: {}".format(number_of_annotated_assigns))
             print("Percentage of annotated variable assignments: {}".format(
                 str(number_of_annotated_assigns / total_number_of_assigns)))
+            print("Memoized type queries: {} of {}".format(type_query_hits, type_query_hits + type_query_misses))
         print("Finished tokenization process")
-        return directory_name, sequence_list
+
+    @staticmethod
+    def _add_counters(counters: List[int], file_counters: Tuple[int, ...]) -> None:
+        for index, count in enumerate(file_counters):
+            counters[index] += count
+
+    @staticmethod
+    def _init_tokenize_worker(type_cache: TypeCache, syntax_tree_cache: SyntaxTreeCache,
+                              token_cache: TokenCache) -> None:
+        """
+        Stores the caches once per worker process, so they are not sent along with every file
+        """
+        global _worker_type_cache, _worker_syntax_tree_cache, _worker_token_cache
+        _worker_type_cache = type_cache
+        _worker_syntax_tree_cache = syntax_tree_cache
+        _worker_token_cache = token_cache
+
+    @staticmethod
+    def _tokenize_file_in_worker(task: Tuple[str, str, bool, bool]) -> Tuple[str, List, Tuple[int, ...]]:
+        directory, file, typed, dual = task
+        return AnalysisRunner._tokenize_file(directory, file, typed, _worker_type_cache, _worker_syntax_tree_cache,
+                                            _worker_token_cache, dual)
+
+    @staticmethod
+    def _stream_file(directory: str, file: str, typed: bool, type_cache: TypeCache,
+                     syntax_tree_cache: SyntaxTreeCache,
+                     counters: List[int]) -> Tuple[str, Iterator[List[Tuple[str, int]]]]:
+        """
+        Like _tokenize_file, but the sequences are yielded by a generator while the file is tokenized.
+        The counters are updated when the generator is exhausted
+        """
+        path: os.path = os.path.abspath(file)
+
+        if not os.path.isfile(path):
+            return None
+
+        path_within_project: str = Utils.get_only_project_path(directory, path)
+        module_path: str = Utils.generate_dotted_module_path(path_within_project)
+        if typed:
+            tokenizer: TypeTokenizer = TypeTokenizer(path, module_path, type_cache, syntax_tree_cache)
+        else:
+            tokenizer: Tokenizer = Tokenizer(path, module_path, syntax_tree_cache)
+        return path_within_project, AnalysisRunner._iterate_file_sequences(tokenizer, typed, counters)
+
+    @staticmethod
+    def _iterate_file_sequences(tokenizer: Tokenizer, typed: bool,
+                                counters: List[int]) -> Iterator[List[Tuple[str, int]]]:
+        yield from tokenizer.iterate_sequences()
+        if typed:
+            AnalysisRunner._add_counters(counters, tokenizer.get_counters())
+
+    @staticmethod
+    def _tokenize_file(directory: str, file: str, typed: bool, type_cache: TypeCache,
+                       syntax_tree_cache: SyntaxTreeCache = None,
+                       token_cache: TokenCache = None,
+                       dual: bool = False) -> Tuple[str, List, Tuple[int, ...]]:
+        """
+        Tokenizes a single file. Returns a tuple in the form of (path within project, file tokens, counters).
+        The counters are (type inferred call tokens, call tokens, annotated assigns, assigns,
+        type query hits, type query misses).
+        If dual is set, the file tokens are (untyped tokens, typed tokens) of a single traversal
+        """
+        path: os.path = os.path.abspath(file)
+
+        if not os.path.isfile(path):
+            return None
+
+        path_within_project: str = Utils.get_only_project_path(directory, path)
+        module_path: str = Utils.generate_dotted_module_path(path_within_project)
+
+        if token_cache is not None:
+            content_hash: str = TokenCache.get_content_hash(path)
+            dependency_signature: str = ""
+            if typed:
+                dependency_signature = type_cache.get_dependency_signature(module_path)
+
+            if dual:
+                cached_untyped_entry = token_cache.load(path_within_project, False, content_hash, "")
+                cached_entry = token_cache.load(path_within_project, True, content_hash, dependency_signature)
+                if cached_untyped_entry is not None and cached_entry is not None:
+                    cached_tokens, cached_counters = cached_entry
+                    return path_within_project, (cached_untyped_entry[0], cached_tokens), \
+                        AnalysisRunner._get_replayed_counters(cached_counters)
+            else:
+                cached_entry = token_cache.load(path_within_project, typed, content_hash, dependency_signature)
+                if cached_entry is not None:
+                    cached_tokens, cached_counters = cached_entry
+                    return path_within_project, cached_tokens, AnalysisRunner._get_replayed_counters(cached_counters)
+
+        if dual:
+            tokenizer: DualTokenizer = DualTokenizer(path, module_path, type_cache, syntax_tree_cache)
+            file_tokens = tokenizer.process_file_streams()
+        else:
+            if typed:
+                tokenizer: TypeTokenizer = TypeTokenizer(path, module_path, type_cache, syntax_tree_cache)
+            else:
+                tokenizer: Tokenizer = Tokenizer(path, module_path, syntax_tree_cache)
+            file_tokens: List[List[Tuple[str, int]]] = tokenizer.process_file()
+
+        counters: Tuple[int, ...] = (0, 0, 0, 0, 0, 0)
+        if typed:
+            counters = tokenizer.get_counters()
+
+        if token_cache is not None and dual and file_tokens[1] is not None:
+            untyped_tokens, typed_tokens = file_tokens
+            token_cache.store(path_within_project, False, content_hash, "", untyped_tokens, (0, 0, 0, 0))
+            token_cache.store(path_within_project, True, content_hash, dependency_signature, typed_tokens,
+                              counters[:NUMBER_OF_INFERENCE_COUNTERS])
+        elif token_cache is not None and not dual and file_tokens is not None:
+            token_cache.store(path_within_project, typed, content_hash, dependency_signature, file_tokens,
+                              counters[:NUMBER_OF_INFERENCE_COUNTERS])
+        return path_within_project, file_tokens, counters
+
+    @staticmethod
+    def _get_replayed_counters(cached_counters: Tuple[int, ...]) -> Tuple[int, ...]:
+        """
+        Returns the counters of a file served from the token cache, which ran no type queries
+        """
+        return tuple(cached_counters[:NUMBER_OF_INFERENCE_COUNTERS]) + (0, 0)
     
     @staticmethod
-    def create_and_save_count_model(project_name: str, sequences: Dict, save_path: str = None) -> TokenCountModel:
+    def create_and_save_count_model(project_name: str, sequences: Dict, save_path: str = None,
+                                    max_order: int = None, use_numpy: bool = False, approximate_error: float = None,
+                                    max_heavy_hitters: int = DEFAULT_MAX_HEAVY_HITTERS) -> TokenCountModel:
+        """
+        Builds a token count model. If a maximum order is given, only subsequences up to that length are counted.
+        If an approximate error is given, the subsequences are counted approximately
+        """
         print("Building token count model...")
-        count_model: TokenCountModel = TokenCountModel(sequences, name=project_name)
+        count_model: TokenCountModel = TokenCountModel.from_token_sequences(sequences, name=project_name,
+                                                                            max_order=max_order, use_numpy=use_numpy,
+                                                                            approximate_error=approximate_error,
+                                                                            max_heavy_hitters=max_heavy_hitters)
         count_model.build()
-        
-        if save_path is not None:
+        AnalysisRunner._save_count_model(count_model, save_path)
+        return count_model
+
+    @staticmethod
+    def stream_and_save_count_model(directory: str, typed: bool, jobs: int = 1,
+                                    syntax_tree_cache: SyntaxTreeCache = None, token_cache: TokenCache = None,
+                                    save_path: str = None, max_order: int = None, use_numpy: bool = False,
+                                    approximate_error: float = None,
+                                    max_heavy_hitters: int = DEFAULT_MAX_HEAVY_HITTERS) -> TokenCountModel:
+        """
+        Tokenizes a project and counts the sequences while they are tokenized, without collecting
+        the token sequences of the whole project first
+        """
+        print("Building token count model while tokenizing...")
+        token_stream = AnalysisRunner.iterate_project(directory, typed, jobs, syntax_tree_cache, token_cache,
+                                                      stream_sequences=True)
+        count_model: TokenCountModel = TokenCountModel.from_token_stream(token_stream,
+                                                                         name=os.path.basename(directory),
+                                                                         max_order=max_order, use_numpy=use_numpy,
+                                                                         approximate_error=approximate_error,
+                                                                         max_heavy_hitters=max_heavy_hitters)
+        AnalysisRunner._save_count_model(count_model, save_path)
+        return count_model
+
+    @staticmethod
+    def stream_and_save_count_models(directory: str, jobs: int = 1, syntax_tree_cache: SyntaxTreeCache = None,
+                                     token_cache: TokenCache = None, untyped_save_path: str = None,
+                                     typed_save_path: str = None, max_order: int = None, use_numpy: bool = False,
+                                     approximate_error: float = None,
+                                     max_heavy_hitters: int = DEFAULT_MAX_HEAVY_HITTERS
+                                     ) -> Tuple[TokenCountModel, TokenCountModel]:
+        """
+        Like stream_and_save_count_model, but the untyped and the typed model are counted from a single
+        tokenization of every file. Returns (untyped model, typed model)
+        """
+        print("Building token count models while tokenizing...")
+        project_name: str = os.path.basename(directory)
+        untyped_count_model: TokenCountModel = TokenCountModel.start_token_stream(
+            project_name, max_order, use_numpy, approximate_error, max_heavy_hitters)
+        typed_count_model: TokenCountModel = TokenCountModel.start_token_stream(
+            project_name, max_order, use_numpy, approximate_error, max_heavy_hitters)
+
+        for module, (untyped_tokens, typed_tokens) in AnalysisRunner.iterate_project(
+                directory, True, jobs, syntax_tree_cache, token_cache, dual=True):
+            untyped_count_model.add_streamed_sequences(module, untyped_tokens)
+            typed_count_model.add_streamed_sequences(module, typed_tokens)
+
+        untyped_count_model.finish_token_stream()
+        typed_count_model.finish_token_stream()
+        AnalysisRunner._save_count_model(untyped_count_model, untyped_save_path)
+        AnalysisRunner._save_count_model(typed_count_model, typed_save_path)
+        return untyped_count_model, typed_count_model
+
+    @staticmethod
+    def _save_count_model(count_model: TokenCountModel, save_path: str) -> None:
+        if save_path is not None and count_model.is_approximate():
+            print("Finished. Token count models with approximate counts are not saved")
+        elif save_path is not None:
             count_model.save_to_file(save_path)
             print("Finished. Saved it to {}".format(save_path))
-        return count_model
-    
+
     @staticmethod
     def build_n_gram_model(token_count_model: TokenCountModel, gram_size: int,
-                           sequence_length: int, min_token_count: int) -> NGramModel:
+                           sequence_length: int, min_token_count: int, precision: str = PRECISION_DOUBLE,
+                           use_decimal: bool = False) -> NGramModel:
         print("Building n-gram model. Gram-size: {}, Sequence length: {}, Min. token count: {}"
         .format(gram_size, sequence_length, min_token_count))
 
@@ -215,16 +677,37 @@ class AnalysisRunner:
             gram_size,
             sequence_length,
             min_token_count,
+            precision,
+            use_decimal
         )
         model.build()
         print("Done.")
         return model
 
+    @staticmethod
+    def build_n_gram_models(token_count_model: TokenCountModel, gram_size: int, sequence_lengths: List[int],
+                            min_token_counts: List[int], precision: str = PRECISION_DOUBLE,
+                            use_decimal: bool = False) -> List[NGramModel]:
+        print("Building n-gram models. Gram-size: {}, Sequence lengths: {}, Min. token counts: {}"
+              .format(gram_size, sequence_lengths, min_token_counts))
+
+        sweep: ParameterSweep = ParameterSweep(
+            token_count_model,
+            gram_size,
+            sequence_lengths,
+            min_token_counts,
+            precision,
+            use_decimal
+        )
+        models: List[NGramModel] = sweep.build()
+        print("Done.")
+        return models
+
     @staticmethod
     def create_report(token_count_model: TokenCountModel, gram_model: NGramModel,
                       reporting_size: int) -> ReportingService:
         print("Generating Report...")
-        report: ReportingService = ReportingService(gram_model, token_count_model.get_sequence_dict(), reporting_size)
+        report: ReportingService = ReportingService(gram_model, token_count_model.get_location_index(), reporting_size)
         report.generate_report()
         print("Finished")
         return report
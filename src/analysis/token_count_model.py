@@ -1,86 +1,216 @@
-
 import json
+import logging
+from array import array
 from typing import Dict
+from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import Tuple
 
+from .vocabulary import Vocabulary
+from .count_trie import CountTrie
+from .binary_model import BinaryModelFormat
+from .numpy_count_trie import NumpyCountTrie
+from .approximate_count_store import ApproximateCountStore
+from .approximate_count_store import DEFAULT_MAX_HEAVY_HITTERS
+from .location_index import LocationIndex
+
+logger = logging.getLogger("main")
+
 class TokenCountModel():
-    
-    def __init__(self, 
+
+    def __init__(self,
         token_sequences=None,
         name="",
         count_model=None,
         single_tokens=None,
         shortest_sequence_length=0,
         longest_sequence_length=0,
-        save_line_numbers: bool = True
+        save_line_numbers: bool = True,
+        vocabulary: Vocabulary = None,
+        max_order: int = None,
+        use_numpy: bool = False,
+        approximate_error: float = None,
+        max_heavy_hitters: int = DEFAULT_MAX_HEAVY_HITTERS
     ):
 
         if count_model is None:
-            self.count_model: Dict[str, int] = {}
+            self.count_model: CountTrie = CountTrie()
         else:
-            self.count_model: Dict[str, int] = count_model
+            self.count_model: CountTrie = count_model
 
         if single_tokens is None:
-            self.single_tokens: Dict[str, int] = {}
+            self.single_tokens: Dict[int, int] = {}
+        else:
+            self.single_tokens: Dict[int, int] = single_tokens
+
+        if vocabulary is None:
+            self.vocabulary: Vocabulary = Vocabulary()
         else:
-            self.single_tokens: Dict[str, int] = single_tokens
-        
-        self.token_sequences: Dict[str, List[Tuple[str, int]]] = token_sequences
+            self.vocabulary: Vocabulary = vocabulary
+
+        # every sequence is stored as a tuple of (token ids, line numbers)
+        self.token_sequences: Dict[str, List[Tuple[array, array]]] = token_sequences
 
         self.name: str = name
         self.shortest_sequence_length: int = shortest_sequence_length
         self.longest_sequence_length: int = longest_sequence_length
         self._number_of_single_tokens_cache: int = None
+        self._location_index: LocationIndex = None
         self.save_line_numbers: bool = save_line_numbers
+        # maximum length of the counted subsequences, None if all subsequences are counted
+        self.max_order: int = max_order
+        self.use_numpy: bool = use_numpy
+        # if set, subsequences are counted approximately with at most this error relative to the total count
+        self.approximate_error: float = approximate_error
+        self.max_heavy_hitters: int = max_heavy_hitters
+
+    @staticmethod
+    def from_token_sequences(token_sequences: Dict[str, List[List[Tuple[str, int]]]], name="",
+                             max_order: int = None, use_numpy: bool = False, approximate_error: float = None,
+                             max_heavy_hitters: int = DEFAULT_MAX_HEAVY_HITTERS) -> "TokenCountModel":
+        """
+        Creates a model from the token sequences of the tokenizer, in the form of {module: [[(token, line number)]]}
+        """
+        vocabulary: Vocabulary = Vocabulary()
+        encoded_sequences: Dict[str, List[Tuple[array, array]]] = vocabulary.encode_sequences(token_sequences)
+        return TokenCountModel(encoded_sequences, name=name, vocabulary=vocabulary, max_order=max_order,
+                               use_numpy=use_numpy, approximate_error=approximate_error,
+                               max_heavy_hitters=max_heavy_hitters)
+
+    @staticmethod
+    def from_token_stream(token_stream: Iterator[Tuple[str, Iterable[List[Tuple[str, int]]]]], name="",
+                          max_order: int = None, use_numpy: bool = False, approximate_error: float = None,
+                          max_heavy_hitters: int = DEFAULT_MAX_HEAVY_HITTERS) -> "TokenCountModel":
+        """
+        Creates and builds a model from a stream of (module, token sequences) in the form of the tokenizer.
+        Every sequence is encoded, counted and added to the location index as soon as it arrives, so the token
+        strings of the project are never kept in memory. The numpy and approximate counting engines need all
+        sequences at once, they count the encoded sequences at the end of the stream
+        """
+        model: TokenCountModel = TokenCountModel.start_token_stream(name, max_order, use_numpy, approximate_error,
+                                                                    max_heavy_hitters)
+        for module, sequences in token_stream:
+            model.add_streamed_sequences(module, sequences)
+        model.finish_token_stream()
+        return model
+
+    @staticmethod
+    def start_token_stream(name="", max_order: int = None, use_numpy: bool = False, approximate_error: float = None,
+                           max_heavy_hitters: int = DEFAULT_MAX_HEAVY_HITTERS) -> "TokenCountModel":
+        """
+        Creates an empty model which is filled by add_streamed_sequences and completed by finish_token_stream,
+        so several models can be fed from the same stream
+        """
+        model: TokenCountModel = TokenCountModel({}, name=name, max_order=max_order, use_numpy=use_numpy,
+                                                 approximate_error=approximate_error,
+                                                 max_heavy_hitters=max_heavy_hitters)
+        model._location_index = LocationIndex()
+        return model
+
+    def add_streamed_sequences(self, module: str, sequences: Iterable[List[Tuple[str, int]]]) -> None:
+        module_sequences: List[Tuple[array, array]] = []
+        self.token_sequences[module] = module_sequences
+        if sequences is None:
+            return
+        for sequence in sequences:
+            token_ids, line_numbers = self.vocabulary.encode_sequence(sequence)
+            module_sequences.append((token_ids, line_numbers))
+            self._location_index.add_sequence(module, token_ids, line_numbers)
+            if self._counts_while_streaming():
+                self._count_sequence(token_ids)
+
+    def finish_token_stream(self) -> None:
+        if not self._counts_while_streaming():
+            self.build()
+
+    def _counts_while_streaming(self) -> bool:
+        return not self.use_numpy and self.approximate_error is None
 
     @staticmethod
     def load_from_file(path) -> "TokenCountModel":
+        """
+        Loads a model from a binary model file, which is memory mapped, or from a JSON export
+        """
+        if BinaryModelFormat.is_binary_model(path):
+            model_arguments: Dict = BinaryModelFormat.read(path)
+            if not model_arguments["save_line_numbers"]:
+                raise RuntimeError("A tokencount model without line numbers serves on ly debug purposes and cannot be imported again.")
+            return TokenCountModel(**model_arguments)
+
         with open(path, 'r') as inputfile:
             model = json.load(inputfile)
             if model is not None:
                 if TokenCountModel._loaded_model_is_valid(model):
-                    saved_line_numbers: bool = model["saved_line_numbers"] == "true"
+                    saved_line_numbers: bool = model["saved_line_numbers"] in (True, "true")
 
                     if not saved_line_numbers:
                         raise RuntimeError("A tokencount model without line numbers serves on ly debug purposes and cannot be imported again.")
 
-                    loaded_token_sequences: Dict = model["token_sequences"]
-                    token_sequences: Dict[str, List[Tuple[str, int]]] = {}
-                    for key, sequences in loaded_token_sequences.items():
-                        token_sequences[key] = []
-                        for sequence in sequences:
-                            converted_sequence: List[str, int] = []
-                            for token in sequence:
-                                converted_sequence.append((token[0], token[1]))
-                            token_sequences[key].append(converted_sequence)
+                    if "vocabulary" not in model or not CountTrie.is_json_trie(model["count_model"]):
+                        return TokenCountModel._load_from_legacy_format(model)
+
+                    vocabulary: Vocabulary = Vocabulary(model["vocabulary"])
+                    token_sequences: Dict[str, List[Tuple[array, array]]] = {}
+                    for key, sequences in model["token_sequences"].items():
+                        token_sequences[key] = [(array("i", sequence[0]), array("i", sequence[1]))
+                                                for sequence in sequences]
 
+                    count_model: CountTrie = CountTrie.from_json(model["count_model"])
+                    single_tokens: Dict[int, int] = {token_id: count for token_id, count in model["single_tokens"]}
 
                     return TokenCountModel(
                         token_sequences=token_sequences,
                         name=model["project"],
-                        count_model=model["count_model"],
+                        count_model=count_model,
                         shortest_sequence_length=model["shortest_sequence_length"],
                         longest_sequence_length=model["longest_sequence_length"],
-                        single_tokens=model["single_tokens"],
-                        save_line_numbers=saved_line_numbers
+                        single_tokens=single_tokens,
+                        save_line_numbers=saved_line_numbers,
+                        vocabulary=vocabulary,
+                        max_order=model.get("max_order", None)
                         )
         return None
-    
+
+    @staticmethod
+    def _load_from_legacy_format(model) -> "TokenCountModel":
+        """
+        Loads a model that was saved by an earlier version, either with token strings instead of token ids
+        or with counts that are not stored as trie. The counts are rebuilt from the sequences
+        """
+        token_sequences: Dict[str, List[List[Tuple[str, int]]]] = {}
+        for key, sequences in model["token_sequences"].items():
+            if "vocabulary" in model:
+                tokens: List[str] = model["vocabulary"]
+                token_sequences[key] = [list(zip([tokens[token_id] for token_id in sequence[0]], sequence[1]))
+                                        for sequence in sequences]
+            else:
+                token_sequences[key] = [[(token[0], token[1]) for token in sequence] for sequence in sequences]
+
+        count_model: TokenCountModel = TokenCountModel.from_token_sequences(token_sequences, name=model["project"])
+        count_model.build()
+        return count_model
 
     def save_to_file(self, path: str) -> None:
-        saved_sequences = self.token_sequences
-        if not self.save_line_numbers:
-            converted_token_sequences: Dict[str, List[List[str]]] = {}
-            for key, value in self.token_sequences.items():
-                converted_token_sequences[key] = []
-                for sequence in value:
-                    converted_sequence: List[str] = []
-                    for token in sequence:
-                        converted_sequence.append(token[0])
-                    converted_token_sequences[key].append(converted_sequence)
-            saved_sequences = converted_token_sequences
+        """
+        Saves the model in the binary model format. If the path ends with .json, the model is exported as JSON
+        """
+        if self.is_approximate():
+            raise RuntimeError("A token count model with approximate counts can not be saved")
+        if path.endswith(".json"):
+            self._export_to_json(path)
+        else:
+            BinaryModelFormat.write(path, self)
 
+    def _export_to_json(self, path: str) -> None:
+        saved_sequences: Dict[str, List[List[List[int]]]] = {}
+        for key, value in self.token_sequences.items():
+            saved_sequences[key] = []
+            for token_ids, line_numbers in value:
+                if self.save_line_numbers:
+                    saved_sequences[key].append([token_ids.tolist(), line_numbers.tolist()])
+                else:
+                    saved_sequences[key].append([token_ids.tolist()])
 
         with open(path, 'w') as outfile:
             json.dump({
@@ -88,94 +218,242 @@ class TokenCountModel():
             "saved_line_numbers": self.save_line_numbers,
             "shortest_sequence_length": self.shortest_sequence_length,
             "longest_sequence_length": self.longest_sequence_length,
-            "single_tokens": self.single_tokens,
+            "max_order": self.max_order,
+            "vocabulary": self.vocabulary.get_tokens(),
+            "single_tokens": list(self.single_tokens.items()),
             "token_sequences": saved_sequences,
-            "count_model": self.count_model
+            "count_model": self.count_model.to_json()
             }, outfile)
 
-    
+
     def build(self) -> None:
         """
-        Builds the intermediate token count model. 
+        Builds the intermediate token count model.
         This means creating all respective subsequences of a token sequence and counting them.
+        If a maximum order is set, only subsequences up to that length are counted.
+        """
+        if self.approximate_error is not None:
+            self._build_approximately()
+            return
+
+        if self.use_numpy:
+            if NumpyCountTrie.is_available():
+                self._build_with_numpy()
+                return
+            logger.warning("NumPy is not installed, falling back to counting without it")
+
+        for value in self.token_sequences:
+            for token_ids, _ in self.token_sequences[value]:
+                self._count_sequence(token_ids)
+
+    def _count_sequence(self, token_ids: array) -> None:
+        self._update_sequence_metrics(token_ids)
+        for token in token_ids:
+            self._count_single_token(token)
+        # count all subsequences of the whole sequence
+        self.count_model.add_subsequences(token_ids, self.max_order)
+
+    def merge(self, other: "TokenCountModel") -> None:
+        """
+        Adds the counts and sequences of another model, e.g. of a shard of the same project that was built separately
         """
-        for value in self.token_sequences: 
-            for sequence in self.token_sequences[value]:
-                self._update_sequence_metrics(sequence)
-                for (index, token_and_line_no) in enumerate(sequence):
-                    # add initial token
-                    self._count_single_token(token_and_line_no[0])
-                    token_sub_sequence = token_and_line_no[0]
-                    # build subsequences of the whole sequence
-                    for count in range(index + 1, len(sequence)):
-                        token_sub_sequence += sequence[count][0]
-                        self._count_token(token_sub_sequence)
+        self._check_max_order(other)
+        self._materialize()
+        token_map: List[int] = [self.vocabulary.add_token(token) for token in other.vocabulary.get_tokens()]
 
-    def get_sequence_list_without_meta_data(self) -> List[List[str]]:
+        self.count_model.add_trie(other.count_model, token_map)
+        for token_id, count in other.single_tokens.items():
+            token_id = token_map[token_id]
+            self.single_tokens[token_id] = self.single_tokens.get(token_id, 0) + count
+
+        for module, sequences in other.token_sequences.items():
+            if module not in self.token_sequences:
+                self.token_sequences[module] = []
+            for token_ids, line_numbers in sequences:
+                mapped_token_ids: array = array("i", [token_map[token_id] for token_id in token_ids])
+                self.token_sequences[module].append((mapped_token_ids, array("i", line_numbers)))
+
+        for length in (other.shortest_sequence_length, other.longest_sequence_length):
+            if length > 0:
+                self._update_sequence_length_metrics(length)
+        self._number_of_single_tokens_cache = None
+        self._location_index = None
+
+    def subtract(self, other: "TokenCountModel") -> None:
         """
-        Returns sequence list without any module or line number information
+        Removes the counts and sequences of another model, whose modules must be contained in this model.
+        Together with merge this allows to swap out the model of changed modules without rebuilding everything
         """
-        output: List = []
+        self._check_max_order(other)
+        for module in other.token_sequences:
+            if module not in self.token_sequences:
+                raise RuntimeError("Can not subtract model, module {} is not part of the model".format(module))
+
+        self._materialize()
+        token_map: List[int] = []
+        for token in other.vocabulary.get_tokens():
+            token_id: int = self.vocabulary.get_id(token)
+            if token_id is None:
+                raise RuntimeError("Can not subtract model, token {} is not part of the model".format(token))
+            token_map.append(token_id)
+
+        # validate all counts first, so an invalid model does not leave this model partially subtracted
+        for token_id, count in other.single_tokens.items():
+            if self.single_tokens.get(token_map[token_id], 0) < count:
+                logger.error("Token {} occurs {} times in the subtracted model, but only {} times in the model"
+                             .format(other.vocabulary.get_token(token_id), count,
+                                     self.single_tokens.get(token_map[token_id], 0)))
+                raise RuntimeError("Can not subtract model, its token counts are not contained in the model")
+        if not self.count_model.contains_trie(other.count_model, token_map):
+            logger.error("The subtracted model {} contains sequences that occur less often in the model {}"
+                         .format(other.name, self.name))
+            raise RuntimeError("Can not subtract model, its sequence counts are not contained in the model")
+
+        self.count_model.add_trie(other.count_model, token_map, factor=-1)
+        self.count_model.remove_empty_nodes()
+        for token_id, count in other.single_tokens.items():
+            token_id = token_map[token_id]
+            self.single_tokens[token_id] -= count
+            if self.single_tokens[token_id] == 0:
+                del self.single_tokens[token_id]
 
+        for module in other.token_sequences:
+            del self.token_sequences[module]
+
+        self.shortest_sequence_length = 0
+        self.longest_sequence_length = 0
         for value in self.token_sequences:
-            converted_sequences: List[List[str]] = []
-            for sequence in self.token_sequences[value]:
-                converted_sequence: List[str] = []
-                for token in sequence:
-                    converted_sequence.append(token[0])
-                converted_sequences.append(converted_sequence)
+            for token_ids, _ in self.token_sequences[value]:
+                self._update_sequence_metrics(token_ids)
+        self._number_of_single_tokens_cache = None
+        self._location_index = None
+
+    def _build_with_numpy(self) -> None:
+        """
+        Counts all subsequences with the vectorized counting engine. The counts equal the ones of build
+        """
+        sequences: List[array] = self.get_sequence_list_without_meta_data()
+        for sequence in sequences:
+            self._update_sequence_metrics(sequence)
+        self.count_model = NumpyCountTrie.build(sequences, len(self.vocabulary), self.max_order)
+        self.single_tokens = self.count_model.get_single_token_counts()
+        self._number_of_single_tokens_cache = None
+
+    def _build_approximately(self) -> None:
+        """
+        Counts single tokens exactly and all subsequences with the memory bounded approximate count store
+        """
+        sequences: List[array] = self.get_sequence_list_without_meta_data()
+        for sequence in sequences:
+            self._update_sequence_metrics(sequence)
+            for token in sequence:
+                self._count_single_token(token)
+        self.count_model = ApproximateCountStore(self.approximate_error, max_heavy_hitters=self.max_heavy_hitters)
+        self.count_model.build(sequences, self.max_order)
+
+    def is_approximate(self) -> bool:
+        return isinstance(self.count_model, ApproximateCountStore)
+
+    def get_count_error_bound(self) -> int:
+        """
+        Returns by how much a subsequence count may be overestimated, None if all counts are exact
+        """
+        if not self.is_approximate():
+            return None
+        return self.count_model.get_error_bound()
+
+    def supports_gram_size(self, gram_size: int) -> bool:
+        """
+        Checks if the model contains the counts needed by an n-gram model of the given gram size
+        """
+        return self.max_order is None or gram_size <= self.max_order
+
+    def get_sequence_list_without_meta_data(self) -> List[array]:
+        """
+        Returns the token id arrays of all sequences without any module or line number information
+        """
+        output: List[array] = []
 
-            output += converted_sequences
+        for value in self.token_sequences:
+            for token_ids, _ in self.token_sequences[value]:
+                output.append(token_ids)
 
         return output
 
-    def get_sequence_dict(self) -> Dict[str, List[Tuple[str, int]]]:
+    def get_sequence_dict(self) -> Dict[str, List[Tuple[array, array]]]:
         return self.token_sequences
-    
-    def get_token_count(self, token) -> int:
+
+    def get_location_index(self) -> LocationIndex:
+        """
+        Returns the index of the locations of all token windows, which is built once per model
         """
-        Get the count of a token or subsequence
+        if self._location_index is None:
+            self._location_index = LocationIndex(self.token_sequences)
+        return self._location_index
+
+    def get_token_count(self, token_ids: Tuple[int, ...], next_id: int = None) -> int:
         """
-        return self.count_model[token]
-    
+        Get the count of a token or subsequence, given as tuple of token ids.
+        If next_id is given, the count of the subsequence extended by that token is returned
+        """
+        if next_id is None and len(token_ids) == 1 and self.is_approximate():
+            # single tokens are always counted exactly
+            return self.single_tokens.get(token_ids[0], 0)
+        return self.count_model.count(token_ids, next_id)
+
     def get_number_of_single_tokens(self, minimum_token_count: int) -> int:
         if self._number_of_single_tokens_cache is not None:
             return self._number_of_single_tokens_cache
-        
+
         number_of_single_tokens: int = 0
         for token, count in self.single_tokens.items():
             if count >= minimum_token_count:
                 number_of_single_tokens += count
-        
+
         self._number_of_single_tokens_cache = number_of_single_tokens
         return number_of_single_tokens
 
-    def _count_token(self, token_sub_sequence) -> None:
-        if token_sub_sequence in self.count_model:
-            self.count_model[token_sub_sequence] += 1
-        else:
-            self.count_model[token_sub_sequence] = 1
-    
-    def _count_single_token(self, token) -> None:
-        if token in self.count_model:
-            self.count_model[token] += 1
-        else:
-            self.count_model[token] = 1
-
+    def _count_single_token(self, token: int) -> None:
         if token in self.single_tokens:
             self.single_tokens[token] += 1
         else:
-            self.single_tokens[token] = 1 
-    
+            self.single_tokens[token] = 1
+
+    def _check_max_order(self, other: "TokenCountModel") -> None:
+        if self.max_order != other.max_order:
+            raise RuntimeError("Can not combine models that were built with different maximum orders ({} and {})"
+                               .format(self.max_order, other.max_order))
+
+    def _materialize(self) -> None:
+        """
+        Copies the parts of a memory mapped model into memory, so the model can be modified
+        """
+        if self.is_approximate():
+            raise RuntimeError("Token count models with approximate counts can not be combined")
+
+        if isinstance(self.vocabulary, Vocabulary) and isinstance(self.count_model, CountTrie) \
+                and isinstance(self.token_sequences, dict):
+            return
+
+        self.vocabulary = Vocabulary(self.vocabulary.get_tokens())
+        count_model: CountTrie = CountTrie()
+        count_model.add_trie(self.count_model)
+        self.count_model = count_model
+        self.token_sequences = {
+            module: [(array("i", token_ids), array("i", line_numbers)) for token_ids, line_numbers in sequences]
+            for module, sequences in self.token_sequences.items()
+        }
+
     def _update_sequence_metrics(self, sequence) -> None:
-        sequence_length: int = len(sequence)
+        self._update_sequence_length_metrics(len(sequence))
 
+    def _update_sequence_length_metrics(self, sequence_length: int) -> None:
         if self.shortest_sequence_length == 0 or self.shortest_sequence_length > sequence_length:
             self.shortest_sequence_length = sequence_length
-        
+
         if self.longest_sequence_length == 0 or self.longest_sequence_length < sequence_length:
             self.longest_sequence_length = sequence_length
 
     @staticmethod
     def _loaded_model_is_valid(model) -> bool:
-        return "count_model" in model and "project" in model and "token_sequences" in model and "saved_line_numbers" in model and "single_tokens" in model
\ No newline at end of file
+        return "count_model" in model and "project" in model and "token_sequences" in model and "saved_line_numbers" in model and "single_tokens" in model
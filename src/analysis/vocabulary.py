@@ -0,0 +1,90 @@
+from array import array
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+
+class Vocabulary:
+    """
+    Maps token strings to integer ids, so token sequences can be stored as compact id arrays.
+    Token strings are only needed again when a report is rendered
+    """
+
+    def __init__(self, tokens: List[str] = None) -> None:
+        self._ids: Dict[str, int] = {}
+        self._tokens: List[str] = []
+
+        if tokens is not None:
+            for token in tokens:
+                self.add_token(token)
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def add_token(self, token: str) -> int:
+        """
+        Returns the id of the given token and adds the token to the vocabulary if it is not known yet
+        """
+        token_id: int = self._ids.get(token, None)
+        if token_id is None:
+            token_id = len(self._tokens)
+            self._ids[token] = token_id
+            self._tokens.append(token)
+        return token_id
+
+    def get_id(self, token: str) -> int:
+        """
+        Returns the id of the given token or None if it is not part of the vocabulary
+        """
+        return self._ids.get(token, None)
+
+    def get_token(self, token_id: int) -> str:
+        return self._tokens[token_id]
+
+    def get_tokens(self) -> List[str]:
+        return self._tokens
+
+    def get_token_ranks(self) -> List[int]:
+        """
+        Returns the position of every token id in the alphabetically sorted tokens, which orders
+        token id sequences independently of the order in which the tokens were added
+        """
+        return Vocabulary.get_ranks_of_tokens(self._tokens)
+
+    @staticmethod
+    def get_ranks_of_tokens(tokens: List[str]) -> List[int]:
+        ranks: List[int] = [0] * len(tokens)
+        for rank, token_id in enumerate(sorted(range(0, len(tokens)), key=tokens.__getitem__)):
+            ranks[token_id] = rank
+        return ranks
+
+    def get_sequence_string(self, token_ids) -> str:
+        """
+        Returns the string representation of a sequence of token ids
+        """
+        return "".join(self._tokens[token_id] for token_id in token_ids)
+
+    def encode_sequence(self, sequence: List[Tuple[str, int]]) -> Tuple[array, array]:
+        """
+        Converts a token sequence in the form of [(token, line number)] into two parallel arrays
+        that contain the token ids and the line numbers
+        """
+        token_ids: array = array("i")
+        line_numbers: array = array("i")
+
+        for token, line_number in sequence:
+            token_ids.append(self.add_token(token))
+            line_numbers.append(line_number)
+        return token_ids, line_numbers
+
+    def encode_sequences(self, token_sequences: Dict[str, List[List[Tuple[str, int]]]]
+                         ) -> Dict[str, List[Tuple[array, array]]]:
+        output: Dict[str, List[Tuple[array, array]]] = {}
+
+        for module, sequences in token_sequences.items():
+            output[module] = []
+            if sequences is None:
+                continue
+            for sequence in sequences:
+                output[module].append(self.encode_sequence(sequence))
+        return output
@@ -75,7 +75,9 @@ class Config:
                  minimum_token_occurrence: int = 3,
                  reporting_size: int = 10,
                  do_analysis_run: bool = False,
-                 analysis_run: RunnerConfig = None
+                 analysis_run: RunnerConfig = None,
+                 probability_precision: str = "double",
+                 decimal_probabilities: bool = False
                  ) -> None:
         self.use_type_info: bool = use_type_info
         self.gram_size: int = gram_size
@@ -84,6 +86,10 @@ class Config:
         self.reporting_size: int = reporting_size
         self.do_analysis_run: bool = do_analysis_run
         self.analysis_run: RunnerConfig = analysis_run
+        # precision mode of the log probabilities, see n_gram_model
+        self.probability_precision: str = probability_precision
+        # calculate probabilities with the rounded Decimal values of earlier versions
+        self.decimal_probabilities: bool = decimal_probabilities
 
     @staticmethod
     def load_from_file(file_path: str) -> "Config":
@@ -102,7 +108,9 @@ class Config:
                         minimum_token_occurrence=config["minimum_token_occurrence"],
                         reporting_size=config["reporting_size"],
                         do_analysis_run=config["do_analysis_run"],
-                        analysis_run=runner_config
+                        analysis_run=runner_config,
+                        probability_precision=config.get("probability_precision", "double"),
+                        decimal_probabilities=config.get("decimal_probabilities", False)
                     )
                     print("Successfully loaded config file")
                     return new_config
@@ -1,11 +1,19 @@
 from argparse import ArgumentParser
 import os
 import sys
+from typing import List
 from .config import Config
 from .analysis.token_count_model import TokenCountModel
 from .analysis.n_gram_model import NGramModel
+from .analysis.n_gram_model import PRECISION_MODES
 from .analysis.reporting import ReportingService
 from .analysis.runner import AnalysisRunner
+from .analysis.approximate_count_store import DEFAULT_MAX_HEAVY_HITTERS
+from .syntax_tree_cache import SyntaxTreeCache
+from .tokenization.token_cache import TokenCache
+
+MERGE_MODELS_COMMAND: str = "merge-models"
+SUBTRACT_MODELS_COMMAND: str = "subtract-models"
 
 
 class Pygram:
@@ -14,7 +22,14 @@ class Pygram:
         self.config: Config = Config()
         self.count_model_path: str = None
         self.token_count_model: TokenCountModel = None
+        self.token_count_model_path: str = None
         self.project_path: str = None
+        self.jobs: int = 1
+        self.token_cache: TokenCache = None
+        self.use_numpy: bool = False
+        self.approximate_error: float = None
+        self.max_heavy_hitters: int = DEFAULT_MAX_HEAVY_HITTERS
+        self.stream: bool = False
 
     @staticmethod
     def _create_parser() -> ArgumentParser:
@@ -25,22 +40,79 @@ class Pygram:
                             help="This flag enables processing of type annotations. The type information added to the tokens")
         parser.add_argument("-o", help="Set a minimum token occurrence. Standard value is 2")
         parser.add_argument("-c", help="Specify a config file for Pygram")
-        parser.add_argument("--load-model", help="Load model from file (.json)")
+        parser.add_argument("--load-model", help="Load model from file (.pgm or .json)")
         parser.add_argument("--save-model", nargs=2, help="Save the intermediate token count model to a file")
+        parser.add_argument("--export-json", action="store_true",
+                            help="Save the token count model as JSON instead of the binary model format")
         parser.add_argument("--gram-size", help="Set gram size to perform analysis with. Standard value is 3")
         parser.add_argument("--sequence-length",
                             help="Set sequence length for the sequences used in the n-gram model. Standard value is 6")
         parser.add_argument("--reporting-size", help="Set reporting size. Standard value is 10")
+        parser.add_argument("--jobs", help="Number of processes used to tokenize the project. Standard value is 1")
+        parser.add_argument("--token-cache", help="Directory for caching tokenized files between runs")
+        parser.add_argument("--numpy", action="store_true",
+                            help="Count token sequences with the vectorized NumPy counting engine")
+        parser.add_argument("--approximate",
+                            help="Count token sequences approximately with the given maximum error relative to "
+                                 "the total count, e.g. 0.00001. Needs less memory for very large corpora")
+        parser.add_argument("--heavy-hitters",
+                            help="Maximum number of frequent sequences that are counted exactly in approximate mode. "
+                                 "Standard value is {}".format(DEFAULT_MAX_HEAVY_HITTERS))
+        parser.add_argument("--stream", action="store_true",
+                            help="Count the token sequences while the project is tokenized instead of "
+                                 "collecting all token sequences first")
+        parser.add_argument("--precision", choices=PRECISION_MODES,
+                            help="Precision of the summed up log probabilities. Standard value is double")
+        parser.add_argument("--decimal-probabilities", action="store_true",
+                            help="Calculate probabilities with rounded Decimal values like earlier versions. "
+                                 "Allows to compare reports with the ones of earlier versions")
+
+        return parser
 
+    @staticmethod
+    def _create_combine_models_parser(command: str) -> ArgumentParser:
+        parser: ArgumentParser = ArgumentParser(prog="pygram {}".format(command),
+                                                description="Combine saved token count models")
+        if command == MERGE_MODELS_COMMAND:
+            parser.add_argument("models", nargs="+", help="Token count models (.pgm or .json) to merge")
+        else:
+            parser.add_argument("models", nargs="+",
+                                help="Token count model (.pgm or .json) followed by the models to subtract from it")
+        parser.add_argument("-o", required=True,
+                            help="Output file. The model is saved as JSON if the file ends with .json")
         return parser
 
+    @staticmethod
+    def _combine_models(command: str, argv: List[str]) -> None:
+        """
+        Merges saved token count models or subtracts models from the first one and saves the result
+        """
+        arguments = Pygram._create_combine_models_parser(command).parse_args(argv)
+        models: List[TokenCountModel] = []
+        for path in arguments.models:
+            model: TokenCountModel = Pygram._load_token_count_model_from_file(path)
+            if model is None:
+                return
+            models.append(model)
+
+        result: TokenCountModel = models[0]
+        for model in models[1:]:
+            if command == MERGE_MODELS_COMMAND:
+                result.merge(model)
+            else:
+                result.subtract(model)
+
+        output_path: str = os.path.abspath(arguments.o)
+        result.save_to_file(output_path)
+        print("Saved combined model to {}".format(output_path))
+
     @staticmethod
     def _load_token_count_model_from_file(path) -> TokenCountModel:
         file_path: str = os.path.abspath(path)
         loaded_model: TokenCountModel = None
 
         print("Attempting to load token model...")
-        if os.path.isfile(file_path) and file_path.endswith(".json"):
+        if os.path.isfile(file_path) and (file_path.endswith(".pgm") or file_path.endswith(".json")):
             model: TokenCountModel = TokenCountModel.load_from_file(file_path)
             if model is None:
                 print("Could not load file")
@@ -48,11 +120,11 @@ class Pygram:
                 loaded_model = model
                 print("Successfully loaded model!")
         else:
-            print("Not a .json file!")
+            print("Not a .pgm or .json file!")
 
         return loaded_model
 
-    def _set_token_model_save_parameters(self, path, name) -> bool:
+    def _set_token_model_save_parameters(self, path, name, export_json: bool = False) -> bool:
 
         if not os.path.exists(path):
             print("The path for saving the token count model does not exist!")
@@ -66,21 +138,40 @@ class Pygram:
             print("Save model cannot be performed when a model was just loaded.")
             return False
 
-        self.count_model_path = os.path.join(path, name + ".json")
+        extension: str = ".json" if export_json else ".pgm"
+        self.count_model_path = os.path.join(path, name + extension)
         return True
 
     def _analyze_project(self):
-        if self.project_path is not None:
-            project_name, sequence_list = AnalysisRunner.tokenize_project(self.project_path, self.config.use_type_info)
+        if self.project_path is not None and self.stream:
+            self.token_count_model = AnalysisRunner.stream_and_save_count_model(self.project_path,
+                                                                                self.config.use_type_info,
+                                                                                self.jobs, SyntaxTreeCache(),
+                                                                                self.token_cache,
+                                                                                self.count_model_path,
+                                                                                self.config.gram_size,
+                                                                                self.use_numpy,
+                                                                                self.approximate_error,
+                                                                                self.max_heavy_hitters)
+        elif self.project_path is not None:
+            project_name, sequence_list = AnalysisRunner.tokenize_project(self.project_path, self.config.use_type_info,
+                                                                          self.jobs, SyntaxTreeCache(),
+                                                                          self.token_cache)
             self.token_count_model = AnalysisRunner.create_and_save_count_model(project_name, sequence_list,
-                                                                                self.count_model_path)
+                                                                                self.count_model_path,
+                                                                                self.config.gram_size,
+                                                                                self.use_numpy,
+                                                                                self.approximate_error,
+                                                                                self.max_heavy_hitters)
 
         if self.token_count_model is not None:
             ngram_model: NGramModel = AnalysisRunner.build_n_gram_model(
                 token_count_model=self.token_count_model,
                 gram_size=self.config.gram_size,
                 min_token_count=self.config.minimum_token_occurrence,
-                sequence_length=self.config.sequence_length
+                sequence_length=self.config.sequence_length,
+                precision=self.config.probability_precision,
+                use_decimal=self.config.decimal_probabilities
             )
             report: ReportingService = AnalysisRunner.create_report(self.token_count_model, ngram_model,
                                                                     self.config.reporting_size)
@@ -89,6 +180,8 @@ class Pygram:
     def start(self):
         if not len(sys.argv[1:]):
             print("For usage information use the -h parameter")
+        elif sys.argv[1] in (MERGE_MODELS_COMMAND, SUBTRACT_MODELS_COMMAND):
+            Pygram._combine_models(sys.argv[1], sys.argv[2:])
         else:
             arguments = self._create_parser().parse_args()
 
@@ -107,14 +200,33 @@ class Pygram:
             if arguments.reporting_size is not None:
                 self.config.reporting_size = arguments.reporting_size
 
+            if arguments.jobs is not None:
+                self.jobs = int(arguments.jobs)
+
+            if arguments.numpy:
+                self.use_numpy = True
+
+            if arguments.approximate is not None:
+                self.approximate_error = float(arguments.approximate)
+
+            if arguments.heavy_hitters is not None:
+                self.max_heavy_hitters = int(arguments.heavy_hitters)
+
+            if arguments.stream:
+                self.stream = True
+
+            if arguments.token_cache is not None:
+                self.token_cache = TokenCache(arguments.token_cache)
+
             if arguments.load_model is not None:
                 self.token_count_model = Pygram._load_token_count_model_from_file(arguments.load_model)
                 if self.token_count_model is None:
                     return
+                self.token_count_model_path = os.path.abspath(arguments.load_model)
 
             if arguments.save_model is not None:
                 path, name = arguments.save_model
-                if not self._set_token_model_save_parameters(path, name):
+                if not self._set_token_model_save_parameters(path, name, arguments.export_json):
                     return
 
             if arguments.d is not None:
@@ -126,12 +238,27 @@ class Pygram:
             if arguments.c is not None:
                 self.config = Config.load_from_file(arguments.c)
 
+            if arguments.precision is not None:
+                self.config.probability_precision = arguments.precision
+
+            if arguments.decimal_probabilities:
+                self.config.decimal_probabilities = True
+
             if self.config.do_analysis_run:
                 analysis_runner: AnalysisRunner = AnalysisRunner(
                     self.token_count_model,
                     self.config.analysis_run,
                     self.config.reporting_size,
-                    self.project_path
+                    self.project_path,
+                    self.jobs,
+                    self.token_cache,
+                    self.use_numpy,
+                    self.approximate_error,
+                    self.max_heavy_hitters,
+                    self.config.probability_precision,
+                    self.config.decimal_probabilities,
+                    self.stream,
+                    self.token_count_model_path
                 )
                 analysis_runner.start()
             else:
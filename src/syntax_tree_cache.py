@@ -0,0 +1,71 @@
+import os
+import ast
+import logging
+from typing import Dict
+from typing import Tuple
+
+logger = logging.getLogger("main")
+
+# Ratio between the memory of a parsed syntax tree and the size of its source. Measured with tracemalloc
+# on packages of the standard library, the median is about 36 bytes per source character
+SYNTAX_TREE_SIZE_FACTOR: int = 40
+DEFAULT_MEMORY_BUDGET: int = 512 * 1024 * 1024
+
+
+class SyntaxTreeCache:
+    """
+    Run scoped cache for parsed syntax trees which is shared by the type preprocessor and the tokenizers,
+    so every file is parsed only once per run. Trees are parsed with type comments.
+    All passes walk the files in the same order, in which least recently used eviction would drop every tree
+    before it is used again. Instead, trees are kept in the order they are first parsed until the estimated
+    memory reaches the budget, later trees are not cached. So the head of the scan stays resident
+    and hits in every further pass
+    """
+
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET) -> None:
+        self.memory_budget: int = memory_budget
+        self.hits: int = 0
+        self.misses: int = 0
+        self._estimated_size: int = 0
+        self._trees: Dict[str, Tuple[ast.AST, int]] = {}
+
+    def get_syntax_tree(self, path: str, use_type_info: bool = True):
+        """
+        Returns the syntax tree for the given file or None if the file does not exist
+        """
+        path = os.path.abspath(path)
+        entry = self._trees.get(path, None)
+
+        if entry is not None:
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        if not os.path.isfile(path):
+            return None
+
+        with open(path, "r") as source:
+            source_code: str = source.read()
+
+        try:
+            tree = ast.parse(source_code, type_comments=True)
+        except SyntaxError:
+            if use_type_info:
+                raise
+            # misplaced type comments are only an error if they are parsed, so the tree is not cached
+            logger.debug("Could not parse type comments of {}".format(path))
+            return ast.parse(source_code)
+
+        self._add(path, tree, len(source_code) * SYNTAX_TREE_SIZE_FACTOR)
+        return tree
+
+    def clear(self) -> None:
+        self._trees.clear()
+        self._estimated_size = 0
+
+    def _add(self, path: str, tree, size: int) -> None:
+        if self._estimated_size + size > self.memory_budget:
+            return
+
+        self._trees[path] = (tree, size)
+        self._estimated_size += size
@@ -0,0 +1,137 @@
+import _ast
+from _ast import AnnAssign
+from _ast import Call
+from _ast import ClassDef
+from _ast import For
+from _ast import FunctionDef
+
+from typing import Callable
+from typing import List
+from typing import Tuple
+
+from ..type_retrieval.preprocessed_type_caches import TypeCache
+from ..type_retrieval.type_info import TypeInfo
+from .tokenizer import Tokenizer
+from .type_tokenizer import TypeTokenizer
+from ..syntax_tree_cache import SyntaxTreeCache
+
+
+class DualTokenList:
+    """
+    Token list that fills the typed and the untyped token sequence at the same time.
+    Views that only contain one of the lists are used for the nodes which are tokenized differently
+    """
+
+    def __init__(self, typed_tokens: List[Tuple[str, int]] = None,
+                 untyped_tokens: List[Tuple[str, int]] = None) -> None:
+        self.typed_tokens: List[Tuple[str, int]] = typed_tokens
+        self.untyped_tokens: List[Tuple[str, int]] = untyped_tokens
+
+    def __len__(self) -> int:
+        return max(len(self.typed_tokens or []), len(self.untyped_tokens or []))
+
+    def __getitem__(self, index):
+        if self.typed_tokens is not None:
+            return self.typed_tokens[index]
+        return self.untyped_tokens[index]
+
+    def __iadd__(self, other: "DualTokenList") -> "DualTokenList":
+        if self.typed_tokens is not None:
+            self.typed_tokens += other.typed_tokens
+        if self.untyped_tokens is not None:
+            self.untyped_tokens += other.untyped_tokens
+        return self
+
+    def append(self, token: Tuple[str, int]) -> None:
+        if self.typed_tokens is not None:
+            self.typed_tokens.append(token)
+        if self.untyped_tokens is not None:
+            self.untyped_tokens.append(token)
+
+    def get_typed_view(self) -> "DualTokenList":
+        return DualTokenList(typed_tokens=self.typed_tokens)
+
+    def get_untyped_view(self) -> "DualTokenList":
+        return DualTokenList(untyped_tokens=self.untyped_tokens)
+
+
+class DualTokenizer(TypeTokenizer):
+    """
+    Tokenizer that walks the syntax tree once and creates the sequences of the untyped and the typed tokenizer.
+    Control flow tokens are added to both sequences, calls, for iterables and annotated assignments
+    are tokenized by both tokenizers into their own sequence
+    """
+
+    def __init__(self, filepath, module_name, type_cache: TypeCache,
+                 syntax_tree_cache: SyntaxTreeCache = None) -> None:
+        super().__init__(filepath, module_name, type_cache, syntax_tree_cache)
+        # set while nodes are tokenized into the untyped sequence only
+        self._tokenizing_untyped: bool = False
+
+    def process_file_streams(self) -> Tuple[List[List[Tuple[str, int]]], List[List[Tuple[str, int]]]]:
+        """
+        Tokenizes the file and returns the sequences of the untyped and the typed tokenizer
+        in the form of (untyped sequences, typed sequences)
+        """
+        file_tokens: List[DualTokenList] = self.process_file()
+        if file_tokens is None:
+            return None, None
+
+        untyped_sequences: List[List[Tuple[str, int]]] = []
+        typed_sequences: List[List[Tuple[str, int]]] = []
+        for tokens in file_tokens:
+            # a call can be tokenized by only one of the tokenizers, so the module sequence may be empty in one of them
+            if len(tokens.untyped_tokens):
+                untyped_sequences.append(tokens.untyped_tokens)
+            if len(tokens.typed_tokens):
+                typed_sequences.append(tokens.typed_tokens)
+        return untyped_sequences, typed_sequences
+
+    def _create_token_list(self) -> DualTokenList:
+        return DualTokenList([], [])
+
+    def _process_split(self, typed_method: Callable, untyped_method: Callable, node,
+                       tokens: DualTokenList) -> None:
+        """
+        Processes the node with the typed tokenizer into the typed sequence and with the untyped
+        tokenizer into the untyped sequence
+        """
+        if tokens.typed_tokens is not None:
+            typed_method(self, node, tokens.get_typed_view())
+
+        if tokens.untyped_tokens is not None:
+            tokenizing_untyped: bool = self._tokenizing_untyped
+            self._tokenizing_untyped = True
+            untyped_method(self, node, tokens.get_untyped_view())
+            self._tokenizing_untyped = tokenizing_untyped
+
+    def _process_call(self, node: Call, tokens: DualTokenList) -> None:
+        self._process_split(TypeTokenizer._process_call, Tokenizer._process_call, node, tokens)
+
+    def _process_for_iter(self, node: For, tokens: DualTokenList):
+        self._process_split(TypeTokenizer._process_for_iter, Tokenizer._process_for_iter, node, tokens)
+
+    def _process_ann_assign(self, node: AnnAssign, tokens: DualTokenList):
+        self._process_split(TypeTokenizer._process_ann_assign, Tokenizer._process_ann_assign, node, tokens)
+
+    def _process_assign(self, node: _ast.Assign, tokens: DualTokenList):
+        if self._tokenizing_untyped:
+            Tokenizer._process_assign(self, node, tokens)
+        else:
+            super()._process_assign(node, tokens)
+
+    def _process_class_def(self, node: ClassDef, module_tokens: DualTokenList) -> List[DualTokenList]:
+        if self._tokenizing_untyped:
+            return Tokenizer._process_class_def(self, node, module_tokens)
+        return super()._process_class_def(node, module_tokens)
+
+    def _process_function_def(self, node: FunctionDef) -> DualTokenList:
+        if self._tokenizing_untyped:
+            return Tokenizer._process_function_def(self, node)
+        return super()._process_function_def(node)
+
+    def _construct_call_token(self, function_name: str, module: str = None, object_name: str = None,
+                              token_type: TypeInfo = None) -> str:
+        if self._tokenizing_untyped:
+            return Tokenizer._construct_call_token(self, function_name)
+        return super()._construct_call_token(function_name, module, object_name, token_type)
@@ -0,0 +1,86 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+from .. import __version__
+
+logger = logging.getLogger("main")
+
+
+class TokenCache:
+    """
+    Persistent on-disk cache for the token sequences of single files. An entry is only valid for the same
+    source content, tokenizer mode and Pygram version. Typed entries are additionally bound to a
+    signature of the type caches of the module and its imported modules
+    """
+
+    def __init__(self, cache_directory: str) -> None:
+        self.cache_directory: str = os.path.abspath(cache_directory)
+        self.hits: int = 0
+        self.misses: int = 0
+
+        if not os.path.isdir(self.cache_directory):
+            os.makedirs(self.cache_directory)
+
+    @staticmethod
+    def get_content_hash(path: str) -> str:
+        with open(path, "rb") as source:
+            return hashlib.sha256(source.read()).hexdigest()
+
+    def load(self, module_path: str, typed: bool, content_hash: str,
+             dependency_signature: str = "") -> Tuple[List[List[Tuple[str, int]]], Tuple[int, ...]]:
+        """
+        Returns a tuple of (file tokens, counters) for a file or None if there is no valid entry.
+        The counters are returned as they were stored
+        """
+        entry_path: str = self._get_entry_path(module_path, typed)
+
+        if os.path.isfile(entry_path):
+            try:
+                with open(entry_path, "r") as entry_file:
+                    entry: Dict = json.load(entry_file)
+
+                if entry["version"] == __version__ and entry["content_hash"] == content_hash \
+                        and entry["dependency_signature"] == dependency_signature:
+                    sequences: List[List[Tuple[str, int]]] = [
+                        [TokenCache._convert_token(token) for token in sequence] for sequence in entry["sequences"]
+                    ]
+                    counters: Tuple[int, ...] = tuple(entry["counters"])
+                    self.hits += 1
+                    return sequences, counters
+            except (ValueError, KeyError, TypeError, IndexError):
+                logger.warning("Ignoring corrupt token cache entry {}".format(entry_path))
+
+        self.misses += 1
+        return None
+
+    def store(self, module_path: str, typed: bool, content_hash: str, dependency_signature: str,
+              sequences: List[List[Tuple[str, int]]], counters: Tuple[int, ...]) -> None:
+        entry_path: str = self._get_entry_path(module_path, typed)
+        temporary_path: str = "{}.{}.tmp".format(entry_path, os.getpid())
+
+        with open(temporary_path, "w") as entry_file:
+            json.dump({
+                "version": __version__,
+                "content_hash": content_hash,
+                "dependency_signature": dependency_signature,
+                "counters": list(counters),
+                "sequences": sequences
+            }, entry_file)
+        os.replace(temporary_path, entry_path)
+
+    @staticmethod
+    def _convert_token(token: List) -> Tuple[str, int]:
+        # tokens are stored as [token, line number] lists by json
+        if not isinstance(token, list):
+            raise TypeError("Token cache entry contains {} instead of a token".format(token))
+        return (token[0], token[1])
+
+    def _get_entry_path(self, module_path: str, typed: bool) -> str:
+        mode: str = "typed" if typed else "untyped"
+        key: str = hashlib.sha256("{}:{}".format(mode, module_path).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_directory, "{}.json".format(key))
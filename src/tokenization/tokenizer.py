@@ -39,10 +39,12 @@ from _ast import Pass
 from _ast import Yield
 from _ast import Break
 
+from typing import Iterator
 from typing import List
 from typing import Tuple
 
 from .tokens import Tokens
+from ..syntax_tree_cache import SyntaxTreeCache
 
 
 logger = logging.getLogger("main")
@@ -50,9 +52,10 @@ logger = logging.getLogger("main")
 
 class Tokenizer:
 
-    def __init__(self, filepath, module_path) -> None:
+    def __init__(self, filepath, module_path, syntax_tree_cache: SyntaxTreeCache = None) -> None:
         self._filepath: str = filepath
         self.module_path: str = module_path
+        self._syntax_tree_cache: SyntaxTreeCache = syntax_tree_cache
         self._syntax_tree = None
         self.sequence_stream: List[List[Tuple[str, int]]] = []
 
@@ -83,7 +86,21 @@ class Tokenizer:
         self._ast_depth_search()
         return self.sequence_stream
 
+    def iterate_sequences(self) -> Iterator[List[Tuple[str, int]]]:
+        """
+        Generator variant of process_file, which yields the token sequences one after another
+        instead of collecting them in the sequence stream
+        """
+        if self._syntax_tree is None:
+            logger.warning("Syntax tree is None, abort processing file {}"
+                           .format(os.path.basename(self.module_path)))
+            return
+        yield from self._iterate_syntax_tree()
+
     def _load_syntax_tree(self) -> None:
+        if self._syntax_tree_cache is not None:
+            return self._syntax_tree_cache.get_syntax_tree(self._filepath, False)
+
         if os.path.isfile(self._filepath):
             with open(self._filepath, "r") as source:
                 logger.debug("Loading syntax tree")
@@ -92,28 +109,27 @@ class Tokenizer:
         return None
 
     def _ast_depth_search(self) -> None:
+        self.sequence_stream += self._iterate_syntax_tree()
+
+    def _iterate_syntax_tree(self) -> Iterator[List[Tuple[str, int]]]:
         logger.debug("Starting depth search of syntax tree")
         if self._syntax_tree.body is not None:
-            module_tokens = []
+            module_tokens = self._create_token_list()
             for node in self._syntax_tree.body:
                 if isinstance(node, FunctionDef) or isinstance(node, AsyncFunctionDef):
-                    result = self._process_function_def(node)
-                    self.sequence_stream.append(result)
+                    yield self._process_function_def(node)
 
                 elif isinstance(node, ClassDef):
-                    result = self._process_class_def(node, module_tokens)
-
-                    if len(result):
-                        self.sequence_stream += result
+                    yield from self._process_class_def(node, module_tokens)
 
                 else:
                     self._classify_and_process_node(node, module_tokens)
             if len(module_tokens):
-                self.sequence_stream.append(module_tokens)
+                yield module_tokens
 
     def _search_node_body(self, node_body, tokens=None) -> List[Tuple[str, int]]:
         if tokens is None:
-            tokens = []
+            tokens = self._create_token_list()
 
         for child in node_body:
             self._classify_and_process_node(child, tokens)
@@ -248,7 +264,6 @@ class Tokenizer:
             if handler.type is not None:
                 if hasattr(handler.type, "id"):
                     self._add_token(tokens, handler.type.id + "()", handler)
-                    tokens.append(handler.type.id + "()")
                 elif hasattr(handler.type, "attr"):
                     self._add_token(tokens, handler.type.attr + "()", handler)
             self._search_node_body(handler.body, tokens)
@@ -321,7 +336,7 @@ class Tokenizer:
         return class_tokens
     
     def _process_function_def(self, node) -> List[Tuple[str, int]]:
-        tokens = []
+        tokens = self._create_token_list()
 
         if isinstance(node, AsyncFunctionDef):
             self._add_token(tokens, Tokens.ASYNC.value, node)
@@ -359,6 +374,9 @@ class Tokenizer:
         
         self._add_token(tokens, token, node)
     
+    def _create_token_list(self) -> List[Tuple[str, int]]:
+        return []
+
     def _construct_call_token(self, function_name) -> str:
         return "{}()".format(function_name)
     
@@ -373,12 +391,15 @@ class Tokenizer:
 
     def _process_for_block(self, node: For, tokens: List[Tuple[str, int]]):
             self._add_token(tokens, Tokens.FOR.value, node)
-            self._classify_and_process_node(node.iter, tokens)
+            self._process_for_iter(node, tokens)
             self._search_node_body(node.body, tokens)
             if len(node.orelse):
                 self._add_token(tokens, Tokens.ELSE.value, node)
                 self._search_node_body(node.orelse, tokens)
             self._add_token(tokens, Tokens.END_FOR.value, node)
     
+    def _process_for_iter(self, node: For, tokens: List[Tuple[str, int]]):
+        self._classify_and_process_node(node.iter, tokens)
+
     def _process_ann_assign(self, node: ast.AnnAssign, tokens: List[Tuple[str, int]]):
         self._classify_and_process_node(node.value, tokens)
\ No newline at end of file
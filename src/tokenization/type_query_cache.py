@@ -0,0 +1,81 @@
+from typing import Callable
+from typing import Dict
+from typing import Tuple
+
+from ..type_retrieval.preprocessed_type_caches import TypeCache
+from ..type_retrieval.type_info import TypeInfo
+from ..type_retrieval.variable_type_cache import VariableTypeCache
+
+# marks a query without memoized result, as None is a valid result
+_NOT_MEMOIZED = object()
+
+
+class TypeQueryCache:
+    """
+    Memo tables for the type queries of one tokenized module. Results of the frozen type cache only depend
+    on the module and are kept while the module is tokenized. Variable types depend on the variable scope,
+    so their table is invalidated whenever the variable cache changes
+    """
+
+    def __init__(self, type_cache: TypeCache, variable_cache: VariableTypeCache, module_path: str) -> None:
+        self.module_path: str = module_path
+        self.hits: int = 0
+        self.misses: int = 0
+        self._type_cache: TypeCache = type_cache
+        self._variable_cache: VariableTypeCache = variable_cache
+        self._module_results: Dict[Tuple, object] = {}
+        self._scope_results: Dict[Tuple[str, int, int], TypeInfo] = {}
+        self._scope_version: int = variable_cache.version
+
+    def find_module_for_function(self, function_name: str) -> str:
+        return self._query_type_cache(("function", function_name), self._type_cache.find_module_for_function,
+                                      function_name)
+
+    def find_module_for_type_with_function(self, type_name: str, function_name: str) -> str:
+        return self._query_type_cache(("type_with_function", type_name, function_name),
+                                      self._type_cache.find_module_for_type_with_function, type_name, function_name)
+
+    def find_library_module(self, module_name: str) -> str:
+        return self._query_type_cache(("library", module_name), self._type_cache.find_library_module, module_name)
+
+    def get_return_type(self, function_name: str, module: str = None) -> TypeInfo:
+        return self._query_type_cache(("return_type", function_name, module), self._get_return_type_by_module,
+                                      function_name, module)
+
+    def resolve_type_info(self, type_info: TypeInfo) -> TypeInfo:
+        type_info = TypeInfo.intern(type_info)
+        return self._query_type_cache(("resolved_type", type_info), self._type_cache.resolve_type_info, type_info)
+
+    def get_variable_type(self, variable_name: str, depth: int, subscript_index: int) -> TypeInfo:
+        if self._variable_cache.version != self._scope_version:
+            self.invalidate_scope()
+
+        key: Tuple[str, int, int] = (variable_name, depth, subscript_index)
+        variable_type = self._scope_results.get(key, _NOT_MEMOIZED)
+        if variable_type is _NOT_MEMOIZED:
+            self.misses += 1
+            variable_type = self._variable_cache.get_variable_type(variable_name, depth, subscript_index)
+            self._scope_results[key] = variable_type
+        else:
+            self.hits += 1
+        return variable_type
+
+    def invalidate_scope(self) -> None:
+        """
+        Drops the memoized variable types, which is necessary after the variables or their scope changed
+        """
+        self._scope_results.clear()
+        self._scope_version = self._variable_cache.version
+
+    def _get_return_type_by_module(self, current_module: str, function_name: str, module: str) -> TypeInfo:
+        return self._type_cache.get_return_type(current_module, function_name, module=module)
+
+    def _query_type_cache(self, key: Tuple, query: Callable, *arguments):
+        result = self._module_results.get(key, _NOT_MEMOIZED)
+        if result is _NOT_MEMOIZED:
+            self.misses += 1
+            result = query(self.module_path, *arguments)
+            self._module_results[key] = result
+        else:
+            self.hits += 1
+        return result
@@ -25,23 +25,42 @@ from ..type_retrieval.variable_type_cache import VariableTypeCache
 from ..utils import Utils
 from .tokens import Tokens
 from .tokenizer import Tokenizer
+from .type_query_cache import TypeQueryCache
+from ..syntax_tree_cache import SyntaxTreeCache
 
 logger = logging.getLogger("main")
 
 
 class TypeTokenizer(Tokenizer):
 
-    def __init__(self, filepath, module_name, type_cache: TypeCache) -> None:
-        super().__init__(filepath, module_name)
+    def __init__(self, filepath, module_name, type_cache: TypeCache,
+                 syntax_tree_cache: SyntaxTreeCache = None) -> None:
+        super().__init__(filepath, module_name, syntax_tree_cache)
         self._type_cache: TypeCache = type_cache
         self._variable_cache: VariableTypeCache = VariableTypeCache(self.module_path)
-        self._type_cache.set_current_module(self.module_path)
+        self._type_queries: TypeQueryCache = TypeQueryCache(type_cache, self._variable_cache, self.module_path)
         self.number_of_type_inferred_call_tokens: int = 0
         self.number_of_call_tokens: int = 0
         self.number_of_ann_assigns: int = 0
         self.number_of_assigns: int = 0
 
+    def get_counters(self) -> Tuple[int, int, int, int, int, int]:
+        """
+        Returns (type inferred call tokens, call tokens, annotated assigns, assigns, type query hits, type query misses)
+        """
+        return (
+            self.number_of_type_inferred_call_tokens,
+            self.number_of_call_tokens,
+            self.number_of_ann_assigns,
+            self.number_of_assigns,
+            self._type_queries.hits,
+            self._type_queries.misses
+        )
+
     def _load_syntax_tree(self):
+        if self._syntax_tree_cache is not None:
+            return self._syntax_tree_cache.get_syntax_tree(self._filepath, True)
+
         if os.path.isfile(self._filepath):
             with open(self._filepath, "r") as source:
                 logger.debug("Loading syntax tree")
@@ -58,8 +77,7 @@ class TypeTokenizer(Tokenizer):
         class_tokens: List[List[Tuple[str, int]]] = []
         # create cache for class and add self type
         self._variable_cache.set_class_scope(node.name)
-        class_type: TypeInfo = TypeInfo(label=node.name)
-        self._type_cache.populate_type_info_with_module(class_type)
+        class_type: TypeInfo = self._type_queries.resolve_type_info(TypeInfo(label=node.name))
         self._variable_cache.add_variable("self", class_type)
 
         for child in node.body:
@@ -75,7 +93,7 @@ class TypeTokenizer(Tokenizer):
         return class_tokens
 
     def _process_function_def(self, node: FunctionDef) -> List[Tuple[str, int]]:
-        tokens: List[str, int] = []
+        tokens: List[Tuple[str, int]] = self._create_token_list()
         self._variable_cache.set_function_scope(node.name)
         if isinstance(node, AsyncFunctionDef):
             self._add_token(tokens, Tokens.ASYNC.value, node)
@@ -126,7 +144,7 @@ class TypeTokenizer(Tokenizer):
                          .format(self.module_path, node.lineno))
 
     def _process_standalone_function(self, function_name: str, tokens: List[Tuple[str, int]], node: Call) -> None:
-        module: str = self._type_cache.find_module_for_function(function_name)
+        module: str = self._type_queries.find_module_for_function(function_name)
         token: str = self._construct_call_token(function_name, module=module)
         self._add_token(tokens, token, node)
 
@@ -146,13 +164,13 @@ class TypeTokenizer(Tokenizer):
         elif isinstance(node.value, Attribute):
             object_name = Utils.get_full_name_from_attribute_node(node.value)
 
-        variable_type: TypeInfo = self._variable_cache.get_variable_type(object_name, subscript_depth, subscript_index)
+        variable_type: TypeInfo = self._type_queries.get_variable_type(object_name, subscript_depth, subscript_index)
         # if variable type is not found, check if the method is called on a class directly
         if variable_type is None:
-            module: str = self._type_cache.find_module_for_type_with_function(object_name, function_name)
+            module: str = self._type_queries.find_module_for_type_with_function(object_name, function_name)
 
             if module is None:
-                module = self._type_cache.find_library_module(object_name)
+                module = self._type_queries.find_library_module(object_name)
 
                 # use invoking object name (e.g. os.path) as module name
                 if module is not None:
@@ -171,7 +189,7 @@ class TypeTokenizer(Tokenizer):
         function_name: str = node.attr
         self._process_call(node.value, tokens)
         prev_function_name, prev_module = self._retrieve_module_and_function_from_token(tokens[-1][0])
-        return_type: TypeInfo = self._type_cache.get_return_type(prev_function_name, module=prev_module)
+        return_type: TypeInfo = self._type_queries.get_return_type(prev_function_name, module=prev_module)
         token: str = self._construct_call_token(function_name, token_type=return_type)
         self._add_token(tokens, token, node)
 
@@ -182,8 +200,7 @@ class TypeTokenizer(Tokenizer):
         for child in node.args:
             if isinstance(child, arg):
                 if child.annotation is not None:
-                    info: TypeInfo = TypeInfo(child.annotation)
-                    self._type_cache.populate_type_info_with_module(info)
+                    info: TypeInfo = self._type_queries.resolve_type_info(TypeInfo.from_annotation(child.annotation))
                     name: str = child.arg
                     self._variable_cache.add_variable(name, info)
             else:
@@ -264,9 +281,7 @@ class TypeTokenizer(Tokenizer):
             return 1
         return index
 
-    def _process_for_block(self, node: For, tokens: List[Tuple[str, int]]):
-        self._add_token(tokens, Tokens.FOR.value, node)
-
+    def _process_for_iter(self, node: For, tokens: List[Tuple[str, int]]):
         if isinstance(node.iter, Name) or isinstance(node.iter, Subscript) or isinstance(node.iter, Attribute):
             self._cache_variables_in_for_block(node)
         elif isinstance(node.iter, Call):
@@ -274,12 +289,6 @@ class TypeTokenizer(Tokenizer):
         else:
             logger.error("Error, unknown iter type of For node in module {}".format(self.module_path))
 
-        self._search_node_body(node.body, tokens)
-        if len(node.orelse):
-            self._add_token(tokens, Tokens.ELSE.value, node)
-            self._search_node_body(node.orelse, tokens)
-        self._add_token(tokens, Tokens.END_FOR.value, node)
-
     def _cache_variables_in_for_block(self, node: For) -> None:
         """
         Caches variables and their respective types which are used in a for block
@@ -308,8 +317,7 @@ class TypeTokenizer(Tokenizer):
                 iter_name, subscript_depth = self._get_origin_of_subscript(node.iter, subscript_depth)
                 subscript_index = self._get_index_of_subscript(node.iter)
 
-            variable_type: TypeInfo = self._variable_cache.get_variable_type(iter_name, subscript_depth,
-                                                                             subscript_index)
+            variable_type: TypeInfo = self._type_queries.get_variable_type(iter_name, subscript_depth, subscript_index)
             self._variable_cache.add_variable(target_name, variable_type)
 
     def _get_variable_name_for_assignment(self, node) -> str:
@@ -344,8 +352,7 @@ class TypeTokenizer(Tokenizer):
     def _process_ann_assign(self, node: AnnAssign, tokens: List[Tuple[str, int]]):
         try:
             complete_name: str = self._get_variable_name_for_assignment(node.target)
-            info: TypeInfo = TypeInfo(annotation_node=node.annotation)
-            self._type_cache.populate_type_info_with_module(info)
+            info: TypeInfo = self._type_queries.resolve_type_info(TypeInfo.from_annotation(node.annotation))
             self._classify_and_process_node(node.value, tokens)
             self._variable_cache.add_variable(complete_name, info)
 
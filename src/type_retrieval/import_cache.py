@@ -5,8 +5,11 @@ class ImportCache():
         self._imports: Dict[str, List[str]] = {}
         # maps aliases to real class names. Ignores cases where the "as" directive names to types equally
         self._as_imports: Dict[str, str] = {}
+        # maps imported entities to the modules they are imported from, built on the first lookup
+        self._modules_by_entity: Dict[str, List[str]] = None
 
     def add_import(self, module_path: str, imported_entities: List[str]) -> None:
+        self._modules_by_entity = None
         if self._imports.get(module_path, None) is None:
             self._imports[module_path] = imported_entities
         else:
@@ -19,26 +22,45 @@ class ImportCache():
         """
         Retruns the imported modules that contain the given class/function name.
         """
-        modules: List[str] = []
-        modules_found_for_name_part: List[str] = []
-
         # convert alias to original class name
         module: str = self._as_imports.get(name, None)
         if module is not None:
             name = module
-        
-        for module_path, modules_list in self._imports.items():
-            # Check if name is in imported modules
-            if name in modules_list:
-                modules.append(module_path)
-            elif self._name_has_part_of_imported_module(name, modules_list):
-                modules_found_for_name_part.append(module_path)
-        
+
+        modules: List[str] = list(self._get_modules_by_entity().get(name, []))
         if len(modules) == 0:
-            modules += modules_found_for_name_part
+            for module_path, modules_list in self._imports.items():
+                if self._name_has_part_of_imported_module(name, modules_list):
+                    modules.append(module_path)
         
         return modules
     
+    def get_signature(self) -> str:
+        # relative imports without a module part (from . import x) are stored under None
+        imports: List[str] = ["{}:{}".format(module_path, ",".join(entities))
+                              for module_path, entities in sorted(self._imports.items(), key=lambda item: str(item[0]))]
+        aliases: List[str] = ["{}={}".format(alias, name) for alias, name in sorted(self._as_imports.items())]
+        return "{}|{}".format(";".join(imports), ";".join(aliases))
+
+    def freeze(self) -> None:
+        """
+        Builds the lookup index up front, so lookups do not change the cache afterwards
+        """
+        self._get_modules_by_entity()
+
+    def get_imported_modules(self) -> List[str]:
+        return list(self._imports.keys())
+
+    def _get_modules_by_entity(self) -> Dict[str, List[str]]:
+        if self._modules_by_entity is None:
+            self._modules_by_entity = {}
+            for module_path, entities in self._imports.items():
+                for entity in entities:
+                    modules: List[str] = self._modules_by_entity.setdefault(entity, [])
+                    if len(modules) == 0 or modules[-1] != module_path:
+                        modules.append(module_path)
+        return self._modules_by_entity
+
     def _name_has_part_of_imported_module(self, name: str, modules: List[str]) -> bool:
         for module in modules:
             if module in name:
@@ -0,0 +1,74 @@
+from typing import Dict
+from typing import List
+from typing import Set
+
+
+class ModulePathTrie:
+    """
+    Trie over the reversed segments of dotted module paths. Every node holds the modules that end with the
+    segments on the path to it, so the modules matching an import are found in time proportional to its depth
+    """
+
+    def __init__(self, module_paths: List[str] = None) -> None:
+        self._module_paths: Set[str] = set()
+        # a node consists of its children by segment and the modules that end with the path to the node
+        self._root: Dict = {}
+
+        if module_paths is not None:
+            for module_path in module_paths:
+                self.add_module(module_path)
+
+    def add_module(self, module_path: str) -> None:
+        if module_path in self._module_paths:
+            return
+        self._module_paths.add(module_path)
+
+        children: Dict = self._root
+        for segment in reversed(module_path.split(".")):
+            node = children.get(segment, None)
+            if node is None:
+                node = ({}, [])
+                children[segment] = node
+            node[1].append(module_path)
+            children = node[0]
+
+    def contains_module(self, module_path: str) -> bool:
+        return module_path in self._module_paths
+
+    def get_modules_ending_with(self, import_path: str) -> List[str]:
+        """
+        Returns all modules whose last segments equal the segments of the given import path
+        """
+        children: Dict = self._root
+        node = None
+        for segment in reversed(import_path.split(".")):
+            node = children.get(segment, None)
+            if node is None:
+                return []
+            children = node[0]
+        return list(node[1]) if node is not None else []
+
+    def find_best_match(self, import_path: str, importing_module: str) -> str:
+        """
+        Returns the module that ends with the given import path and shares the longest package prefix
+        with the importing module. Remaining ties are broken by the shorter and then the alphabetically
+        first module path. Returns None if no module matches
+        """
+        matches: List[str] = self.get_modules_ending_with(import_path)
+        if len(matches) == 0:
+            return None
+        if len(matches) == 1:
+            return matches[0]
+
+        importing_segments: List[str] = importing_module.split(".")
+
+        def get_rank(module_path: str):
+            segments: List[str] = module_path.split(".")
+            common_segments: int = 0
+            for segment, importing_segment in zip(segments, importing_segments):
+                if segment != importing_segment:
+                    break
+                common_segments += 1
+            return -common_segments, len(segments), module_path
+
+        return min(matches, key=get_rank)
@@ -1,48 +1,78 @@
-from typing import Dict, List, Tuple
+from typing import Dict, List, Set, Tuple
 
 from .import_cache import ImportCache
 from .type_info import TypeInfo
 from ..utils import Utils
 import logging
+import hashlib
 import sys
 
 logger = logging.getLogger("main")
 utils: Utils = Utils()
 
 class TypeCache: 
+    """
+    Type information of all modules of a project. The cache is frozen when the preprocessing is finished.
+    Afterwards all queries take the currently tokenized module as argument and have no side effects,
+    so one cache can be shared by all tokenizers, also across forked processes
+    """
 
     def __init__(self, name: str) -> None:
         self.name: str = name
         self._smallest_module_level = sys.maxsize
-        self._currently_processed_module: str = None
+        self._frozen: bool = False
         self.modules: Dict[str, FileCache] = {}
+        # symbol index, maps class and function names to the modules that define them
+        self._modules_by_type: Dict[str, Set[str]] = {}
+        self._modules_by_function: Dict[str, Set[str]] = {}
     
     def add_file_cache(self, module_path: str, cache: "FileCache") -> None:
+        """
+        Adds the cache of a completely preprocessed file and its classes and functions to the symbol index
+        """
+        if self._frozen:
+            raise RuntimeError("Can not add module {} to a frozen type cache".format(module_path))
+
+        previous_cache: FileCache = self.modules.get(module_path, None)
+        if previous_cache is not None:
+            self._update_symbol_index(module_path, previous_cache, add=False)
+
         self.modules[module_path] = cache
+        self._update_symbol_index(module_path, cache, add=True)
         module_level: int = len(module_path.split("."))
         if module_level < self._smallest_module_level:
             self._smallest_module_level = module_level
+
+    def freeze(self) -> None:
+        """
+        Completes all lazily built lookup structures, after that the cache is no longer changed
+        """
+        for cache in self.modules.values():
+            if cache.import_cache is not None:
+                cache.import_cache.freeze()
+        self._frozen = True
+
+    def is_frozen(self) -> bool:
+        return self._frozen
     
-    def set_current_module(self, module_path: str) -> None:
-        self._currently_processed_module = module_path
-    
-    def get_return_type(self, function_name: str, class_name: str = None, module: str = None) -> TypeInfo:
+    def get_return_type(self, current_module: str, function_name: str, class_name: str = None,
+                        module: str = None) -> TypeInfo:
         """
         Retrieves the return type of a given function. 
         If class name is not specified, the method only searches for functions outside of classes
         """
         if class_name is not None:
-            return self._get_return_type_of_class_function(function_name, class_name)
+            return self._get_return_type_of_class_function(current_module, function_name, class_name)
         elif module is not None:
-            return self._get_return_type_of_function_by_module(function_name, module)
+            return self._get_return_type_of_function_by_module(current_module, function_name, module)
         else:
-            return self._get_return_type_of_function(function_name)
+            return self._get_return_type_of_function(current_module, function_name)
     
-    def find_module_for_type_with_function(self, type_name: str, function_name: str) -> str:
+    def find_module_for_type_with_function(self, current_module: str, type_name: str, function_name: str) -> str:
         """
         Returns a module that contains the given type with given function name
         """
-        potential_modules: List[str] = self._get_modules_for_name(type_name)
+        potential_modules: List[str] = self._get_modules_for_name(current_module, type_name)
 
         for module in potential_modules:
             cache: FileCache = self.modules.get(module, None)
@@ -51,11 +81,11 @@ class TypeCache:
                     return module
         return None
 
-    def find_library_module(self, module_name: str) -> str:
+    def find_library_module(self, current_module: str, module_name: str) -> str:
         """
         Finds an imported third party library that matches the given module
         """
-        potential_modules: List[str] = self._get_modules_for_name(module_name, third_party=True)
+        potential_modules: List[str] = self._get_modules_for_name(current_module, module_name, third_party=True)
 
         if len(potential_modules) == 1:
             return potential_modules[0]
@@ -63,38 +93,59 @@ class TypeCache:
         # more than one match, dont return a module
         return None
     
-    def find_module_for_function(self, function_name):
+    def find_module_for_function(self, current_module: str, function_name):
         """
         Retruns the module that contains the given function name
         """
-        potential_modules: List[str] = self._get_modules_for_name(function_name)
+        potential_modules: List[str] = self._get_modules_for_name(current_module, function_name)
 
         module_path: str = ""
         if len(potential_modules) == 1:
             module_path = potential_modules[0]
         elif len(potential_modules) > 1:
             logger.error("Unable to uniquely map module to function {} in {}"
-            .format(function_name, self._currently_processed_module))
+            .format(function_name, current_module))
         elif len(potential_modules) == 0:
             if utils.is_not_a_builtin_function(function_name):
                 logger.warning("Could not find matching modules for funcion {} in {}"
-                .format(function_name, self._currently_processed_module))
+                .format(function_name, current_module))
 
         return module_path
 
     def module_contains_type(self, module_path: str, type: str) -> bool:
-        module: FileCache = self.modules.get(module_path, None)
-
-        if module is not None:
-            return module.contains_type(type)
-        return False
+        return module_path in self._modules_by_type.get(type, ())
     
     def module_contains_function(self, module_path: str, function_name: str) -> bool:
-        module: FileCache = self.modules.get(module_path, None)
+        return module_path in self._modules_by_function.get(function_name, ())
+
+    def _update_symbol_index(self, module_path: str, cache: "FileCache", add: bool) -> None:
+        for index, names in ((self._modules_by_type, cache.get_class_names()),
+                             (self._modules_by_function, cache.get_function_names())):
+            for name in names:
+                if add:
+                    index.setdefault(name, set()).add(module_path)
+                else:
+                    index[name].discard(module_path)
+
+    def get_dependency_signature(self, module_path: str) -> str:
+        """
+        Returns a hash over the file caches of the given module and all of its imported project modules.
+        Changes in any of them can change the typed tokens of the module
+        """
+        if module_path.endswith(".__init__"):
+            module_path = module_path.rsplit(".", 1)[0]
 
-        if module is not None:
-            return module.contains_function(function_name)
-        return False
+        file_cache: FileCache = self.modules.get(module_path, None)
+        if file_cache is None:
+            return ""
+
+        signatures: List[str] = ["{}:{}".format(module_path, file_cache.get_signature())]
+        for imported_module in sorted(module for module in file_cache.import_cache.get_imported_modules()
+                                      if module is not None):
+            cache, _ = self._get_existing_module_in_cache(imported_module)
+            if cache is not None:
+                signatures.append("{}:{}".format(imported_module, cache.get_signature()))
+        return hashlib.sha256("\n".join(signatures).encode("utf-8")).hexdigest()
 
     def _get_modules_not_contained_in_project_cache(self, modules):
         output: List[str] = []
@@ -104,30 +155,35 @@ class TypeCache:
                 output.append(module)
         return output
     
-    def populate_type_info_with_module(self, type_info: TypeInfo) -> None:
+    def resolve_type_info(self, current_module: str, type_info: TypeInfo) -> TypeInfo:
+        """
+        Returns the interned type info in which the type and all contained types carry the module
+        that defines them, as seen from the current module. The given type info is not changed
+        """
         if type_info is None or type_info.fully_qualified_name != "":
-            return
+            return type_info
         
         type_name: str = type_info.label
-        contained_types: List[TypeInfo] = type_info.get_contained_types()
-        for type in contained_types:
-            self.populate_type_info_with_module(type)
+        resolved_type_info: TypeInfo = TypeInfo(label=type_name)
+        resolved_type_info.set_contained_types([self.resolve_type_info(current_module, type)
+                                                for type in type_info.get_contained_types()])
 
         if type_name is not None and type_name != "":
-            potential_modules = self._get_modules_for_name(type_name)
+            potential_modules = self._get_modules_for_name(current_module, type_name)
             module_path: str = ""
             if len(potential_modules) == 1:
                 module_path = "{}.".format(potential_modules[0])
             elif len(potential_modules) > 1:
                 logger.error("Unable to uniquely map module to type {} in {}"
-                .format(type_name, self._currently_processed_module))
+                .format(type_name, current_module))
             elif len(potential_modules) == 0:
                 if type_name != "str" and type_name != "bool" and type_name != "int":
                     logger.warning("Could not find matching modules for type {} in {}"
-                    .format(type_name, self._currently_processed_module))
-            type_info.set_fully_qualified_name("{}{}".format(module_path, type_name))
+                    .format(type_name, current_module))
+            resolved_type_info.set_fully_qualified_name("{}{}".format(module_path, type_name))
         else:
             logger.error("Can not determine module for empty type")
+        return TypeInfo.intern(resolved_type_info)
     
     def _get_existing_module_in_cache(self, module_path: str) -> Tuple[str, str]:
         """
@@ -152,49 +208,49 @@ class TypeCache:
 
         return (module, class_name)
     
-    def _get_return_type_of_class_function(self, function_name: str, class_name: str) -> TypeInfo:
-        caches: List[FileCache] = self._get_file_caches_for_name(class_name)
+    def _get_return_type_of_class_function(self, current_module: str, function_name: str,
+                                           class_name: str) -> TypeInfo:
+        caches: List[FileCache] = self._get_file_caches_for_name(current_module, class_name)
         for cache in caches:
             return_type = cache.get_class_function_type(function_name, class_name)
             if return_type is not None:
                 return return_type
         
         logger.error("Could not find function {} for class {} in module {} in type cache"
-        .format(function_name, class_name, self._currently_processed_module))
+        .format(function_name, class_name, current_module))
         return None
 
-    def _get_return_type_of_function(self, function_name: str) -> TypeInfo:
+    def _get_return_type_of_function(self, current_module: str, function_name: str) -> TypeInfo:
         """
         Retrieves the return type of a function by its name. The search is only applied to functions outside of classes
         """
-        caches: List[FileCache] = self._get_file_caches_for_name(function_name)
+        caches: List[FileCache] = self._get_file_caches_for_name(current_module, function_name)
         for cache in caches:
             return_type = cache.get_function_return_type(function_name)
             if return_type is not None:
                 return return_type
         logger.error("Could not find function {} for module {} in type cache"
-        .format(function_name, self._currently_processed_module))
+        .format(function_name, current_module))
         return None
     
-    def _get_return_type_of_function_by_module(self, function_name: str, module: str):
+    def _get_return_type_of_function_by_module(self, current_module: str, function_name: str, module: str):
         """
         Retrieves the return type of a function by searching in the given module. 
         Includes class and standalone functions.
         """
         module, class_name = self._get_existing_module_in_cache(module)
         if module is not None:
-            info: TypeInfo = self._get_return_type_of_function(function_name)
+            info: TypeInfo = self._get_return_type_of_function(current_module, function_name)
             
             if info is None:
-                info = self._get_return_type_of_class_function(function_name, class_name)
-                self.populate_type_info_with_module(info)
-                return info
+                info = self._get_return_type_of_class_function(current_module, function_name, class_name)
+                return self.resolve_type_info(current_module, info)
         
         logger.debug("Could not find function \"{}\" in module {}".format(function_name, module))        
         return None
     
-    def _get_current_import_cache(self) -> ImportCache:
-        module_path: str = self._currently_processed_module
+    def _get_import_cache(self, current_module: str) -> ImportCache:
+        module_path: str = current_module
         if "__init__" in module_path:
             path_parts: List[str] = module_path.rsplit(".", 1)
 
@@ -202,22 +258,28 @@ class TypeCache:
                 module_path = path_parts[0]
         return self.modules[module_path].import_cache
     
-    def _get_modules_for_name(self, name: str, third_party: bool = False) -> List[str]:
+    def _get_modules_for_name(self, current_module: str, name: str, third_party: bool = False) -> List[str]:
         """
         Retruns the modules that contain the given class/function name.
         """
-        current_import_cache: ImportCache = self._get_current_import_cache()
+        current_import_cache: ImportCache = self._get_import_cache(current_module)
+        modules_with_type: Set[str] = self._modules_by_type.get(name, set())
+        modules_with_function: Set[str] = self._modules_by_function.get(name, set())
+        if not third_party and len(modules_with_type) == 0 and len(modules_with_function) == 0:
+            # no project module defines the name, so none of the imports can contain it
+            return []
+
         potential_modules: List[str] = []
         imported_modules: List[str] = current_import_cache.get_module_imports_for_name(name)
         modules: List[str] = []
         modules += imported_modules
-        modules.append(self._currently_processed_module)
+        modules.append(current_module)
 
         # check if a project internal module contains the name
         for module in modules:
-            if self.module_contains_type(module, name):
+            if module in modules_with_type:
                 potential_modules.append(module)
-            elif self.module_contains_function(module, name):
+            elif module in modules_with_function:
                 # only append module that contains a function with that name if there are no other modules yet
                 if len(potential_modules) < 1:
                     potential_modules.append(module)
@@ -227,11 +289,11 @@ class TypeCache:
         
         return potential_modules
 
-    def _get_file_caches_for_name(self, name: str) -> List["FileCache"]:
+    def _get_file_caches_for_name(self, current_module: str, name: str) -> List["FileCache"]:
         """
         Returns the file caches for a given name
         """
-        potential_modules: List[str] = self._get_modules_for_name(name)
+        potential_modules: List[str] = self._get_modules_for_name(current_module, name)
         output: List[FileCache] = []
         for module in potential_modules:
             cache: FileCache = self.modules.get(module, None)
@@ -242,6 +304,8 @@ class TypeCache:
 
 class FileCache:
 
+    __slots__ = ("file_name", "import_cache", "_class_cache", "_function_cache")
+
     def __init__(self, file_name: str) -> None:
         self.file_name = file_name
         self.import_cache: ImportCache = None
@@ -280,20 +344,60 @@ class FileCache:
             return class_cache.contains_function(function_name)
         return False
     
+    def to_json(self) -> Dict:
+        """
+        Returns the classes and functions of the file. The import cache is not included
+        """
+        return {
+            "file_name": self.file_name,
+            "functions": FileCache._functions_to_json(self._function_cache),
+            "classes": [class_cache.to_json() for class_cache in self._class_cache.values()]
+        }
+
+    @staticmethod
+    def from_json(json_cache: Dict) -> "FileCache":
+        cache: FileCache = FileCache(json_cache["file_name"])
+        cache._function_cache = FileCache._functions_from_json(json_cache["functions"])
+        for json_class in json_cache["classes"]:
+            cache.add_class(ClassCache.from_json(json_class))
+        return cache
+
+    @staticmethod
+    def _functions_to_json(functions: Dict[str, TypeInfo]) -> Dict:
+        return {name: type.to_json() if type is not None else None for name, type in functions.items()}
+
+    @staticmethod
+    def _functions_from_json(json_functions: Dict) -> Dict[str, TypeInfo]:
+        return {name: TypeInfo.from_json(type) if type is not None else None for name, type in json_functions.items()}
+
+    def get_signature(self) -> str:
+        functions: List[str] = [FileCache._get_type_signature(name, type) for name, type in sorted(self._function_cache.items())]
+        classes: List[str] = [cache.get_signature() for _, cache in sorted(self._class_cache.items())]
+        imports: str = self.import_cache.get_signature() if self.import_cache is not None else ""
+        return "{}|{}|{}".format(";".join(functions), ";".join(classes), imports)
+
+    @staticmethod
+    def _get_type_signature(name: str, type: TypeInfo) -> str:
+        if type is None:
+            return name
+        return "{}->{}".format(name, type.get_signature())
+
+    def get_class_names(self) -> List[str]:
+        return list(self._class_cache.keys())
+
+    def get_function_names(self) -> List[str]:
+        return list(self._function_cache.keys())
+
     def contains_type(self, type_name: str) -> bool:
-        for key, value in self._class_cache.items():
-            contains_type: bool = value.is_type(type_name)
-            if contains_type is True:
-                return True
-        return False
+        return type_name in self._class_cache
     
     def contains_function(self, function_name: str) -> bool:
-        for key in self._function_cache:
-            if key == function_name:
-                return True
+        return function_name in self._function_cache
 
 class ClassCache:
 
+    __slots__ = ("type", "_functions")
+
     def __init__(self, class_name: str) -> None:
         self.type: str = class_name
         self._functions: Dict[str, TypeInfo] = {}
@@ -303,7 +407,20 @@ class ClassCache:
     
     def contains_function(self, function_name) -> bool:
         return function_name in self._functions
+
+    def to_json(self) -> Dict:
+        return {"type": self.type, "functions": FileCache._functions_to_json(self._functions)}
+
+    @staticmethod
+    def from_json(json_cache: Dict) -> "ClassCache":
+        cache: ClassCache = ClassCache(json_cache["type"])
+        cache._functions = FileCache._functions_from_json(json_cache["functions"])
+        return cache
     
+    def get_signature(self) -> str:
+        functions: List[str] = [FileCache._get_type_signature(name, type) for name, type in sorted(self._functions.items())]
+        return "{}({})".format(self.type, ",".join(functions))
+
     def is_type(self, type_name: str) -> bool:
         return self.type == type_name
 
@@ -1,23 +1,32 @@
 import os
-from typing import List, Tuple
+import multiprocessing
+from typing import Dict, Iterator, List, Tuple
 import logging
-import difflib
 from _ast import ClassDef, FunctionDef, AsyncFunctionDef, Import, ImportFrom
 
 from .import_cache import ImportCache
+from .module_path_trie import ModulePathTrie
 from .preprocessed_type_caches import ClassCache, FileCache, TypeCache
 from .type_info import TypeInfo
+from .type_cache_store import TypeCacheStore
 from ..utils import Utils
+from ..syntax_tree_cache import SyntaxTreeCache
 
 logger = logging.getLogger("main")
 
 class TypePreprocessor():
 
-    def __init__(self, projectpath: str) -> None:
+    def __init__(self, projectpath: str, syntax_tree_cache: SyntaxTreeCache = None,
+                 type_cache_store: TypeCacheStore = None, jobs: int = 1) -> None:
         self._projectpath: str = projectpath
+        self._syntax_tree_cache: SyntaxTreeCache = syntax_tree_cache
+        self._type_cache_store: TypeCacheStore = type_cache_store
+        self._jobs: int = jobs
         self._project_name: str = ""
         self._current_module_path: str = ""
-        self._available_modules: List[str] = []
+        self._available_modules: ModulePathTrie = None
+        # resolved import paths by (importing module, import path, level)
+        self._resolved_imports: Dict[Tuple[str, str, int], str] = {}
         self._type_cache: TypeCache = None
         self._current_file_cache: FileCache = None
     
@@ -27,139 +36,177 @@ class TypePreprocessor():
             self._project_name = Utils.get_last_element_of_path(path)
             self._type_cache = TypeCache(self._project_name)
             available_files: List[str] = Utils.get_all_python_files_in_directory(path)
-            self._available_modules = self._get_available_modules(available_files)
-            for file in available_files:
-                self._process_file(file)
+            self._available_modules = ModulePathTrie(self._get_available_modules(available_files))
+
+            cached_entries: List[Tuple[str, Tuple[FileCache, List[List]]]] = [
+                self._load_cached_file(file) for file in available_files
+            ]
+            searched_files: Iterator[Tuple[FileCache, List[List]]] = self._search_files(
+                [file for file, (_, cached_entry) in zip(available_files, cached_entries) if cached_entry is None])
+            # the files are added in project order, so the result does not depend on the number of jobs
+            for file, (content_hash, cached_entry) in zip(available_files, cached_entries):
+                if cached_entry is not None:
+                    self._add_file(file, cached_entry)
+                    continue
+
+                print("Preprocessing {}".format(file))
+                searched_entry: Tuple[FileCache, List[List]] = next(searched_files)
+                if searched_entry is None:
+                    logger.error("Could not preprocess file {}".format(file))
+                    continue
+
+                if self._type_cache_store is not None:
+                    file_cache, import_statements = searched_entry
+                    self._type_cache_store.store(Utils.get_only_project_path(self._projectpath, file), content_hash,
+                                                 file_cache, import_statements)
+                self._add_file(file, searched_entry)
+            searched_files.close()
+            self._type_cache.freeze()
+
+            if self._type_cache_store is not None:
+                self._type_cache_store.save()
+                print("Loaded the types of {} unchanged files from the type cache"
+                      .format(self._type_cache_store.hits))
         return self._type_cache
         
-    def _process_file(self, path: str) -> FileCache:
-        print("Preprocessing {}".format(path))
-        syntax_tree = Utils.load_syntax_tree(path, True)
-        file_cache: FileCache = None
-        if syntax_tree is not None:
-            path_within_project: str = Utils.get_only_project_path(self._projectpath, path)
-            self._current_module_path = Utils.generate_dotted_module_path(path_within_project)
-            file_name: str = Utils.get_last_element_of_path(path)
-            file_cache = FileCache(file_name)
-            import_cache: ImportCache = ImportCache()
-            file_cache.set_import_cache(import_cache)
-            self._current_file_cache = file_cache
-            self._search_ast(syntax_tree, self._current_file_cache)
+    def _load_cached_file(self, path: str) -> Tuple[str, Tuple[FileCache, List[List]]]:
+        """
+        Returns the content hash of the file and its entry in the type cache store, which is None
+        if the file has to be preprocessed
+        """
+        if self._type_cache_store is None:
+            return None, None
 
-            if file_name == "__init__.py":
-                self._current_module_path = self._current_module_path.rsplit(".", 1)[0]
+        content_hash: str = TypeCacheStore.get_content_hash(path)
+        path_within_project: str = Utils.get_only_project_path(self._projectpath, path)
+        return content_hash, self._type_cache_store.load(path_within_project, content_hash)
 
-            self._type_cache.add_file_cache(self._current_module_path, self._current_file_cache)
+    def _search_files(self, paths: List[str]) -> Iterator[Tuple[FileCache, List[List]]]:
+        """
+        Yields the file cache and the unresolved import statements of every file in the given order.
+        With more than one job the files are searched by a process pool
+        """
+        if self._jobs is not None and self._jobs > 1 and len(paths) > 1:
+            pool = multiprocessing.Pool(self._jobs)
+            with pool:
+                chunk_size: int = max(1, len(paths) // (self._jobs * 4))
+                yield from pool.imap(TypePreprocessor._search_file_in_worker, paths, chunksize=chunk_size)
         else:
-            logger.error("Could not preprocess file {}".format(path))
-        return file_cache
+            for path in paths:
+                yield TypePreprocessor._search_file(path, self._syntax_tree_cache)
+
+    @staticmethod
+    def _search_file_in_worker(path: str) -> Tuple[FileCache, List[List]]:
+        return TypePreprocessor._search_file(path, None)
+
+    @staticmethod
+    def _search_file(path: str, syntax_tree_cache: SyntaxTreeCache) -> Tuple[FileCache, List[List]]:
+        """
+        Returns the file cache without imports and the import statements of a file or None if it can not be parsed
+        """
+        syntax_tree = Utils.load_syntax_tree(path, True, syntax_tree_cache)
+        if syntax_tree is None:
+            return None
+
+        file_cache: FileCache = FileCache(Utils.get_last_element_of_path(path))
+        import_statements: List[List] = []
+        TypePreprocessor._search_ast(syntax_tree, file_cache, import_statements)
+        return file_cache, import_statements
+
+    def _add_file(self, path: str, entry: Tuple[FileCache, List[List]]) -> None:
+        """
+        Resolves the imports of a searched file and adds its file cache to the type cache
+        """
+        file_cache, import_statements = entry
+        path_within_project: str = Utils.get_only_project_path(self._projectpath, path)
+        file_name: str = Utils.get_last_element_of_path(path)
+        self._current_module_path = Utils.generate_dotted_module_path(path_within_project)
+        file_cache.set_import_cache(ImportCache())
+        self._current_file_cache = file_cache
+        # imports are resolved for every run, as they depend on the other modules of the project
+        for import_statement in import_statements:
+            self._process_import_statement(import_statement)
+
+        if file_name == "__init__.py":
+            self._current_module_path = self._current_module_path.rsplit(".", 1)[0]
+
+        self._type_cache.add_file_cache(self._current_module_path, self._current_file_cache)
 
-    def _search_ast(self, tree, cache: FileCache):
+    @staticmethod
+    def _search_ast(tree, cache: FileCache, import_statements: List[List]):
+        """
+        Adds the classes and functions of the syntax tree to the file cache and collects its import statements
+        in the form of ["import", name, alias] or ["from", module, level, [[name, alias]]]
+        """
         for node in tree.body:
             if isinstance(node, ClassDef):
-                self._process_class(node, cache)
-            elif self._is_function_node(node):
-                name, return_type = self._process_function(node)
+                TypePreprocessor._process_class(node, cache)
+            elif TypePreprocessor._is_function_node(node):
+                name, return_type = TypePreprocessor._process_function(node)
                 cache.add_function(name, return_type)
             elif isinstance(node, Import):
-                self._process_import(node)
+                for module in node.names:
+                    import_statements.append(["import", module.name, module.asname])
             elif isinstance(node, ImportFrom):
-                self._process_import_from(node)
-    
-    def _process_import(self, node: Import):
-        for module in node.names:
-            name: str = module.name
-            complete_path: str = self._generate_complete_absolute_import_path(module.name, node)
-            self._current_file_cache.import_cache.add_import(complete_path, [module.name])
+                import_statements.append(["from", node.module, node.level,
+                                          [[name.name, name.asname] for name in node.names]])
 
-            if module.asname:
-                self._current_file_cache.import_cache.add_import_alias(module.asname, name)
+    def _process_import_statement(self, import_statement: List) -> None:
+        if import_statement[0] == "import":
+            self._process_import(import_statement[1], import_statement[2])
+        else:
+            self._process_import_from(import_statement[1], import_statement[2], import_statement[3])
+    
+    def _process_import(self, name: str, as_name: str):
+        complete_path: str = self._generate_complete_absolute_import_path(name)
+        self._current_file_cache.import_cache.add_import(complete_path, [name])
 
-    def _process_import_from(self, node: ImportFrom):
-        module: str = node.module
-        level: int = node.level
+        if as_name:
+            self._current_file_cache.import_cache.add_import_alias(as_name, name)
 
-        complete_path = self._generate_complete_import_path(module, level, node)
+    def _process_import_from(self, module: str, level: int, names: List[List[str]]):
+        complete_path = self._generate_complete_import_path(module, level)
         classes: List[str] = []
-        for name in node.names:
-            classes.append(name.name)
-            if name.asname is not None and name.asname != "None":
-                self._current_file_cache.import_cache.add_import_alias(name.asname, name.name)
+        for name, as_name in names:
+            classes.append(name)
+            if as_name is not None and as_name != "None":
+                self._current_file_cache.import_cache.add_import_alias(as_name, name)
         
         self._current_file_cache.import_cache.add_import(complete_path, classes)
 
-    def _generate_complete_import_path(self, import_path: str, level: int, node) -> str:
-        module_path_parts = self._current_module_path.split(".")
-        module_level = len(module_path_parts) - 1
-
+    def _generate_complete_import_path(self, import_path: str, level: int) -> str:
         if level == 0:
-            return self._generate_complete_absolute_import_path(import_path, node)
-        if level == 1:
-            level = module_level
-
-        prefix: str = ""
-        complete_path: str = ""
-        for i in range (0, level):
-            prefix += "{}.".format(module_path_parts[i])
-        complete_path = "{}{}".format(prefix, import_path)
-
-        if complete_path not in self._available_modules:
-            # if the generated path is not present in the available modules, it is a native import
-            return import_path
-        return complete_path
+            return self._generate_complete_absolute_import_path(import_path)
 
-    def _generate_complete_absolute_import_path(self, import_path: str, node) -> str:
-        """
-        Retrieves the possible full module path for a absolute import by comparing it to all available module paths
-        """
-        possible_modules_for_import: List[str] = []
-        for path in self._available_modules:
-            if self._sub_path_in_path(import_path, path):
-                possible_modules_for_import.append(path)
-        
-        if len(possible_modules_for_import) > 1:
-            logger.debug("Could not uniquely assign absolute import {} to imported module.\n Current Module {}, line no: {}"
-            .format(import_path, self._current_module_path, node.lineno))
-            return self._find_highest_matching_module(import_path, possible_modules_for_import)
-
-        # if no possible modules are found, the imported module is not part of the project
-        if len(possible_modules_for_import) == 0:
-            return import_path
-        
-        return possible_modules_for_import[0]
-    
-    def _sub_path_in_path(self, sub_path: str, path: str) -> bool:
-        """
-        Returns if a given module sub_path (e.g. an import) is part of a longer path 
-        """
-
-        split_sub_path: List[str] = sub_path.split(".")
-        path_split: List[str] = path.split(".")
-        sub_part_in_path: bool = True
-
-        for sub_part in split_sub_path:
-            if sub_part_in_path:
-                sub_part_in_path = False
-            else:
-                return False
-
-            for path_part in path_split:
-                if sub_part == path_part:
-                    sub_part_in_path = True
-                    break
-        return sub_part_in_path
+        key: Tuple[str, str, int] = (self._current_module_path, import_path, level)
+        complete_path: str = self._resolved_imports.get(key, None)
+        if complete_path is None:
+            # the package of the current module is one level up, every further level goes up one package
+            package_parts: List[str] = self._current_module_path.split(".")[:-level]
+            if import_path is not None:
+                package_parts.append(import_path)
+            complete_path = ".".join(package_parts)
 
+            if not self._available_modules.contains_module(complete_path):
+                # if the generated path is not present in the available modules, it is a native import
+                complete_path = import_path
+            self._resolved_imports[key] = complete_path
+        return complete_path
 
-    def _find_highest_matching_module(self, import_path: str, modules: List[str]) -> str:
+    def _generate_complete_absolute_import_path(self, import_path: str) -> str:
         """
-        Finds a module in the given available module with matches the given import path the most
+        Retrieves the full module path for a absolute import, which is the available module that ends with
+        the import path and is closest to the current module
         """
-        matches: List[str] = difflib.get_close_matches(import_path, modules, 3)
-        logger.debug("Found {} best matches for import {}".format(len(matches), import_path))
-        if len(matches) == 0:
-            logger.debug("Could not find best matches for import {}".format(import_path))
-            return import_path
-        return matches[0]
+        key: Tuple[str, str, int] = (self._current_module_path, import_path, 0)
+        if key not in self._resolved_imports:
+            complete_path: str = self._available_modules.find_best_match(import_path, self._current_module_path)
+
+            # if no possible modules are found, the imported module is not part of the project
+            if complete_path is None:
+                complete_path = import_path
+            self._resolved_imports[key] = complete_path
+        return self._resolved_imports[key]
 
     def _get_available_modules(self, files: List[str]) -> List[str]:
         """
@@ -179,31 +226,34 @@ class TypePreprocessor():
         return output
 
 
-    def _process_class(self, class_node: ClassDef, file_cache: FileCache, class_stack: List[str] = []) -> ClassCache:
+    @staticmethod
+    def _process_class(class_node: ClassDef, file_cache: FileCache, class_stack: List[str] = []) -> ClassCache:
         class_name: str = class_node.name
         class_stack.append(class_name)
         class_name = Utils.create_full_class_name(class_stack)
         cache: ClassCache = ClassCache(class_name)
 
         for node in class_node.body:
-            if self._is_function_node(node):
-                name, return_type = self._process_function(node)
+            if TypePreprocessor._is_function_node(node):
+                name, return_type = TypePreprocessor._process_function(node)
                 cache.add_function(name, return_type)
             if isinstance(node, ClassDef):
-                self._process_class(node, file_cache, class_stack=class_stack)
+                TypePreprocessor._process_class(node, file_cache, class_stack=class_stack)
                 cache.add_function(node.name, None)
         file_cache.add_class(cache)
         class_stack.pop()
         
 
-    def _process_function(self, node: FunctionDef) -> Tuple[str, TypeInfo]:
+    @staticmethod
+    def _process_function(node: FunctionDef) -> Tuple[str, TypeInfo]:
         name: str = node.name
         return_info = node.returns
 
         if return_info is None or return_info == "None":
             return (name, None)
-        type_info: TypeInfo = TypeInfo(annotation_node=node.returns)
+        type_info: TypeInfo = TypeInfo.from_annotation(node.returns)
         return (name, type_info)
 
-    def _is_function_node(self, node) -> bool:
+    @staticmethod
+    def _is_function_node(node) -> bool:
         return isinstance(node, FunctionDef) or isinstance(node, AsyncFunctionDef)
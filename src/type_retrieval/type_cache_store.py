@@ -0,0 +1,93 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+from .preprocessed_type_caches import FileCache
+from .. import __version__
+
+logger = logging.getLogger("main")
+
+
+class TypeCacheStore:
+    """
+    Persistent on-disk store for the preprocessed type information of the files of one project.
+    An entry holds the classes, functions and unresolved import statements of a file and is only valid
+    for the same source content and Pygram version. Imports are resolved again in every run,
+    so modules that depend on added or removed files see the current project
+    """
+
+    def __init__(self, cache_directory: str, project_path: str) -> None:
+        self.cache_directory: str = os.path.abspath(cache_directory)
+        self.hits: int = 0
+        self.misses: int = 0
+
+        if not os.path.isdir(self.cache_directory):
+            os.makedirs(self.cache_directory)
+
+        key: str = hashlib.sha256(os.path.abspath(project_path).encode("utf-8")).hexdigest()
+        self._store_path: str = os.path.join(self.cache_directory, "types_{}.json".format(key))
+        self._entries: Dict[str, Dict] = self._read_entries()
+        # entries of the files seen in this run, files that were removed from the project are not saved again
+        self._current_entries: Dict[str, Dict] = {}
+
+    @staticmethod
+    def get_content_hash(path: str) -> str:
+        with open(path, "rb") as source:
+            return hashlib.sha256(source.read()).hexdigest()
+
+    def load(self, path_within_project: str, content_hash: str) -> Tuple[FileCache, List[List]]:
+        """
+        Returns a tuple of (file cache without imports, import statements) for a file
+        or None if there is no valid entry
+        """
+        entry: Dict = self._entries.get(path_within_project, None)
+
+        if entry is not None and entry.get("content_hash", None) == content_hash:
+            try:
+                file_cache: FileCache = FileCache.from_json(entry["file_cache"])
+                import_statements: List[List] = entry["imports"]
+                self.hits += 1
+                self._current_entries[path_within_project] = entry
+                return file_cache, import_statements
+            except (KeyError, IndexError, TypeError):
+                logger.warning("Ignoring corrupt type cache entry of {}".format(path_within_project))
+
+        self.misses += 1
+        return None
+
+    def store(self, path_within_project: str, content_hash: str, file_cache: FileCache,
+              import_statements: List[List]) -> None:
+        """
+        Adds the entry of a preprocessed file. The file cache has to be stored before
+        its types are resolved by the tokenizers
+        """
+        self._current_entries[path_within_project] = {
+            "content_hash": content_hash,
+            "file_cache": file_cache.to_json(),
+            "imports": import_statements
+        }
+
+    def save(self) -> None:
+        temporary_path: str = "{}.{}.tmp".format(self._store_path, os.getpid())
+
+        with open(temporary_path, "w") as store_file:
+            json.dump({"version": __version__, "files": self._current_entries}, store_file, separators=(",", ":"))
+        os.replace(temporary_path, self._store_path)
+
+    def _read_entries(self) -> Dict[str, Dict]:
+        if not os.path.isfile(self._store_path):
+            return {}
+
+        try:
+            with open(self._store_path, "r") as store_file:
+                store: Dict = json.load(store_file)
+
+            if store["version"] == __version__:
+                return store["files"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring corrupt type cache {}".format(self._store_path))
+        return {}
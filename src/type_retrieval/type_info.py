@@ -1,4 +1,5 @@
 
+from typing import Dict
 from typing import List
 from _ast import Subscript, Name, Tuple, Constant, Attribute
 import logging
@@ -8,13 +9,64 @@ from ..utils import Utils
 logger = logging.getLogger("main")
 
 class TypeInfo:
+    """
+    Type of an annotation with its contained types. Structurally equal types are hash-consed into one
+    canonical instance by intern, which must not be changed afterwards
+    """
+
+    __slots__ = ("label", "_contained_types", "fully_qualified_name", "_interned")
+
+    # canonical instances by (label class, label, canonical contained types, fully qualified name),
+    # the label class keeps constant labels like 1 and True apart
+    _interned_types: Dict[tuple, "TypeInfo"] = {}
 
     def __init__(self, annotation_node = None, label: str = "") -> None:
         self.label: str = label
         self._contained_types: List[TypeInfo] = []
+        self._interned: bool = False
         if annotation_node is not None:
             self._create_from_annotation(annotation_node)
         self.fully_qualified_name: str = ""
+
+    @staticmethod
+    def intern(type_info: "TypeInfo") -> "TypeInfo":
+        """
+        Returns the canonical instance of the type structure, including the fully qualified names
+        """
+        if type_info is None or type_info._interned:
+            return type_info
+        return TypeInfo._get_interned(type_info.label,
+                                      tuple(TypeInfo.intern(type) for type in type_info._contained_types),
+                                      type_info.fully_qualified_name)
+
+    @staticmethod
+    def from_annotation(annotation_node) -> "TypeInfo":
+        return TypeInfo.intern(TypeInfo(annotation_node=annotation_node))
+
+    @staticmethod
+    def _get_interned(label, contained_types: tuple, fully_qualified_name: str) -> "TypeInfo":
+        key: tuple = (label.__class__, label, contained_types, fully_qualified_name)
+        type_info: TypeInfo = TypeInfo._interned_types.get(key, None)
+        if type_info is None:
+            type_info = TypeInfo(label=label)
+            type_info._contained_types = list(contained_types)
+            type_info.fully_qualified_name = fully_qualified_name
+            type_info._interned = True
+            TypeInfo._interned_types[key] = type_info
+        return type_info
+
+    def __reduce__(self):
+        # canonical instances sent between processes are interned again when they are unpickled
+        if self._interned:
+            return TypeInfo._get_interned, (self.label, tuple(self._contained_types), self.fully_qualified_name)
+        return TypeInfo._from_state, (self.label, self._contained_types, self.fully_qualified_name)
+
+    @staticmethod
+    def _from_state(label, contained_types: List["TypeInfo"], fully_qualified_name: str) -> "TypeInfo":
+        type_info: TypeInfo = TypeInfo(label=label)
+        type_info._contained_types = contained_types
+        type_info.fully_qualified_name = fully_qualified_name
+        return type_info
     
     def __str__(self) -> str:
         if self.fully_qualified_name == self.label or self.fully_qualified_name == "":
@@ -22,6 +74,27 @@ class TypeInfo:
         else:
             return self.fully_qualified_name
     
+    def get_signature(self) -> str:
+        """
+        Returns a string that describes the annotated type structure, independent of resolved modules
+        """
+        if len(self._contained_types) == 0:
+            return str(self.label)
+        return "{}[{}]".format(self.label, ",".join(type.get_signature() for type in self._contained_types))
+
+    def to_json(self) -> List:
+        """
+        Returns the annotated type structure as [label, contained types], without resolved modules
+        """
+        label = self.label
+        if label is not None and not isinstance(label, (str, int, float)):
+            label = str(label)
+        return [label, [type.to_json() for type in self._contained_types]]
+
+    @staticmethod
+    def from_json(json_type: List) -> "TypeInfo":
+        return TypeInfo._get_interned(json_type[0], tuple(TypeInfo.from_json(type) for type in json_type[1]), "")
+
     def get_label(self) -> str:
         return self.label
     
@@ -29,10 +102,16 @@ class TypeInfo:
         return self._contained_types
     
     def set_fully_qualified_name(self, name: str) -> None:
+        self._check_not_interned()
         self.fully_qualified_name = name
 
     def set_contained_types(self, type_info_list: List["TypeInfo"]) -> None:
+        self._check_not_interned()
         self._contained_types = type_info_list
+
+    def _check_not_interned(self) -> None:
+        if self._interned:
+            raise RuntimeError("Can not change the interned type {}".format(self))
     
     def get_type(self, depth: int, tuple_index: int) -> "TypeInfo":
         object_type: TypeInfo = self._get_contained_type(depth)
@@ -2,9 +2,7 @@ import logging
 from enum import Enum
 from typing import Dict, List
 
-from .preprocessed_type_caches import TypeCache
 from .type_info import TypeInfo
-from ..utils import Utils
 
 logger = logging.getLogger("main")
 
@@ -13,72 +11,92 @@ class Scope(Enum):
     CLASS = 2
     FUNCTION = 3
 
+class ScopeFrame:
+    """
+    Frame of a module, class or function scope, linked to the frame of its enclosing scope.
+    Frames are identified by the object itself, so nested scopes with equal names do not clash
+    """
+
+    __slots__ = ("scope", "name", "parent", "variables", "class_frame")
+
+    def __init__(self, scope: Scope, name: str, parent: "ScopeFrame" = None) -> None:
+        self.scope: Scope = scope
+        self.name: str = name
+        self.parent: ScopeFrame = parent
+        self.variables: Dict[str, TypeInfo] = {}
+        # innermost class frame, including this frame
+        self.class_frame: ScopeFrame = self if scope == Scope.CLASS else (parent.class_frame if parent else None)
+
+    def get_parent_scope(self) -> Scope:
+        if self.parent is None:
+            return Scope.MODULE
+        return self.parent.scope
+
 class VariableTypeCache:
+    """
+    Types of the variables visible in the currently tokenized scope. Function variables of all enclosing
+    functions are flattened into one map from name to the stack of their bindings, so a lookup only checks
+    the innermost binding instead of searching every function scope
+    """
 
     def __init__(self, module_path: str) -> None:
         self.module_path: str = module_path
-        self._module_variables: Dict[str, TypeInfo] = {}
-
-        self._scope_stack: List[Scope] = []
-        self._class_scope_stack: List[str] = []
-        self._function_scope_stack: List[str] = []
-        self._class_variables: Dict[str, Dict[str, TypeInfo]] = {}
-        self._function_variables: Dict[str, Dict[str, TypeInfo]] = {}
+        self._module_frame: ScopeFrame = ScopeFrame(Scope.MODULE, module_path)
+        self._frame: ScopeFrame = self._module_frame
+        # bindings of the variables of all enclosing function frames, the innermost is last
+        self._function_bindings: Dict[str, List[TypeInfo]] = {}
+        # increased with every change of the variables or their scope
+        self.version: int = 0
 
-    
     def set_class_scope(self, name: str) -> None:
-        self._scope_stack.append(Scope.CLASS)
-        self._class_scope_stack.append(name)
+        self.version += 1
+        self._frame = ScopeFrame(Scope.CLASS, name, self._frame)
 
     def leave_class_scope(self):
-        left_class: str = self._class_scope_stack[-1]
-        del self._class_variables[left_class]
-        self._class_scope_stack.pop()
-        self._scope_stack.pop()
-    
+        self._leave_scope(Scope.CLASS)
+
     def set_function_scope(self, name: str):
-        self._scope_stack.append(Scope.FUNCTION)
-        if name in self._function_scope_stack:
-            name += "_{}".format(Utils.get_random_string(5))
-        self._function_scope_stack.append(name)
-        self._function_variables[name] = {}
+        self.version += 1
+        self._frame = ScopeFrame(Scope.FUNCTION, name, self._frame)
 
     def leave_function_scope(self):
-        left_function_scope = self._function_scope_stack[-1]
-        del self._function_variables[left_function_scope]
-        self._function_scope_stack.pop()
-        self._scope_stack.pop()
+        frame: ScopeFrame = self._frame
+        self._leave_scope(Scope.FUNCTION)
+        for name in frame.variables:
+            bindings: List[TypeInfo] = self._function_bindings[name]
+            bindings.pop()
+            if len(bindings) == 0:
+                del self._function_bindings[name]
 
     def add_variable(self, variable_name: str, variable_type: TypeInfo):
-        scope: Scope = self._get_current_scope()
-        if scope == Scope.MODULE:
-            self._module_variables[variable_name] = variable_type
-        elif scope == Scope.CLASS:
-            self._set_class_variable(variable_name, variable_type)
+        self.version += 1
+        frame: ScopeFrame = self._frame
+        if frame.scope == Scope.MODULE or frame.scope == Scope.CLASS:
+            frame.variables[variable_name] = variable_type
+        elif frame.name == "__init__" and frame.get_parent_scope() == Scope.CLASS:
+            frame.parent.variables[variable_name] = variable_type
         else:
-            if self._function_scope_stack[-1] == "__init__" and self._get_previous_scope() == Scope.CLASS:
-                self._set_class_variable(variable_name, variable_type)
-            else:
-                self._set_function_variable(variable_name, variable_type)
+            self._set_function_variable(frame, variable_name, variable_type)
 
     def get_variable_type(self, variable_name: str, depth: int, subscript_index: int) -> TypeInfo:
-        scope: Scope = self._get_current_scope()
-        previous_scope: Scope = self._get_previous_scope()
+        frame: ScopeFrame = self._frame
         variable_type: TypeInfo = None
-        if scope == Scope.FUNCTION:
-            variable_type = self._get_function_variable(variable_name)
-        
-        if previous_scope == Scope.CLASS and variable_type is None:
-            variable_type = self._get_class_variable(variable_name)
-        
+        if frame.scope == Scope.FUNCTION:
+            bindings: List[TypeInfo] = self._function_bindings.get(variable_name, None)
+            if bindings is not None:
+                variable_type = bindings[-1]
+
+        if frame.get_parent_scope() == Scope.CLASS and variable_type is None:
+            variable_type = frame.class_frame.variables.get(variable_name, None)
+
         if variable_type is None:
-            variable_type = self._module_variables.get(variable_name, None)
-        
+            variable_type = self._module_frame.variables.get(variable_name, None)
+
         if variable_type is None:
             logger.warning("Could not find variable [{}] in cache of module {}"
             .format(variable_name, self.module_path))
             return None
-        
+
         variable_type = variable_type.get_type(depth, subscript_index)
 
         if variable_type is None:
@@ -87,43 +105,18 @@ class VariableTypeCache:
             return None
 
         return variable_type
-    
-    def _get_inner_class_path(self, name: str) -> str:
-        output: str = ""
-        if name is not None:
-            for key in self._class_variables:
-                output += "{}.".format(key)
-            output += name
-        return output
-    
-    def _get_current_scope(self) -> Scope:
-        if len(self._scope_stack) == 0:
-            return Scope.MODULE
-        return self._scope_stack[-1]
-    
-    def _get_previous_scope(self) -> Scope:
-        if len(self._scope_stack) < 2:
-            return Scope.MODULE
-        return self._scope_stack[-2]
-    
-    def _set_class_variable(self, variable_name: str, type_info: TypeInfo) -> None:
-        current_class = self._class_scope_stack[-1]
-
-        if self._class_variables.get(current_class, None) is None:
-            self._class_variables[current_class] = {}
-        self._class_variables[current_class][variable_name] = type_info
-    
-    def _get_class_variable(self, variable_name: str) -> TypeInfo:
-        current_class = self._class_scope_stack[-1]
-        return self._class_variables[current_class].get(variable_name, None)
-    
-    def _get_function_variable(self, name: str) -> TypeInfo:
-        for scope in reversed(self._function_scope_stack):
-            variable = self._function_variables[scope].get(name, None)
-            if variable is not None:
-                return variable
-        return None
-
-    def _set_function_variable(self, variable_name: str, variable_type: TypeInfo) -> None:
-        current_function = self._function_scope_stack[-1]
-        self._function_variables[current_function][variable_name] = variable_type
\ No newline at end of file
+
+    def _leave_scope(self, scope: Scope) -> None:
+        if self._frame.scope != scope:
+            raise RuntimeError("Can not leave {} scope while in {} scope {}"
+                               .format(scope.name.lower(), self._frame.scope.name.lower(), self._frame.name))
+        self.version += 1
+        self._frame = self._frame.parent
+
+    def _set_function_variable(self, frame: ScopeFrame, variable_name: str, variable_type: TypeInfo) -> None:
+        if variable_name in frame.variables:
+            # the innermost binding belongs to the current frame
+            self._function_bindings[variable_name][-1] = variable_type
+        else:
+            self._function_bindings.setdefault(variable_name, []).append(variable_type)
+        frame.variables[variable_name] = variable_type
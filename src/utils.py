@@ -7,6 +7,8 @@ import string
 import random
 from _ast import Attribute, Name, Subscript, Tuple
 
+from .syntax_tree_cache import SyntaxTreeCache
+
 
 class Utils:
 
@@ -59,7 +61,10 @@ class Utils:
         return output
 
     @staticmethod
-    def load_syntax_tree(path: str, use_type_info: bool):
+    def load_syntax_tree(path: str, use_type_info: bool, syntax_tree_cache: SyntaxTreeCache = None):
+        if syntax_tree_cache is not None:
+            return syntax_tree_cache.get_syntax_tree(path, use_type_info)
+
         if os.path.isfile(path):
             with open(path, "r") as source:
                 tree = ast.parse(source.read(), type_comments=use_type_info)
@@ -0,0 +1,75 @@
+import random
+import unittest
+from collections import Counter
+
+from src.analysis.approximate_count_store import ApproximateCountStore
+from src.analysis.approximate_count_store import HASH_PRIME
+
+
+def create_long_tailed_corpus(seed: int = 4711):
+    generator: random.Random = random.Random(seed)
+    return [[min(int(generator.paretovariate(1.1)), 500) for _ in range(50)] for _ in range(200)]
+
+
+def count_sub_sequences(sequences, max_order: int) -> Counter:
+    return Counter(tuple(sequence[index:index + length]) for sequence in sequences
+                   for index in range(0, len(sequence)) for length in range(1, max_order + 1)
+                   if index + length <= len(sequence))
+
+
+class ApproximateCountStoreTest(unittest.TestCase):
+
+    def test_heavy_hitters_are_bounded(self):
+        sequences = create_long_tailed_corpus()
+        for max_heavy_hitters in [10, 50, 1000000]:
+            store: ApproximateCountStore = ApproximateCountStore(0.001, max_heavy_hitters=max_heavy_hitters)
+            store.build(sequences, 3)
+            self.assertLessEqual(len(store._heavy_hitters), max_heavy_hitters)
+            self.assertLess(len(store._heavy_hitters), len(count_sub_sequences(sequences, 3)))
+
+    def test_counts_are_never_underestimated(self):
+        sequences = create_long_tailed_corpus()
+        store: ApproximateCountStore = ApproximateCountStore(0.001, max_heavy_hitters=50)
+        store.build(sequences, 3)
+        for sub_sequence, count in count_sub_sequences(sequences, 3).items():
+            self.assertGreaterEqual(store.count(list(sub_sequence)), count)
+            self.assertLessEqual(store.get_count_of_node(sub_sequence), count + store.get_error_bound())
+
+    def test_heavy_hitters_are_exact(self):
+        sequences = create_long_tailed_corpus()
+        store: ApproximateCountStore = ApproximateCountStore(0.001, max_heavy_hitters=50)
+        store.build(sequences, 3)
+        counts: Counter = count_sub_sequences(sequences, 3)
+        self.assertGreater(len(store._heavy_hitters), 0)
+        for sub_sequence, count in counts.items():
+            if store._get_key(sub_sequence) in store._heavy_hitters:
+                self.assertEqual(store.get_count_of_node(sub_sequence), count)
+
+    def test_keys_congruent_modulo_the_hash_prime_are_hashed_apart(self):
+        store: ApproximateCountStore = ApproximateCountStore(0.001)
+        for base_key in [1 << 61, (1 << 61) + 4711, 1 << 100]:
+            for multiple in range(1, 10):
+                self.assertNotEqual(list(store._get_columns(base_key)),
+                                    list(store._get_columns(base_key + multiple * HASH_PRIME)))
+
+    def test_long_keys_are_never_underestimated(self):
+        generator: random.Random = random.Random(4711)
+        sequences = [[generator.randrange(0, 1000) for _ in range(0, 12)] for _ in range(0, 100)]
+        store: ApproximateCountStore = ApproximateCountStore(0.001, max_heavy_hitters=50)
+        store.build(sequences)
+
+        counts: Counter = count_sub_sequences(sequences, 12)
+        self.assertGreater(max(store._get_key(sub_sequence) for sub_sequence in counts), 1 << 61)
+        for sub_sequence, count in counts.items():
+            self.assertGreaterEqual(store.get_count_of_node(sub_sequence), count)
+            self.assertLessEqual(store.get_count_of_node(sub_sequence), count + store.get_error_bound())
+
+    def test_unknown_tokens_are_not_counted(self):
+        store: ApproximateCountStore = ApproximateCountStore(0.01)
+        store.build([[0, 1, 2]], 2)
+        self.assertEqual(store.count([3]), 0)
+        self.assertEqual(store.count([1], 2), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import random
+import unittest
+from array import array
+from typing import Dict
+from typing import List
+
+from src.analysis.location_index import LocationIndex
+from src.analysis.location_index import WINDOW_INDEX_THRESHOLD
+
+
+def find_locations(token_sequences, window) -> Dict[str, List[int]]:
+    output: Dict[str, List[int]] = {}
+    for module, sequences in token_sequences.items():
+        for token_ids, line_numbers in sequences:
+            for offset in range(0, len(token_ids)):
+                if tuple(token_ids[offset:offset + len(window)]) == window:
+                    output.setdefault(module, []).append(line_numbers[offset])
+    return output
+
+
+def create_token_sequences(seed: int = 4711):
+    generator: random.Random = random.Random(seed)
+    token_sequences = {}
+    for module_index in range(0, 20):
+        sequences = []
+        for _ in range(0, 5):
+            # token 0 followed by 1 is a very common bigram, like a definition and its end
+            token_ids: List[int] = []
+            for _ in range(0, 30):
+                token_ids += [0, 1] if generator.random() < 0.5 else [generator.randrange(2, 6)]
+            sequences.append((array("i", token_ids), array("i", range(1, len(token_ids) + 1))))
+        token_sequences["module_{}".format(module_index)] = sequences
+    return token_sequences
+
+
+class LocationIndexTest(unittest.TestCase):
+
+    def test_windows_of_frequent_keys_are_looked_up_by_the_full_window(self):
+        token_sequences = create_token_sequences()
+        index: LocationIndex = LocationIndex(token_sequences)
+        self.assertGreater(len(index._positions[LocationIndex._get_key(0, 1)]), WINDOW_INDEX_THRESHOLD)
+
+        windows = [(0,), (0, 1), (0, 1, 0), (0, 1, 2), (0, 1, 0, 1), (0, 1, 3, 0), (2, 3, 4), (0, 1, 7)]
+        for window in windows:
+            self.assertEqual(index.get_locations(window), find_locations(token_sequences, window))
+
+        # the positions of the frequent key are sorted into one sub-index per window length
+        self.assertEqual(sorted(length for _, length in index._window_positions.keys()), [3, 4])
+        sub_index_size: int = len(index._window_positions)
+        for window in windows:
+            index.get_locations(window)
+        self.assertEqual(len(index._window_positions), sub_index_size)
+
+    def test_added_sequences_are_found_in_frequent_keys(self):
+        token_sequences = create_token_sequences()
+        index: LocationIndex = LocationIndex(token_sequences)
+        index.get_locations((0, 1, 2))
+
+        token_sequences["added"] = [(array("i", [0, 1, 2]), array("i", [7, 8, 9]))]
+        index.add_sequence("added", *token_sequences["added"][0])
+        self.assertEqual(index.get_locations((0, 1, 2)), find_locations(token_sequences, (0, 1, 2)))
+        self.assertEqual(index.get_locations((0, 1, 2))["added"], [7])
+
+
+if __name__ == "__main__":
+    unittest.main()
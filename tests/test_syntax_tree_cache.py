@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+from src.syntax_tree_cache import SyntaxTreeCache
+from src.syntax_tree_cache import SYNTAX_TREE_SIZE_FACTOR
+
+
+class SyntaxTreeCacheTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self.paths = []
+        for index in range(0, 10):
+            path: str = os.path.join(self._directory.name, "module_{}.py".format(index))
+            with open(path, "w") as source:
+                source.write("def function_{}(value: int) -> int:\n    return value + {}\n".format(index, index))
+            self.paths.append(path)
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def test_budget_smaller_than_project_hits_in_repeated_scans(self):
+        source_size: int = os.path.getsize(self.paths[0])
+        cache: SyntaxTreeCache = SyntaxTreeCache(memory_budget=3 * source_size * SYNTAX_TREE_SIZE_FACTOR)
+
+        # the preprocessor and the tokenizer walk the files in the same order
+        for _ in range(0, 2):
+            for path in self.paths:
+                self.assertIsNotNone(cache.get_syntax_tree(path))
+
+        self.assertEqual(cache.misses, 17)
+        self.assertEqual(cache.hits, 3)
+
+    def test_budget_larger_than_project_parses_every_file_once(self):
+        cache: SyntaxTreeCache = SyntaxTreeCache()
+        for _ in range(0, 2):
+            for path in self.paths:
+                cache.get_syntax_tree(path)
+
+        self.assertEqual(cache.misses, len(self.paths))
+        self.assertEqual(cache.hits, len(self.paths))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import json
+import tempfile
+import unittest
+
+from src import __version__
+from src.tokenization.token_cache import TokenCache
+
+
+class TokenCacheTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self.cache: TokenCache = TokenCache(self._directory.name)
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def test_stored_entry_is_loaded(self):
+        self.cache.store("module.py", True, "hash", "signature", [[("<DEF>", 1), ("call", 2)]], (1, 2, 0, 1))
+        self.assertEqual(self.cache.load("module.py", True, "hash", "signature"),
+                         ([[("<DEF>", 1), ("call", 2)]], (1, 2, 0, 1)))
+        self.assertIsNone(self.cache.load("module.py", True, "changed hash", "signature"))
+
+    def test_entries_with_wrong_shape_are_misses(self):
+        corrupt_parts = [
+            {"sequences": None},
+            {"sequences": [[3]]},
+            {"sequences": [["<DEF>"]]},
+            {"sequences": [[["<DEF>"]]]},
+            {"counters": 3}
+        ]
+        for corrupt_part in corrupt_parts:
+            entry = {"version": __version__, "content_hash": "hash", "dependency_signature": "",
+                     "counters": [0, 0, 0, 0], "sequences": [[["<DEF>", 1]]]}
+            entry.update(corrupt_part)
+            with open(self.cache._get_entry_path("module.py", False), "w") as entry_file:
+                json.dump(entry, entry_file)
+
+            with self.assertLogs("main", level="WARNING"):
+                self.assertIsNone(self.cache.load("module.py", False, "hash"))
+        self.assertEqual(self.cache.hits, 0)
+        self.assertEqual(self.cache.misses, len(corrupt_parts))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from src.analysis.token_count_model import TokenCountModel
+
+
+def create_model(token_sequences) -> TokenCountModel:
+    model: TokenCountModel = TokenCountModel.from_token_sequences(token_sequences, name="test", max_order=3)
+    model.build()
+    return model
+
+
+def get_counts(model: TokenCountModel):
+    return {tuple(model.vocabulary.get_token(token_id) for token_id in path): count
+            for path, count in model.count_model.items()}
+
+
+class TokenCountModelSubtractTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.model: TokenCountModel = create_model({
+            "a": [[("def", 1), ("call", 2), ("end", 3)]],
+            "b": [[("def", 1), ("return", 2), ("end", 3)]]
+        })
+
+    def test_subtract_contained_model(self):
+        self.model.subtract(create_model({"a": [[("def", 1), ("call", 2), ("end", 3)]]}))
+        expected: TokenCountModel = create_model({"b": [[("def", 1), ("return", 2), ("end", 3)]]})
+
+        self.assertEqual(get_counts(self.model), get_counts(expected))
+        self.assertEqual(list(self.model.token_sequences.keys()), ["b"])
+
+    def test_subtract_model_that_is_not_a_subset(self):
+        counts = get_counts(self.model)
+        single_tokens = dict(self.model.single_tokens)
+        other: TokenCountModel = create_model({"a": [[("def", 1), ("call", 2), ("call", 3), ("end", 4)]]})
+
+        with self.assertRaises(RuntimeError):
+            self.model.subtract(other)
+
+        self.assertEqual(get_counts(self.model), counts)
+        self.assertEqual(self.model.single_tokens, single_tokens)
+        self.assertEqual(sorted(self.model.token_sequences.keys()), ["a", "b"])
+
+    def test_subtract_model_with_sequence_that_is_not_contained(self):
+        counts = get_counts(self.model)
+        # every single token is contained, but not the sequence
+        other: TokenCountModel = create_model({"a": [[("call", 1), ("def", 2)]]})
+
+        with self.assertRaises(RuntimeError):
+            self.model.subtract(other)
+
+        self.assertEqual(get_counts(self.model), counts)
+
+    def test_subtract_model_with_unknown_token(self):
+        with self.assertRaises(RuntimeError):
+            self.model.subtract(create_model({"a": [[("def", 1), ("yield", 2)]]}))
+
+
+if __name__ == "__main__":
+    unittest.main()